@@ -13,8 +13,12 @@ __copyright__ = "Copyright (c) 2021, Crifan Li"
 __license__ = "GPL"
 
 
+import os
 import codecs
 import csv
+import logging
+from enum import Enum
+from collections import namedtuple
 
 
 ################################################################################
@@ -39,60 +43,172 @@ CURRENT_LIB_FILENAME = "crifanCsv"
 # Cookie Function
 ################################################################################
 
-def loadCsvFromFile(csvFilePath, fileEncoding="utf-8-sig", isReturnDictList=True):
-    """read data from csv file
+class CsvRowType(Enum):
+    DICT = "dict"
+    TUPLE = "tuple"
+    # namedtuple, which is __slots__ based, less memory than dict
+    RECORD = "record"
+
+def iterCsvRows(csvFilePath, fileEncoding="utf-8-sig", rowType=CsvRowType.DICT, typeConverterDict=None, chunkSize=0):
+    """read data from csv file, yield each row lazily, not load whole file into memory
 
     Args:
         csvFilePath (str): full csv file path
         fileEncoding (str): file encoding, default to 'utf-8-sig'. utf-8-sig can auto remove '\ufeff' if present
-        isReturnDictList (bool): return data is row dict list or tuple(header list, row list list)
+        rowType (CsvRowType): each row type: dict/tuple/record(namedtuple)
+        typeConverterDict (dict): header -> converter function, eg: {"appDownCount": int, "score": float}
+        chunkSize (int): 0 to yield each row, > 0 to yield row list of chunkSize rows, eg: for bulk database insert
     Returns:
-        isReturnDictList=True  -> csv row dict list
-        isReturnDictList=False -> (csv header list, csv row data list)
+        generator of row, or row list if chunkSize > 0
     Raises:
+    Examples:
+        for eachRowDict in iterCsvRows("apps.csv", typeConverterDict={"appDownCount": int}):
+            print(eachRowDict["appDownCount"])
+        for eachRowRecordList in iterCsvRows("apps.csv", rowType=CsvRowType.RECORD, chunkSize=1000):
+            bulkInsert(eachRowRecordList)
     """
-    csvDictList = []
-
-    csvHeaderList = []
-    csvRowListList = []
-
     with codecs.open(csvFilePath, "r", encoding=fileEncoding) as csvFp:
         csvReader = csv.reader(csvFp)
-        csvHeaderList = next(csvReader)
-        print("csvHeaderList=%s" % csvHeaderList)
+        csvHeaderList = next(csvReader, [])
+        logging.debug("csvHeaderList=%s", csvHeaderList)
         # <class 'list'>: ['url', '品牌', '子品牌', '车型', '车系']
-        # ['appName', 'pkgName', 'authorName', 'categoryName', 'appDownCount', 'apkUrl', 'detailUrl', 'searchKeyword']
-        for eachRowList in csvReader:
-            # print("eachRowList=%s" % eachRowList)
-            # eachRowList=['https://car.autohome.com.cn/pic/series-s19501/3548.html#pvareaid=2042220', 'Elemental', 'Elemental', '2014款 基本型', 'Elemental RP1']
-            # eachRowList=['传奇世界手游', 'com.tencent.cqsj', '盛大游戏', '网络游戏', '2577672', 'https://imtt.dd.qq.com/16891/apk/6B6261E845EB53DF06F6DFBE884B61C8.apk?fsname=com.tencent.cqsj_3.6.1.20_3006.apk&csr=1bbd', 'https://sj.qq.com/myapp/detail.htm?apkName=com.tencent.cqsj', '传奇']
-            csvRowListList.append(eachRowList)
 
-    if isReturnDictList:
-        for eachRowList in csvRowListList:
-            curRowDict = {}
+        # column index -> converter
+        converterList = []
+        if typeConverterDict:
             for curIdx, curHeader in enumerate(csvHeaderList):
-                curRowValue = eachRowList[curIdx]
-                curRowDict[curHeader] = curRowValue
+                if curHeader in typeConverterDict:
+                    converterList.append((curIdx, typeConverterDict[curHeader]))
 
-            csvDictList.append(curRowDict)
+        if rowType == CsvRowType.RECORD:
+            CsvRecord = namedtuple("CsvRecord", csvHeaderList, rename=True)
+
+        curChunkList = []
+        for eachRowList in csvReader:
+            # eachRowList=['传奇世界手游', 'com.tencent.cqsj', '盛大游戏', '网络游戏', '2577672', ...]
+            for curIdx, curConverter in converterList:
+                eachRowList[curIdx] = curConverter(eachRowList[curIdx])
+
+            if rowType == CsvRowType.DICT:
+                curRow = dict(zip(csvHeaderList, eachRowList))
+            elif rowType == CsvRowType.RECORD:
+                curRow = CsvRecord._make(eachRowList)
+            else:
+                curRow = tuple(eachRowList)
+
+            if chunkSize > 0:
+                curChunkList.append(curRow)
+                if len(curChunkList) >= chunkSize:
+                    yield curChunkList
+                    curChunkList = []
+            else:
+                yield curRow
+
+        if curChunkList:
+            yield curChunkList
+
+def loadCsvFromFile(csvFilePath, fileEncoding="utf-8-sig", isReturnDictList=True):
+    """read data from csv file
 
+    Args:
+        csvFilePath (str): full csv file path
+        fileEncoding (str): file encoding, default to 'utf-8-sig'. utf-8-sig can auto remove '\ufeff' if present
+        isReturnDictList (bool): return data is row dict list or tuple(header list, row list list)
+    Returns:
+        isReturnDictList=True  -> csv row dict list
+        isReturnDictList=False -> (csv header list, csv row data list)
+    Raises:
+    Note:
+        for large csv file, use iterCsvRows instead
+    """
+    if isReturnDictList:
+        csvDictList = list(iterCsvRows(csvFilePath, fileEncoding=fileEncoding, rowType=CsvRowType.DICT))
         return csvDictList
     else:
+        with codecs.open(csvFilePath, "r", encoding=fileEncoding) as csvFp:
+            csvReader = csv.reader(csvFp)
+            csvHeaderList = next(csvReader)
+            logging.debug("csvHeaderList=%s", csvHeaderList)
+            # ['appName', 'pkgName', 'authorName', 'categoryName', 'appDownCount', 'apkUrl', 'detailUrl', 'searchKeyword']
+            csvRowListList = list(csvReader)
         return csvHeaderList, csvRowListList
 
-def saveToCsvByDictList(csvDictList, outputFilePath):
-    # generate csv headers from dict list
-    firstItemDict = csvDictList[0]
-    csvHeaders = list(firstItemDict.keys())
-    with codecs.open(outputFilePath, "w", "UTF-8") as outCsvFp:
-        csvDictWriter = csv.DictWriter(outCsvFp, fieldnames=csvHeaders)
+class CsvDictFileWriter(object):
+    """Write (append) row dict into csv file incrementally, not need hold all rows in memory
 
-        # write header by inner function from fieldnames
-        csvDictWriter.writeheader()
+    Examples:
+        with CsvDictFileWriter("output.csv") as csvWriter:
+            for eachRowDict in iterRowDict():
+                csvWriter.writeRow(eachRowDict)
+    """
+
+    def __init__(self, outputFilePath, csvHeaders=None, isAppend=False, fileEncoding="UTF-8"):
+        """
+        Args:
+            outputFilePath (str): output csv file path
+            csvHeaders (list): csv header list. default None to use keys of first row dict
+            isAppend (bool): append to existed file or not. If append to non-empty file, header not write again,
+                and use header of existed file, so row is written in same column order
+            fileEncoding (str): file encoding
+        Raises:
+            ValueError: csvHeaders not same with header of existed file
+        """
+        self.csvHeaders = csvHeaders
+        self.isNeedHeader = not (isAppend and os.path.isfile(outputFilePath) and (os.path.getsize(outputFilePath) > 0))
+        # header list read from existed file
+        self.existedHeaders = None
+        if not self.isNeedHeader:
+            with codecs.open(outputFilePath, "r", encoding=fileEncoding) as existedCsvFp:
+                self.existedHeaders = next(csv.reader(existedCsvFp), None)
+            if self.existedHeaders:
+                # remove BOM if file is saved with utf-8-sig
+                self.existedHeaders[0] = self.existedHeaders[0].lstrip("\ufeff")
+                if self.csvHeaders and (list(self.csvHeaders) != self.existedHeaders):
+                    raise ValueError("csvHeaders %s not same with header %s of existed file %s" % (self.csvHeaders, self.existedHeaders, outputFilePath))
+                self.csvHeaders = self.existedHeaders
+        openMode = "a" if isAppend else "w"
+        self.outCsvFp = codecs.open(outputFilePath, openMode, fileEncoding)
+        self.csvDictWriter = None
+        self.rowNum = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _initWriter(self, firstRowDict):
+        if self.existedHeaders and (set(firstRowDict.keys()) != set(self.existedHeaders)):
+            raise ValueError("row keys %s not match header %s of existed file" % (list(firstRowDict.keys()), self.existedHeaders))
+        if not self.csvHeaders:
+            # generate csv headers from first dict
+            self.csvHeaders = list(firstRowDict.keys())
+        self.csvDictWriter = csv.DictWriter(self.outCsvFp, fieldnames=self.csvHeaders)
+        if self.isNeedHeader:
+            # write header by inner function from fieldnames
+            self.csvDictWriter.writeheader()
+
+    def writeRow(self, rowDict):
+        """write single row dict"""
+        if not self.csvDictWriter:
+            self._initWriter(rowDict)
+        self.csvDictWriter.writerow(rowDict)
+        self.rowNum += 1
+
+    def writeRows(self, rowDictIter):
+        """write all row dict from iterable, eg: generator"""
+        for eachRowDict in rowDictIter:
+            self.writeRow(eachRowDict)
+
+    def close(self):
+        if self.outCsvFp:
+            self.outCsvFp.close()
+            self.outCsvFp = None
 
-        for eachRowDict in csvDictList:
-            csvDictWriter.writerow(eachRowDict)
+def saveToCsvByDictList(csvDictList, outputFilePath):
+    """save row dict list (or any iterable of row dict) into csv file"""
+    with CsvDictFileWriter(outputFilePath) as csvWriter:
+        csvWriter.writeRows(csvDictList)
 
 def saveToCsvByHeaderAndList(csvHeaderList, csvRowListList, outputFilePath):
     with codecs.open(outputFilePath, "w", "UTF-8") as outCsvFp:
@@ -41,6 +41,95 @@ gConst = {
 # Internal Function
 ################################################################################
 
+def _mergeValueList(valueList, memoDict=None):
+    """Merge value list, from low to high priority, same result as merge one by one by recursiveMergeDict
+
+    Only continuous dict (or list) at the end are merged, otherwise the last (highest priority) value is used
+    """
+    lastValue = valueList[-1]
+    if isinstance(lastValue, dict):
+        valueType = dict
+    elif isinstance(lastValue, list):
+        valueType = list
+    else:
+        return lastValue
+
+    startIdx = len(valueList) - 1
+    while (startIdx > 0) and isinstance(valueList[startIdx - 1], valueType):
+        startIdx -= 1
+    if startIdx == (len(valueList) - 1):
+        # nothing to merge, share it
+        return lastValue
+
+    toMergeList = valueList[startIdx:]
+    if memoDict is not None:
+        memoKey = tuple(id(eachValue) for eachValue in toMergeList)
+        if memoKey in memoDict:
+            return memoDict[memoKey][1]
+
+    if valueType is dict:
+        mergedValue = _mergeDictList(toMergeList, memoDict)
+    else:
+        mergedValue = _mergeListList(toMergeList, memoDict)
+
+    if memoDict is not None:
+        # also save input values, keep them alive, so the id in key not reused by other object
+        memoDict[memoKey] = (toMergeList, mergedValue)
+
+    return mergedValue
+
+def _mergeDictList(dictList, memoDict=None):
+    """Merge dict list, from low to high priority, return the highest priority dict itself if nothing changed"""
+    topDict = dictList[-1]
+
+    # key order: keys of higher priority dict first
+    keyToValueListDict = {}
+    for eachDict in reversed(dictList):
+        for eachKey, eachValue in eachDict.items():
+            if eachKey in keyToValueListDict:
+                keyToValueListDict[eachKey].append(eachValue)
+            else:
+                keyToValueListDict[eachKey] = [eachValue]
+
+    mergedDict = {}
+    isSameWithTop = len(keyToValueListDict) == len(topDict)
+    for eachKey, eachValueList in keyToValueListDict.items():
+        if len(eachValueList) == 1:
+            mergedValue = eachValueList[0]
+        else:
+            eachValueList.reverse()
+            mergedValue = _mergeValueList(eachValueList, memoDict)
+        mergedDict[eachKey] = mergedValue
+
+        if isSameWithTop:
+            if (eachKey not in topDict) or (topDict[eachKey] is not mergedValue):
+                isSameWithTop = False
+
+    if isSameWithTop:
+        return topDict
+    else:
+        return mergedDict
+
+def _mergeListList(listList, memoDict=None):
+    """Merge list by index, from low to high priority, return the highest priority list itself if nothing changed"""
+    topList = listList[-1]
+    maxListLen = max(len(eachList) for eachList in listList)
+
+    mergedList = []
+    for curIdx in range(maxListLen):
+        curItemList = [eachList[curIdx] for eachList in listList if curIdx < len(eachList)]
+        if len(curItemList) == 1:
+            mergedItem = curItemList[0]
+        else:
+            mergedItem = _mergeValueList(curItemList, memoDict)
+        mergedList.append(mergedItem)
+
+    isSameWithTop = (len(mergedList) == len(topList)) and all((mergedItem is topItem) for mergedItem, topItem in zip(mergedList, topList))
+    if isSameWithTop:
+        return topList
+    else:
+        return mergedList
+
 
 ################################################################################
 #  Function
@@ -114,6 +203,7 @@ cDict = recursiveMergeDict(aDict, copy.deepcopy(bDict))
 
 Note:
 bDict should use deepcopy, otherwise will be altered after call this function !!!
+or use mergeDict, which not alter input and not need deepcopy
 
     """
     aDictItems = None
@@ -152,6 +242,40 @@ bDict should use deepcopy, otherwise will be altered after call this function !!
 
     return bDict
 
+def mergeDictLayers(layerDictList, memoDict=None):
+    """
+    Merge multiple layers of dict in single traversal, return merged dict, not alter any input dict
+    Later layer has higher priority: for same key, value of last layer wins (layer2 > layer1 > layer0)
+    Same result as recursiveMergeDict one by one (dict by key, list by index), value in bDict wins:
+        recursiveMergeDict(layer0, recursiveMergeDict(layer1, copy.deepcopy(layer2)))
+    but only copy the changed paths, untouched sub dict/list are shared with input,
+    and if other layers change nothing, result may be the input dict itself
+    (so do NOT alter result in place, or use copy.deepcopy(result) before alter)
+
+    Args:
+        layerDictList (list): dict list, from low to high priority, eg: [defaultConfig, userConfig, cmdLineConfig]
+        memoDict (dict): optional cache, key is id of input dicts, value is merged result.
+            pass same dict for repeated merge of same (not modified) layers, to reuse the merged result
+    Returns:
+        merged dict
+    Raises:
+    Examples:
+        mergeDictLayers([{"a": 1, "sub": {"x": 1, "y": 2}}, {"a": 2, "sub": {"x": 3}}])
+        -> {"a": 2, "sub": {"x": 3, "y": 2}}
+    """
+    if not layerDictList:
+        return {}
+    return _mergeValueList(list(layerDictList), memoDict)
+
+def mergeDict(aDict, bDict, memoDict=None):
+    """
+    Recursively merge dict a to b, return merged dict, not alter a and b
+    Same result as recursiveMergeDict(aDict, copy.deepcopy(bDict)), but only copy the changed paths:
+    untouched sub dict/list are shared with input, and if aDict change nothing, result is bDict itself
+    (so do NOT alter result in place, or use copy.deepcopy(result) before alter)
+    """
+    return mergeDictLayers([aDict, bDict], memoDict)
+
 def sortDictByKey(originDict):
     """
         Sort dict by key
@@ -20,19 +20,16 @@ import codecs
 import json
 import re
 import zipfile
-
-try:
-    import pysrt
-except ImportError:
-    print("need pysrt if using crifanFile functions: extractRawSubtitleList")
-
-try:
-    import chardet
-except ImportError:
-    print("need chardet if using crifanFile functions: extractRawSubtitleList")
+import queue
+import concurrent.futures
 
 # from . import crifanList
 import crifanLib.crifanList
+import crifanLib.crifanSystem
+
+# optional libs, only import when first used
+pysrt = crifanLib.crifanSystem.lazyImport("pysrt", "need pysrt if using crifanFile functions: extractRawSubtitleList")
+chardet = crifanLib.crifanSystem.lazyImport("chardet", "need chardet if using crifanFile functions: extractRawSubtitleList")
 
 ################################################################################
 # Config
@@ -310,39 +307,199 @@ def createFolder(folderFullPath):
     """
     os.makedirs(folderFullPath, exist_ok=True)
 
-def listSubfolderFiles(subfolder, isIncludeFolder=True, isRecursive=False):
-    """os.listdir recursively
+def iterSubfolderFiles(subfolder, isIncludeFolder=True, isRecursive=False):
+    """Generator version of listSubfolderFiles, yield each path lazily, use os.scandir cached entry type
 
     Args:
         subfolder (str): sub folder path
         isIncludeFolder (bool): whether is include folder. Default is True. If True, result contain folder
         isRecursive (bool): whether is recursive, means contain sub folder. Default is False
     Returns:
-        list of str
+        generator of str
     Raises:
     """
-    allSubItemList = []
-    curSubItemList = os.listdir(path=subfolder)
-    for curSubItem in curSubItemList:
-        curSubItemFullPath = os.path.join(subfolder, curSubItem)
-        if os.path.isfile(curSubItemFullPath):
-            allSubItemList.append(curSubItemFullPath)
+    # read out all entries first, avoid keep too many folder opened when recursive
+    with os.scandir(subfolder) as dirEntryIter:
+        curSubEntryList = list(dirEntryIter)
+
+    for curSubEntry in curSubEntryList:
+        if curSubEntry.is_file():
+            yield curSubEntry.path
         else:
             if isIncludeFolder:
-                if os.path.isdir(curSubItemFullPath):
-                    subSubItemList = listSubfolderFiles(curSubItemFullPath, isIncludeFolder, isRecursive)
-                    allSubItemList.extend(subSubItemList)
+                if curSubEntry.is_dir():
+                    yield from iterSubfolderFiles(curSubEntry.path, isIncludeFolder, isRecursive)
 
     if isIncludeFolder:
-        allSubItemList.append(subfolder)
+        yield subfolder
+
+def listSubfolderFiles(subfolder, isIncludeFolder=True, isRecursive=False):
+    """os.listdir recursively
 
+    Args:
+        subfolder (str): sub folder path
+        isIncludeFolder (bool): whether is include folder. Default is True. If True, result contain folder
+        isRecursive (bool): whether is recursive, means contain sub folder. Default is False
+    Returns:
+        list of str
+    Raises:
+    """
+    allSubItemList = list(iterSubfolderFiles(subfolder, isIncludeFolder, isRecursive))
     return allSubItemList
 
+def _scanFolder(folderPath, isFollowSymlinks=False, isCalcSize=False, isIgnoreError=True):
+    """scandir single folder
+
+    Returns:
+        (file entry list, sub folder entry list, total size of files directly inside this folder) (tuple)
+    """
+    fileEntryList = []
+    subFolderEntryList = []
+    totalFileSize = 0
+    try:
+        with os.scandir(folderPath) as dirEntryIter:
+            for curEntry in dirEntryIter:
+                if curEntry.is_dir(follow_symlinks=isFollowSymlinks):
+                    subFolderEntryList.append(curEntry)
+                elif curEntry.is_file(follow_symlinks=isFollowSymlinks):
+                    fileEntryList.append(curEntry)
+                    if isCalcSize:
+                        # DirEntry cache the stat, later call not need syscall again
+                        totalFileSize += curEntry.stat(follow_symlinks=isFollowSymlinks).st_size
+    except OSError:
+        # PermissionError, folder removed during walk, ...
+        if not isIgnoreError:
+            raise
+    return fileEntryList, subFolderEntryList, totalFileSize
+
+def _filterVisitedFolder(subFolderEntryList, visitedFolderKeySet, isIgnoreError=True):
+    """remove already visited folder (same (st_dev, st_ino)), to avoid endless loop of symbolic link, eg: a/link -> ..
+
+    Returns:
+        not visited sub folder entry list, and add them into visitedFolderKeySet
+    """
+    newSubFolderEntryList = []
+    for eachSubFolderEntry in subFolderEntryList:
+        try:
+            folderStat = eachSubFolderEntry.stat(follow_symlinks=True)
+        except OSError:
+            if not isIgnoreError:
+                raise
+            continue
+        folderKey = (folderStat.st_dev, folderStat.st_ino)
+        if folderKey not in visitedFolderKeySet:
+            visitedFolderKeySet.add(folderKey)
+            newSubFolderEntryList.append(eachSubFolderEntry)
+    return newSubFolderEntryList
+
+def walkFolder(rootFolder, isFollowSymlinks=False, isCalcSize=False, threadNum=0, isIgnoreError=True):
+    """Walk folder lazily based on os.scandir, similar with os.walk, but yield os.DirEntry
+
+    Args:
+        rootFolder (str): root folder path
+        isFollowSymlinks (bool): whether follow symbolic link of file and folder.
+            If True, each real folder is only walked once, so symbolic link loop will not walk forever
+        isCalcSize (bool): whether calculate total size of files directly inside each folder
+        threadNum (int): thread pool size. 0 means walk in current thread. If > 0, sub folders are scanned in parallel,
+            and yielded folder order is not fixed, but parent folder is always yielded before its sub folders
+        isIgnoreError (bool): whether ignore error when scandir folder, such as no permission
+    Returns:
+        generator of (folder path, file entry list, sub folder entry list, total file size) (tuple)
+            total file size is 0 if not isCalcSize
+    Raises:
+    Examples:
+        for folderPath, fileEntryList, subFolderEntryList, _ in walkFolder("/Users/crifan/media"):
+            for eachFileEntry in fileEntryList:
+                print(eachFileEntry.path)
+    """
+    visitedFolderKeySet = None
+    if isFollowSymlinks:
+        rootStat = os.stat(rootFolder)
+        visitedFolderKeySet = {(rootStat.st_dev, rootStat.st_ino)}
+
+    if threadNum > 0:
+        doneFutureQueue = queue.Queue()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threadNum) as threadPool:
+            def _submitScan(folderPath):
+                curFuture = threadPool.submit(_scanFolder, folderPath, isFollowSymlinks, isCalcSize, isIgnoreError)
+                curFuture.folderPath = folderPath
+                curFuture.add_done_callback(doneFutureQueue.put)
+
+            _submitScan(rootFolder)
+            pendingNum = 1
+            while pendingNum > 0:
+                doneFuture = doneFutureQueue.get()
+                pendingNum -= 1
+                fileEntryList, subFolderEntryList, totalFileSize = doneFuture.result()
+                if visitedFolderKeySet is not None:
+                    subFolderEntryList = _filterVisitedFolder(subFolderEntryList, visitedFolderKeySet, isIgnoreError)
+                for eachSubFolderEntry in subFolderEntryList:
+                    _submitScan(eachSubFolderEntry.path)
+                    pendingNum += 1
+                yield doneFuture.folderPath, fileEntryList, subFolderEntryList, totalFileSize
+    else:
+        folderStack = [rootFolder]
+        while folderStack:
+            folderPath = folderStack.pop()
+            fileEntryList, subFolderEntryList, totalFileSize = _scanFolder(folderPath, isFollowSymlinks, isCalcSize, isIgnoreError)
+            if visitedFolderKeySet is not None:
+                subFolderEntryList = _filterVisitedFolder(subFolderEntryList, visitedFolderKeySet, isIgnoreError)
+            yield folderPath, fileEntryList, subFolderEntryList, totalFileSize
+            # keep scandir order for sub folders
+            for eachSubFolderEntry in reversed(subFolderEntryList):
+                folderStack.append(eachSubFolderEntry.path)
+
+def iterFolderFiles(rootFolder, isFollowSymlinks=False, threadNum=0):
+    """Yield all file os.DirEntry under folder recursively, lazily
+
+    Args:
+        rootFolder (str): root folder path
+        isFollowSymlinks (bool): whether follow symbolic link of file and folder
+        threadNum (int): thread pool size, see walkFolder
+    Returns:
+        generator of os.DirEntry, use entry.path for full path, entry.stat() for (cached) stat
+    Raises:
+    """
+    for _, fileEntryList, _, _ in walkFolder(rootFolder, isFollowSymlinks=isFollowSymlinks, threadNum=threadNum):
+        yield from fileEntryList
+
 ################################################################################
 # File and Folder Function
 ################################################################################
 
-def getFileFolderSize(fileOrFolderPath):
+def calcFolderSize(rootFolder, isFollowSymlinks=False, threadNum=0, isIgnoreError=True):
+    """Calculate total size of each folder (include all sub folders) in single walk
+
+    Args:
+        rootFolder (str): root folder path
+        isFollowSymlinks (bool): whether follow symbolic link of file and folder
+        threadNum (int): thread pool size, see walkFolder
+        isIgnoreError (bool): whether ignore error (such as no permission) when scan folder, see walkFolder
+    Returns:
+        dict, folder path -> total size in bytes of this folder
+    Raises:
+    Examples:
+        {"/Users/crifan/media": 5800007, "/Users/crifan/media/image": 5041481, ...}
+    """
+    folderSizeDict = {}
+    # sub folder -> its parent folder
+    parentFolderDict = {}
+    # parent folder always before its sub folders
+    walkedFolderList = []
+    for folderPath, _, subFolderEntryList, totalFileSize in walkFolder(rootFolder, isFollowSymlinks=isFollowSymlinks, isCalcSize=True, threadNum=threadNum, isIgnoreError=isIgnoreError):
+        folderSizeDict[folderPath] = totalFileSize
+        walkedFolderList.append(folderPath)
+        for eachSubFolderEntry in subFolderEntryList:
+            parentFolderDict[eachSubFolderEntry.path] = folderPath
+
+    # add size from bottom to top
+    for eachFolderPath in reversed(walkedFolderList):
+        if eachFolderPath in parentFolderDict:
+            folderSizeDict[parentFolderDict[eachFolderPath]] += folderSizeDict[eachFolderPath]
+
+    return folderSizeDict
+
+def getFileFolderSize(fileOrFolderPath, threadNum=0):
     """get size for file or folder"""
     totalSize = 0
 
@@ -354,16 +511,9 @@ def getFileFolderSize(fileOrFolderPath):
         return totalSize
 
     if os.path.isdir(fileOrFolderPath):
-        with os.scandir(fileOrFolderPath) as dirEntryList:
-            for curSubEntry in dirEntryList:
-                curSubEntryFullPath = os.path.join(fileOrFolderPath, curSubEntry.name)
-                if curSubEntry.is_dir():
-                    curSubFolderSize = getFileFolderSize(curSubEntryFullPath) # 5800007
-                    totalSize += curSubFolderSize
-                elif curSubEntry.is_file():
-                    curSubFileSize = os.path.getsize(curSubEntryFullPath) # 1891
-                    totalSize += curSubFileSize
-
+        # same as before: follow symbolic link (each real folder only count once), raise error such as no permission
+        folderSizeDict = calcFolderSize(fileOrFolderPath, isFollowSymlinks=True, threadNum=threadNum, isIgnoreError=False)
+        totalSize = folderSizeDict[fileOrFolderPath] # 5800007
         return totalSize
 
 
@@ -30,8 +30,6 @@ except ImportError:
 # from . import crifanSystem
 import crifanLib.crifanSystem
 
-from .thirdParty.crifanBeautifulsoup import extractHtmlTitle_BeautifulSoup
-
 ################################################################################
 # Config
 ################################################################################
@@ -60,10 +58,81 @@ gVal = {
 gConst = {
 }
 
+# html entity codec lookup tables, only build once when import
+# "&aring;" -> "&#229;"
+HtmlEntityNameToCodepointDict = {}
+# "&#229;" -> "&aring;"
+HtmlEntityCodepointToNameDict = {}
+for eachName, eachCodepoint in htmlentitydefs.name2codepoint.items():
+    HtmlEntityNameToCodepointDict["&%s;" % eachName] = "&#%s;" % eachCodepoint
+for eachCodepoint, eachName in htmlentitydefs.codepoint2name.items():
+    HtmlEntityCodepointToNameDict["&#%s;" % eachCodepoint] = "&%s;" % eachName
+
+# max length of a full entity, eg: "&thetasym;", "&#x1F600;"
+HtmlEntityMaxLen = max(len("&#x12345;"), max(len(eachKey) for eachKey in HtmlEntityNameToCodepointDict))
+
+# one pass match, then lookup in dict, unknown one is kept as is
+HtmlEntityNameP = re.compile("&[a-zA-Z][a-zA-Z0-9]*;")
+HtmlEntityCodepointP = re.compile(r"&#\d+;")
+# &copy; / &#169; / &#xa9;
+HtmlEntityAnyP = re.compile(r"&(?:(?P<entityName>[a-zA-Z]{2,10})|#(?P<codePointInt>\d{2,5})|#x(?P<codePointHex>[a-fA-F\d]{2,5}));")
+
 ################################################################################
 # Internal Function
 ################################################################################
 
+def _entityNameToCodepoint(matched):
+    wholeStr = matched.group(0)
+    return HtmlEntityNameToCodepointDict.get(wholeStr, wholeStr)
+
+def _entityCodepointToName(matched):
+    wholeStr = matched.group(0)
+    return HtmlEntityCodepointToNameDict.get(wholeStr, wholeStr)
+
+def _decodeEntity(matched):
+    entityName = matched.group("entityName")
+    if entityName is not None:
+        if entityName in htmlentitydefs.name2codepoint:
+            return codePointToChar(htmlentitydefs.name2codepoint[entityName])
+        else:
+            # invalid key, just omit it
+            # &Dryer; from Washer&Dryer;, Awning,
+            return matched.group(0)
+
+    codePointInt = matched.group("codePointInt")
+    if codePointInt is not None:
+        return codePointToChar(int(codePointInt))
+
+    return codePointToChar(int(matched.group("codePointHex"), 16))
+
+def _subEntityStream(chunkIter, entityPattern, replaceFunc):
+    """Replace html entity for each chunk of string, keep the possible unfinished entity at chunk end to next chunk
+
+    Args:
+        chunkIter (iterable): iterable of str chunk
+        entityPattern (Pattern): compiled entity pattern
+        replaceFunc (function): replace function for each matched entity
+    Returns:
+        generator of replaced str chunk
+    Raises:
+    """
+    pendingStr = ""
+    for eachChunk in chunkIter:
+        curStr = pendingStr + eachChunk
+        pendingStr = ""
+        lastAmpIdx = curStr.rfind("&")
+        if lastAmpIdx >= 0:
+            tailStr = curStr[lastAmpIdx:]
+            # "...&nb" + "sp;..." -> wait next chunk
+            if (";" not in tailStr) and (len(tailStr) < HtmlEntityMaxLen):
+                pendingStr = tailStr
+                curStr = curStr[:lastAmpIdx]
+
+        if curStr:
+            yield entityPattern.sub(replaceFunc, curStr)
+
+    if pendingStr:
+        yield entityPattern.sub(replaceFunc, pendingStr)
 
 ################################################################################
 # HTML Function
@@ -128,43 +197,9 @@ def decodeHtmlEntity(origHtml, decodedEncoding=""):
     # when use:
     # decodedEntityName = re.sub('&(?P<entityName>[a-zA-Z]{2,10});', lambda matched: unichr(htmlentitydefs.name2codepoint[matched.group("entityName")]), origHtml);
 
-    # logging.debug("origHtml=%s", origHtml)
-    def _nameToCodepoint(matched):
-        # logging.debug("matched=%s", matched)
-        wholeStr = matched.group(0)
-        # logging.debug("wholeStr=%s", wholeStr)
-        decodedUnicodeChar = ""
-        entityName = matched.group("entityName")
-        # logging.debug("entityName=%s", entityName)
-        if (entityName in htmlentitydefs.name2codepoint):
-            decodedCodepoint = htmlentitydefs.name2codepoint[entityName]
-            # logging.debug("decodedCodepoint=%s", decodedCodepoint)
-            decodedUnicodeChar = codePointToChar(decodedCodepoint)
-        else:
-            # invalid key, just omit it
-
-            # http://autoexplosion.com/RVs/buy/9882.php
-            # &Dryer;
-            # from
-            # Washer&Dryer;, Awning,
-            decodedUnicodeChar = wholeStr
-        # logging.debug("decodedUnicodeChar=%s", decodedUnicodeChar)
-        return decodedUnicodeChar
-
-    decodedEntityName = re.sub('&(?P<entityName>[a-zA-Z]{2,10});', _nameToCodepoint, origHtml);
-    # logging.info("decodedEntityName=%s", decodedEntityName);
-
-    # print "type(decodedEntityName)=",type(decodedEntityName); #type(decodedEntityName)= <type 'unicode'>
-    decodedCodepointInt = re.sub('&#(?P<codePointInt>\d{2,5});',
-                                 lambda matched: codePointToChar(int(matched.group("codePointInt"))), decodedEntityName)
-    # print "decodedCodepointInt=",decodedCodepointInt
-    decodedCodepointHex = re.sub('&#x(?P<codePointHex>[a-fA-F\d]{2,5});',
-                                 lambda matched: codePointToChar(int(matched.group("codePointHex"), 16)),
-                                 decodedCodepointInt)
-    # print "decodedCodepointHex=",decodedCodepointHex
-
-    # logging.info("origHtml=%s", origHtml);
-    decodedHtml = decodedCodepointHex
+    # Note: name, decimal and hex entity are all decoded in single pass
+    # so double encoded entity like "&#38;#x3c;" only decode once into "&#x3c;"
+    decodedHtml = HtmlEntityAnyP.sub(_decodeEntity, origHtml)
     # logging.info("decodedHtml=%s", decodedHtml); #type(decodedHtml)= <type 'unicode'>
 
     # here mabye is unicode string
@@ -194,16 +229,7 @@ def htmlEntityNameToCodepoint(htmlWithEntityName):
     # "&gt":    "&#62;",
     # "&sup":   "&#8835;",
     # "&Ntilde":"&#209;",
-    nameToCodepointDict = {}
-    for eachName in htmlentitydefs.name2codepoint:
-        fullName = "&" + eachName + ";"
-        fullCodepoint = "&#" + str(htmlentitydefs.name2codepoint[eachName]) + ";"
-        nameToCodepointDict[fullName] = fullCodepoint
-
-    # "&aring;" -> "&#229;"
-    htmlWithCodepoint = htmlWithEntityName
-    for key in nameToCodepointDict.keys():
-        htmlWithCodepoint = re.compile(key).sub(nameToCodepointDict[key], htmlWithCodepoint)
+    htmlWithCodepoint = HtmlEntityNameP.sub(_entityNameToCodepoint, htmlWithEntityName)
     return htmlWithCodepoint
 
 
@@ -224,19 +250,44 @@ def htmlEntityCodepointToName(htmlWithCodepoint):
     # "&#8194;": "&ensp;",
     # "&#8195;": "&emsp;",
     # "&#8709;": "&empty;",
-    codepointToNameDict = {}
-    for eachCodepoint in htmlentitydefs.codepoint2name:
-        fullCodepoint = "&#" + str(eachCodepoint) + ";"
-        fullName = "&" + htmlentitydefs.codepoint2name[eachCodepoint] + ";"
-        codepointToNameDict[fullCodepoint] = fullName
-
-    # "&#160;" -> "&nbsp;"
-    htmlWithEntityName = htmlWithCodepoint
-    for key in codepointToNameDict.keys():
-        htmlWithEntityName = re.compile(key).sub(codepointToNameDict[key], htmlWithEntityName)
+    htmlWithEntityName = HtmlEntityCodepointP.sub(_entityCodepointToName, htmlWithCodepoint)
     return htmlWithEntityName
 
 
+def decodeHtmlEntityStream(chunkIter):
+    """Streaming version of decodeHtmlEntity, for large html file
+
+    Args:
+        chunkIter (iterable): iterable of str chunk, eg: iter(lambda: fp.read(65536), "")
+    Returns:
+        generator of decoded str chunk
+    Raises:
+    """
+    return _subEntityStream(chunkIter, HtmlEntityAnyP, _decodeEntity)
+
+def htmlEntityNameToCodepointStream(chunkIter):
+    """Streaming version of htmlEntityNameToCodepoint, for large html file
+
+    Args:
+        chunkIter (iterable): iterable of str chunk, eg: iter(lambda: fp.read(65536), "")
+    Returns:
+        generator of converted str chunk
+    Raises:
+    """
+    return _subEntityStream(chunkIter, HtmlEntityNameP, _entityNameToCodepoint)
+
+def htmlEntityCodepointToNameStream(chunkIter):
+    """Streaming version of htmlEntityCodepointToName, for large html file
+
+    Args:
+        chunkIter (iterable): iterable of str chunk, eg: iter(lambda: fp.read(65536), "")
+    Returns:
+        generator of converted str chunk
+    Raises:
+    """
+    return _subEntityStream(chunkIter, HtmlEntityCodepointP, _entityCodepointToName)
+
+
 def filterHtmlTag(origHtml):
     """
     filter html tag, but retain its contents
@@ -327,6 +378,8 @@ def extractHtmlTitle(htmlStr):
     # curTitle = extractHtmlTitle_re(htmlStr)
 
     # # Method 2: use BeautifulSoup
+    # import here to avoid load BeautifulSoup when not use it
+    from .thirdParty.crifanBeautifulsoup import extractHtmlTitle_BeautifulSoup
     curTitle = extractHtmlTitle_BeautifulSoup(htmlStr)
 
     return curTitle
@@ -13,8 +13,6 @@ __copyright__ = "Copyright (c) 2025, Crifan Li"
 __license__ = "GPL"
 
 
-# from . import crifanString
-import crifanLib.crifanString
 import crifanLib.crifanSystem
 
 
@@ -40,6 +38,43 @@ gConst = {
 # Internal Function
 ################################################################################
 
+# tag for canonical key of unhashable item, avoid conflict with real tuple item
+_UnhashableKeyTag = object()
+
+def _toHashableKey(curItem):
+    """Convert item to hashable key, for unhashable item(dict/list/set), generate canonical key recursively
+
+    Examples:
+        {"b": [1, 2], "a": 1} -> (tag, "dict", frozenset({("a", 1), ("b", (tag, "list", (1, 2)))}))
+    """
+    try:
+        hash(curItem)
+        return curItem
+    except TypeError:
+        pass
+
+    if isinstance(curItem, dict):
+        return (_UnhashableKeyTag, "dict", frozenset((_toHashableKey(eachKey), _toHashableKey(eachValue)) for eachKey, eachValue in curItem.items()))
+    elif isinstance(curItem, (set, frozenset)):
+        return (_UnhashableKeyTag, "set", frozenset(_toHashableKey(eachValue) for eachValue in curItem))
+    elif isinstance(curItem, list):
+        return (_UnhashableKeyTag, "list", tuple(_toHashableKey(eachValue) for eachValue in curItem))
+    elif isinstance(curItem, tuple):
+        # tuple with unhashable value, not same as list, eg: (1, [2]) != [1, [2]]
+        return (_UnhashableKeyTag, "tuple", tuple(_toHashableKey(eachValue) for eachValue in curItem))
+    else:
+        return (_UnhashableKeyTag, type(curItem).__name__, repr(curItem))
+
+def _iterItemKey(itemIter, keyFunc=None):
+    """Yield (item, hashable key) for each item, use keyFunc if provided"""
+    for curItem in itemIter:
+        curKey = keyFunc(curItem) if keyFunc else curItem
+        try:
+            hash(curKey)
+        except TypeError:
+            curKey = _toHashableKey(curKey)
+        yield curItem, curKey
+
 
 ################################################################################
 # List Function
@@ -62,22 +97,39 @@ gConst = {
 #     newList = list(newSet)
 #     return newList
 
-def uniqueList(oldList):
-    """unique list
+def iterUniqueList(itemIter, keyFunc=None):
+    """Lazily yield unique item, keep first seen order, O(n)
 
     Args:
-        oldList (list): old list
+        itemIter (iterable): list or any iterable, eg: generator of stream
+        keyFunc (function): function to get key of item to compare. default None to use item itself.
+            unhashable item, such as dict/list, is converted into canonical key
     Returns:
-        uniqued new list
+        generator of unique item
     Raises:
+    Examples:
+        list(iterUniqueList([3, 1, 3, {"a": 1}, {"a": 1}])) -> [3, 1, {"a": 1}]
     """
-    newList = []
-    for curItem in oldList:
-        if curItem not in newList:
-            newList.append(curItem)
+    seenKeySet = set()
+    for curItem, curKey in _iterItemKey(itemIter, keyFunc):
+        if curKey not in seenKeySet:
+            seenKeySet.add(curKey)
+            yield curItem
         # else:
         #     # for debug
         #     print("Duplicated %s" % curItem)
+
+def uniqueList(oldList, keyFunc=None):
+    """unique list, keep first seen order
+
+    Args:
+        oldList (list): old list
+        keyFunc (function): function to get key of item to compare. default None to use item itself
+    Returns:
+        uniqued new list
+    Raises:
+    """
+    newList = list(iterUniqueList(oldList, keyFunc=keyFunc))
     return newList
 
 
@@ -90,23 +142,14 @@ def genListStr(listValue, encForUniVal="UTF-8", isRetainLastComma=False, delimit
     """
     # print "listValue=",listValue;
 
-    generatedListStr = ""
-    for eachValue in listValue:
-        if crifanLib.crifanSystem.isPython2():
-            if isinstance(eachValue, unicode):
-                encodedStr = eachValue.encode(encForUniVal)
-                generatedListStr += encodedStr
-            else:
-                generatedListStr += str(eachValue)
-        else:
-            generatedListStr += str(eachValue)
+    if crifanLib.crifanSystem.isPython2():
+        valueStrList = [eachValue.encode(encForUniVal) if isinstance(eachValue, unicode) else str(eachValue) for eachValue in listValue]
+    else:
+        valueStrList = [str(eachValue) for eachValue in listValue]
 
+    generatedListStr = delimiter.join(valueStrList)
+    if isRetainLastComma and valueStrList:
         generatedListStr += delimiter
-
-    if (not isRetainLastComma):
-        if (generatedListStr and (generatedListStr[-1] == delimiter)):
-            # remove last ,
-            generatedListStr = generatedListStr[:-1]
     return generatedListStr
 
 
@@ -119,18 +162,38 @@ def removeEmptyInList(list):
     return newList
 
 
-def filterList(listToFilter, listToCompare):
+def iterFilterList(itemIter, listToCompare, keyFunc=None):
+    """Lazily yield (item, isExisted) for each item, isExisted means item is in listToCompare, O(n)
+
+    Args:
+        itemIter (iterable): list or any iterable to filter, eg: generator of stream
+        listToCompare (iterable): items to compare, only iterate once to build key set
+        keyFunc (function): function to get key of item to compare. default None to use item itself
+    Returns:
+        generator of (item, isExisted) (tuple)
+    Raises:
+    Examples:
+        list(iterFilterList(["a", "b"], ["b"])) -> [("a", False), ("b", True)]
+    """
+    compareKeySet = set(eachKey for _, eachKey in _iterItemKey(listToCompare, keyFunc))
+    for curItem, curKey in _iterItemKey(itemIter, keyFunc):
+        isExisted = curKey in compareKeySet
+        yield curItem, isExisted
+
+
+def filterList(listToFilter, listToCompare, keyFunc=None):
     """
         for listToFilter, remove the ones which is in listToCompare,
         also return the ones which is already exist in listToCompare
     :param listToFilter:
     :param listToCompare:
+    :param keyFunc: function to get key of item to compare. default None to use item itself
     :return:
     """
     filteredList = []
     existedList = []
-    for singleOne in listToFilter:  # remove processed
-        if (not (singleOne in listToCompare)):
+    for singleOne, isExisted in iterFilterList(listToFilter, listToCompare, keyFunc=keyFunc):  # remove processed
+        if not isExisted:
             # omit the ones in listToCompare
             filteredList.append(singleOne)
         else:
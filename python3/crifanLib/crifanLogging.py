@@ -13,8 +13,17 @@ __copyright__ = "Copyright (c) 2024, Crifan Li"
 __license__ = "GPL"
 
 import logging
+import logging.handlers
 import os
 import sys
+import re
+import json
+import operator
+import time
+import queue
+import atexit
+import threading
+import codecs
 
 try:
     import curses  # type: ignore
@@ -107,6 +116,17 @@ LOG_FORMAT_CONSOLE_DATETIME = "%Y%m%d %H:%M:%S"
 LOG_LEVEL_CONSOLE = logging.INFO
 # LOG_LEVEL_CONSOLE = logging.DEBUG
 
+# record fields output for JSON lines log (loggingInit isFileJsonLines=True)
+LOG_JSON_FIELD_LIST = ["created", "levelname", "name", "filename", "lineno", "message"]
+
+# for async logging (loggingInit isAsync=True)
+# max seconds of log kept in buffer before write into file
+LOG_ASYNC_FLUSH_INTERVAL_SECONDS = 1.0
+# file write buffer size
+LOG_ASYNC_FILE_BUFFER_SIZE = 256 * 1024
+# max records handled in one batch, before check whether need flush
+LOG_ASYNC_BATCH_SIZE = 1000
+
 
 ################################################################################
 # Constant
@@ -245,6 +265,9 @@ gBackground = AnsiBackground()
 gStyle = AnsiStyle()
 gCursor = AnsiCursor()
 
+# current async log listener, created by loggingInit(isAsync=True)
+gAsyncLogListener = None
+
 # LogLevelToColor = {
 #     logging.DEBUG: gForeground.CYAN,
 #     logging.INFO: gForeground.GREEN,
@@ -307,7 +330,27 @@ def _stderr_supports_color():
 
     return False
 
-class LogFormatter(logging.Formatter):
+class CachedTimeFormatter(logging.Formatter):
+    """
+    logging Formatter, reuse formatted time string for records in same second,
+    to avoid call time.strftime for each record
+    """
+
+    def formatTime(self, record, datefmt=None):
+        if not datefmt:
+            # default format contains milliseconds, can not cache
+            return logging.Formatter.formatTime(self, record, datefmt)
+
+        cacheKey = (int(record.created), datefmt)
+        # (cacheKey, timeStr), assign as whole, so is thread safe
+        timeCache = getattr(self, "_timeCache", None)
+        if (not timeCache) or (timeCache[0] != cacheKey):
+            timeStr = time.strftime(datefmt, self.converter(record.created))
+            timeCache = (cacheKey, timeStr)
+            self._timeCache = timeCache
+        return timeCache[1]
+
+class LogFormatter(CachedTimeFormatter):
     """
     Log formatter used in Tornado. Key features of this formatter are:
     * Color support when logging to a terminal that supports it.
@@ -400,6 +443,290 @@ class LogFormatter(logging.Formatter):
             formatted = '\n'.join(lines)
         return formatted.replace("\n", "\n    ")
 
+class CompiledLogFormatter(LogFormatter):
+    """
+    Same output as LogFormatter, but faster:
+    * fmt is compiled once into positional template and record field getter
+    * only calc asctime/color when fmt use it, only indent when message has multiple lines
+    """
+    FieldInFmtRegex = re.compile(r"%%|%\((?P<fieldName>\w+)\)")
+
+    def __init__(self, *args, **kwargs):
+        LogFormatter.__init__(self, *args, **kwargs)
+        self.compileFormat(self._fmt)
+
+    def compileFormat(self, fmt):
+        """
+        Compile fmt, eg:
+            "%(asctime)s %(lineno)-4d %(message)s"
+        into
+            template: "%s %-4d %s"
+            field name list: ["asctime", "lineno", "message"]
+        """
+        fieldNameList = []
+
+        def _replaceField(matchObj):
+            fieldName = matchObj.group("fieldName")
+            if fieldName is None:
+                # keep "%%"
+                return matchObj.group(0)
+            fieldNameList.append(fieldName)
+            return "%"
+
+        self._fmtTemplate = self.FieldInFmtRegex.sub(_replaceField, fmt)
+        self._isUseAsctime = "asctime" in fieldNameList
+        self._isUseColor = bool(self._colors) and (("color" in fieldNameList) or ("end_color" in fieldNameList))
+        if fieldNameList:
+            fieldGetter = operator.itemgetter(*fieldNameList)
+            if len(fieldNameList) == 1:
+                # itemgetter with single item return value, not tuple
+                self._getFieldValues = lambda recordDict: (fieldGetter(recordDict), )
+            else:
+                self._getFieldValues = fieldGetter
+        else:
+            self._getFieldValues = lambda recordDict: ()
+
+    def format(self, record):
+        try:
+            message = record.getMessage()
+            if not isinstance(message, unicode_type):
+                message = _safe_unicode(message)
+            record.message = message
+        except Exception as e:
+            record.message = "Bad message (%r): %r" % (e, record.__dict__)
+
+        if self._isUseAsctime:
+            record.asctime = self.formatTime(record, self.datefmt)
+
+        if self._isUseColor and (record.levelno in self._colors):
+            record.color = self._colors[record.levelno]
+            record.end_color = self._normal
+        else:
+            record.color = record.end_color = ''
+
+        formatted = self._fmtTemplate % self._getFieldValues(record.__dict__)
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            lines = [formatted.rstrip()]
+            lines.extend(
+                _safe_unicode(ln) for ln in record.exc_text.split('\n'))
+            formatted = '\n'.join(lines)
+
+        if "\n" in formatted:
+            formatted = formatted.replace("\n", "\n    ")
+        return formatted
+
+class JsonLogFormatter(CachedTimeFormatter):
+    """
+    Format record into single line json (JSON lines), output record fields directly, no fmt string interpolation,
+    for log shipper to parse.
+    Output: {"created": 1760000000.123, "levelname": "INFO", ..., "message": "xxx"}
+        and "exc_text"/"stack_info" if exists
+    """
+
+    def __init__(self, fieldList=LOG_JSON_FIELD_LIST, datefmt=None, isEnsureAscii=False):
+        """
+        :param fieldList: record field name list, support record attributes (including extra), and "message", "asctime"
+        :param datefmt: datetime format for "asctime"
+        """
+        CachedTimeFormatter.__init__(self, datefmt=datefmt)
+        self.fieldList = list(fieldList)
+        self.isUseAsctime = "asctime" in self.fieldList
+        # create encoder once, json.dumps with non default para create new encoder for each call
+        # default=str: for not json serializable extra field value
+        self.jsonEncoder = json.JSONEncoder(ensure_ascii=isEnsureAscii, default=str)
+
+    def format(self, record):
+        record.message = record.getMessage()
+        if self.isUseAsctime:
+            record.asctime = self.formatTime(record, self.datefmt)
+        recordDict = record.__dict__
+        logDict = {eachField: recordDict.get(eachField) for eachField in self.fieldList}
+
+        if record.exc_info and (not record.exc_text):
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            logDict["exc_text"] = record.exc_text
+        if record.stack_info:
+            logDict["stack_info"] = self.formatStack(record.stack_info)
+
+        return self.jsonEncoder.encode(logDict)
+
+class EnqueueOnlyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler which only put record into queue, not format message in caller thread,
+    all format and output is done in listener thread.
+    Note: message args is formatted later, so should not change (mutable) args object after log call
+    """
+
+    def prepare(self, record):
+        return record
+
+class BufferedRotatingFileHandler(logging.Handler):
+    """
+    File handler with buffered write (not flush for each record), and optional rotation by size and/or time.
+    Call flush() to write out buffer, AsyncLogListener flush it periodically.
+    Rotated files: xxx.log.1 (newest), xxx.log.2, ..., xxx.log.<backupCount>
+    """
+
+    def __init__(self, filename, mode="w", encoding="utf-8", maxBytes=0, rotateSeconds=0, backupCount=5, bufferSize=LOG_ASYNC_FILE_BUFFER_SIZE):
+        """
+        :param maxBytes: rotate when file size (count by encoded bytes) exceed it, 0 means not rotate by size
+        :param rotateSeconds: rotate after file opened for this seconds, 0 means not rotate by time
+        :param backupCount: max number of rotated files to keep
+        """
+        logging.Handler.__init__(self)
+        self.baseFilename = os.path.abspath(filename)
+        self.encoding = encoding
+        # for utf-8, ascii message length is same as encoded bytes length, no need encode to count size
+        self.isUtf8 = codecs.lookup(encoding).name == "utf-8"
+        self.maxBytes = maxBytes
+        self.rotateSeconds = rotateSeconds
+        self.backupCount = backupCount
+        self.bufferSize = bufferSize
+        self.stream = self.openStream(mode)
+
+    def openStream(self, mode):
+        curStream = open(self.baseFilename, mode, encoding=self.encoding, buffering=self.bufferSize)
+        self.curSize = curStream.tell()
+        self.openTime = time.time()
+        return curStream
+
+    def shouldRollover(self, msgLen):
+        if self.maxBytes and ((self.curSize + msgLen) > self.maxBytes) and (self.curSize > 0):
+            return True
+        if self.rotateSeconds and ((time.time() - self.openTime) >= self.rotateSeconds):
+            return True
+        return False
+
+    def doRollover(self):
+        self.stream.close()
+        if self.backupCount > 0:
+            for backupIdx in range(self.backupCount - 1, 0, -1):
+                srcFile = "%s.%d" % (self.baseFilename, backupIdx)
+                dstFile = "%s.%d" % (self.baseFilename, backupIdx + 1)
+                if os.path.exists(srcFile):
+                    os.replace(srcFile, dstFile)
+            os.replace(self.baseFilename, self.baseFilename + ".1")
+        self.stream = self.openStream("w")
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + "\n"
+            if self.isUtf8 and msg.isascii():
+                msgLen = len(msg)
+            else:
+                msgLen = len(msg.encode(self.encoding, errors="replace"))
+            if self.shouldRollover(msgLen):
+                self.doRollover()
+            self.stream.write(msg)
+            self.curSize += msgLen
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.stream and (not self.stream.closed):
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.stream and (not self.stream.closed):
+                self.stream.flush()
+                self.stream.close()
+        finally:
+            self.release()
+        logging.Handler.close(self)
+
+class AsyncLogListener(object):
+    """
+    Listener thread: get log records from queue, handle them by handlers in batch,
+    and flush handlers when queue is empty for a while or every flushIntervalSeconds
+    """
+    # unique object, not same as any record (or None)
+    _sentinel = object()
+
+    def __init__(self, logQueue, handlerList, flushIntervalSeconds=LOG_ASYNC_FLUSH_INTERVAL_SECONDS, batchSize=LOG_ASYNC_BATCH_SIZE):
+        self.queue = logQueue
+        self.handlerList = handlerList
+        self.flushIntervalSeconds = flushIntervalSeconds
+        self.batchSize = batchSize
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.monitor, name="AsyncLogListener", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop thread after handled all records in queue, then flush and close handlers"""
+        if self.thread:
+            self.queue.put(self._sentinel)
+            self.thread.join()
+            self.thread = None
+            for eachHandler in self.handlerList:
+                eachHandler.flush()
+                eachHandler.close()
+
+    def handleRecord(self, record):
+        for eachHandler in self.handlerList:
+            if record.levelno >= eachHandler.level:
+                eachHandler.handle(record)
+
+    def flushHandlers(self):
+        for eachHandler in self.handlerList:
+            eachHandler.flush()
+        self.lastFlushTime = time.time()
+
+    def monitor(self):
+        self.lastFlushTime = time.time()
+        isNeedFlush = False
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flushIntervalSeconds)
+            except queue.Empty:
+                if isNeedFlush:
+                    self.flushHandlers()
+                    isNeedFlush = False
+                continue
+
+            # handle current and following already queued records in batch
+            # Note: check every record got from queue, sentinel may be any of them
+            handledNum = 0
+            while True:
+                if record is self._sentinel:
+                    return
+                self.handleRecord(record)
+                handledNum += 1
+                if handledNum >= self.batchSize:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            isNeedFlush = True
+            if (time.time() - self.lastFlushTime) >= self.flushIntervalSeconds:
+                self.flushHandlers()
+                isNeedFlush = False
+
+def loggingStop():
+    """Stop async logging listener (if started by loggingInit isAsync=True), make sure all log written into file"""
+    global gAsyncLogListener
+    if gAsyncLogListener:
+        rootLogger = logging.getLogger("")
+        for eachHandler in list(rootLogger.handlers):
+            if isinstance(eachHandler, EnqueueOnlyQueueHandler):
+                rootLogger.removeHandler(eachHandler)
+        gAsyncLogListener.stop()
+        gAsyncLogListener = None
+
 ################################################################################
 # Logging
 ################################################################################
@@ -412,14 +739,27 @@ def loggingInit(filename = None,
                 consoleLogLevel = LOG_LEVEL_CONSOLE,
                 consoleLogFormat = LOG_FORMAT_CONSOLE,
                 consoleLogDateFormat = LOG_FORMAT_CONSOLE_DATETIME,
+                isAsync = False,
+                maxBytes = 0,
+                rotateSeconds = 0,
+                backupCount = 5,
+                isFileJsonLines = False,
                 ):
     """
     init logging for both log to file and console
 
     :param filename: input log file name
         if not passed, use current lib filename
+    :param isAsync: if True, log call only put record into queue, format and write (buffered) in listener thread,
+        call loggingStop to make sure all log written (also auto called at exit)
+    :param maxBytes: for isAsync, rotate log file by size, 0 means not rotate by size
+    :param rotateSeconds: for isAsync, rotate log file by time, 0 means not rotate by time
+    :param backupCount: for isAsync, max number of rotated log files
+    :param isFileJsonLines: if True, log file output is JSON lines (fields from LOG_JSON_FIELD_LIST), ignore fileLogFormat
     :return: none
     """
+    global gAsyncLogListener
+
     logFilename = ""
     if filename:
         logFilename = filename
@@ -436,20 +776,34 @@ def loggingInit(filename = None,
     #                 encoding = "utf-8",
     #                 filemode = 'w')
 
+    # stop previous async logging (if any), otherwise its queue handler still in root logger, log output twice
+    loggingStop()
+
     # rootLogger = logging.getLogger()
     rootLogger = logging.getLogger("")
     rootLogger.setLevel(fileLogLevel)
-    fileHandler = logging.FileHandler(
-        filename=logFilename,
-        mode='w',
-        encoding="utf-8")
+    if isAsync:
+        fileHandler = BufferedRotatingFileHandler(
+            filename=logFilename,
+            mode='w',
+            encoding="utf-8",
+            maxBytes=maxBytes,
+            rotateSeconds=rotateSeconds,
+            backupCount=backupCount)
+    else:
+        fileHandler = logging.FileHandler(
+            filename=logFilename,
+            mode='w',
+            encoding="utf-8")
     fileHandler.setLevel(fileLogLevel)
-    if useColorfulLog:
-        fileFormatter = LogFormatter(fmt=fileLogFormat, datefmt=fileLogDateFormat)
+    if isFileJsonLines:
+        fileFormatter = JsonLogFormatter(datefmt=fileLogDateFormat)
+    elif useColorfulLog:
+        fileFormatter = CompiledLogFormatter(fmt=fileLogFormat, datefmt=fileLogDateFormat)
     else:
-        fileFormatter = logging.Formatter(fmt=fileLogFormat, datefmt=fileLogDateFormat)
+        fileFormatter = CachedTimeFormatter(fmt=fileLogFormat, datefmt=fileLogDateFormat)
     fileHandler.setFormatter(fileFormatter)
-    rootLogger.addHandler(fileHandler)
+    handlerList = [fileHandler]
 
     if enableConsole :
         # define a Handler which writes INFO messages or higher to the sys.stderr
@@ -457,12 +811,21 @@ def loggingInit(filename = None,
         console.setLevel(consoleLogLevel)
         # set a format which is simpler for console use
         if useColorfulLog:
-            consoleFormatter = LogFormatter(fmt=consoleLogFormat, datefmt=consoleLogDateFormat)
+            consoleFormatter = CompiledLogFormatter(fmt=consoleLogFormat, datefmt=consoleLogDateFormat)
         else:
-            consoleFormatter = logging.Formatter(fmt=consoleLogFormat, datefmt=consoleLogDateFormat)
+            consoleFormatter = CachedTimeFormatter(fmt=consoleLogFormat, datefmt=consoleLogDateFormat)
         # tell the handler to use this format
         console.setFormatter(consoleFormatter)
-        rootLogger.addHandler(console)
+        handlerList.append(console)
+
+    if isAsync:
+        logQueue = queue.SimpleQueue()
+        gAsyncLogListener = AsyncLogListener(logQueue, handlerList)
+        gAsyncLogListener.start()
+        rootLogger.addHandler(EnqueueOnlyQueueHandler(logQueue))
+    else:
+        for eachHandler in handlerList:
+            rootLogger.addHandler(eachHandler)
 
 def logSingleLine(curNum, itemStr, totalNum=0, indicatorChar="-", indicatorLength=10):
     """Log output info for single line
@@ -492,6 +855,8 @@ def logSingleLine(curNum, itemStr, totalNum=0, indicatorChar="-", indicatorLengt
 
     return
 
+atexit.register(loggingStop)
+
 def autoInitLog(pyFileFullPath):
     """Auto init log file by input current python file full path
     
@@ -17,6 +17,10 @@ import math
 import uuid
 import random
 import string
+import mmap
+import collections
+import concurrent.futures
+import hashlib
 from hashlib import md5 # only for python 3.x
 
 
@@ -26,6 +30,9 @@ from hashlib import md5 # only for python 3.x
 
 RANDOM_MAX_DIGIT_LENGTH = 12
 
+# read file in chunk when calculate hash
+HASH_CHUNK_SIZE = 1024 * 1024
+
 ################################################################################
 # Constant
 ################################################################################
@@ -178,6 +185,134 @@ def calcSha256(intputStr):
     sha256ValueStr = sha256Obj.hexdigest()
     return sha256ValueStr
 
+def _newHashObjDict(hashNameList):
+    """create hash object for each hash name, eg: ["md5", "sha256"] -> {"md5": md5(), "sha256": sha256()}"""
+    hashObjDict = {}
+    for eachHashName in hashNameList:
+        hashObjDict[eachHashName] = hashlib.new(eachHashName)
+    return hashObjDict
+
+def _getHashValueDict(hashObjDict, isRespBytes=False):
+    hashValueDict = {}
+    for eachHashName, eachHashObj in hashObjDict.items():
+        if isRespBytes:
+            hashValueDict[eachHashName] = eachHashObj.digest()
+        else:
+            hashValueDict[eachHashName] = eachHashObj.hexdigest()
+    return hashValueDict
+
+def calcStreamHash(fileObj, hashNameList=("md5",), chunkSize=HASH_CHUNK_SIZE, isRespBytes=False):
+    """Calculate multiple hash values for (binary) stream in single read, read in chunk through reusable buffer
+
+    Args:
+        fileObj (file object): binary file like object, eg: open(xxx, "rb"), io.BytesIO, response.raw
+        hashNameList (list): hash name list, support all hashlib.new names, eg: ["md5", "sha1", "sha256"]
+        chunkSize (int): read chunk size in bytes
+        isRespBytes (bool): return bytes, otherwise return hex string
+    Returns:
+        dict, hash name -> hash value
+            eg: {'md5': '3110e1e7994dc119ff92439c5758e465', 'sha256': '43db40...654f'}
+    Raises:
+    """
+    hashObjDict = _newHashObjDict(hashNameList)
+    hashObjList = list(hashObjDict.values())
+
+    if hasattr(fileObj, "readinto"):
+        chunkBuffer = bytearray(chunkSize)
+        chunkView = memoryview(chunkBuffer)
+        while True:
+            readSize = fileObj.readinto(chunkBuffer)
+            if not readSize:
+                break
+            curChunkView = chunkView[:readSize]
+            for eachHashObj in hashObjList:
+                eachHashObj.update(curChunkView)
+    else:
+        while True:
+            curChunk = fileObj.read(chunkSize)
+            if not curChunk:
+                break
+            for eachHashObj in hashObjList:
+                eachHashObj.update(curChunk)
+
+    return _getHashValueDict(hashObjDict, isRespBytes)
+
+def calcFileHash(filePath, hashNameList=("md5",), chunkSize=HASH_CHUNK_SIZE, isUseMmap=False, isRespBytes=False):
+    """Calculate multiple hash values for file in single read, not load whole file into memory
+
+    Args:
+        filePath (str): file path
+        hashNameList (list): hash name list, support all hashlib.new names, eg: ["md5", "sha1", "sha256"]
+        chunkSize (int): read chunk size in bytes
+        isUseMmap (bool): use mmap to map file instead of read into buffer
+        isRespBytes (bool): return bytes, otherwise return hex string
+    Returns:
+        dict, hash name -> hash value
+            eg: {'md5': '3110e1e7994dc119ff92439c5758e465'}
+    Raises:
+    """
+    with open(filePath, "rb") as fileFp:
+        if isUseMmap:
+            try:
+                fileMmap = mmap.mmap(fileFp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty file or special file can not mmap, fallback to read
+                fileMmap = None
+
+            if fileMmap is not None:
+                with fileMmap:
+                    hashObjDict = _newHashObjDict(hashNameList)
+                    mmapView = memoryview(fileMmap)
+                    try:
+                        for curStartPos in range(0, len(fileMmap), chunkSize):
+                            curChunkView = mmapView[curStartPos:(curStartPos + chunkSize)]
+                            for eachHashObj in hashObjDict.values():
+                                eachHashObj.update(curChunkView)
+                            curChunkView.release()
+                    finally:
+                        mmapView.release()
+                    return _getHashValueDict(hashObjDict, isRespBytes)
+
+        return calcStreamHash(fileFp, hashNameList=hashNameList, chunkSize=chunkSize, isRespBytes=isRespBytes)
+
+def calcFileHashBatch(filePathIter, hashNameList=("md5",), threadNum=4, chunkSize=HASH_CHUNK_SIZE, isUseMmap=False, isRespBytes=False):
+    """Calculate hash values for many files in thread pool. hashlib release GIL when update, so threads run in parallel
+
+    Args:
+        filePathIter (iterable): iterable of file path
+        hashNameList (list): hash name list, eg: ["md5", "sha1", "sha256"]
+        threadNum (int): thread pool size
+        chunkSize (int): read chunk size in bytes
+        isUseMmap (bool): use mmap to map file instead of read into buffer
+        isRespBytes (bool): return bytes, otherwise return hex string
+    Returns:
+        generator of (file path, hash value dict, error message) (tuple), same order with input
+            hash value dict is {} and error message is not empty if failed, eg: file not exist
+    Raises:
+    """
+    def _calcSingleFile(filePath):
+        try:
+            hashValueDict = calcFileHash(filePath, hashNameList=hashNameList, chunkSize=chunkSize, isUseMmap=isUseMmap, isRespBytes=isRespBytes)
+            return hashValueDict, ""
+        except OSError as osErr:
+            return {}, str(osErr)
+
+    # only submit limited files ahead, avoid hold all futures for huge file list
+    maxPendingNum = threadNum * 4
+    pendingQueue = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threadNum) as threadPool:
+        for eachFilePath in filePathIter:
+            pendingQueue.append((eachFilePath, threadPool.submit(_calcSingleFile, eachFilePath)))
+            if len(pendingQueue) >= maxPendingNum:
+                doneFilePath, doneFuture = pendingQueue.popleft()
+                hashValueDict, errMsg = doneFuture.result()
+                yield doneFilePath, hashValueDict, errMsg
+
+        while pendingQueue:
+            doneFilePath, doneFuture = pendingQueue.popleft()
+            hashValueDict, errMsg = doneFuture.result()
+            yield doneFilePath, hashValueDict, errMsg
+
 #----------------------------------------
 # Random String/Number
 #----------------------------------------
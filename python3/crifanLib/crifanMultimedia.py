@@ -18,10 +18,10 @@ import re
 import base64
 import logging
 
-try:
-    import audioread
-except:
-    print("need audioread if use crifanMultimedia audio functions")
+import crifanLib.crifanSystem
+
+# optional lib, only import when first used
+audioread = crifanLib.crifanSystem.lazyImport("audioread", "need audioread if use crifanMultimedia audio functions")
 
 ################################################################################
 # Config
@@ -21,36 +21,19 @@ import uuid
 import codecs
 import binascii
 import string
-
-try:
-    import chardet
-except ImportError:
-    print("crifanString: Can not found lib chardet")
-
-import urllib
-
-try:
-    import urllib.request as urllib2
-except ImportError:
-    import urllib2
-
-try:
-    # print("Importing jieba")
-    import jieba
-    # print("Imported jieba")
-    print("Importing jieba.analyse")
-    import jieba.analyse
-    print("Imported jieba.analyse")
-except ImportError:
-    print("crifanString: Can not found lib jieba")
+import itertools
+import concurrent.futures
 
 # from . import crifanMath
-# from . import crifanHttp
 # from . import crifanSystem
 import crifanLib.crifanMath
-import crifanLib.crifanHttp
 import crifanLib.crifanSystem
 
+# heavy or optional libs, only import when first used
+chardet = crifanLib.crifanSystem.lazyImport("chardet", "crifanString: Can not found lib chardet")
+jiebaAnalyse = crifanLib.crifanSystem.lazyImport("jieba.analyse", "crifanString: Can not found lib jieba")
+requests = crifanLib.crifanSystem.lazyImport("requests", "crifanString: Can not found lib requests")
+
 ################################################################################
 # Config
 ################################################################################
@@ -908,6 +891,62 @@ class LanguageType(Enum):
     EN = '英文'
     JP = '日文'
 
+# (start, end) code point range, same with lanPattern in detectLanguageType
+LanguageCharRangeDict = {
+    LanguageType.ZHCN: [(0x4E00, 0x9FA5)],
+    LanguageType.EN: [(ord("a"), ord("z")), (ord("A"), ord("Z"))],
+    LanguageType.JP: [(0x3040, 0x309F), (0x30A0, 0x30FF)],
+}
+
+# placeholder char after str.translate, for later str.count
+LanguageCharFlagDict = {
+    LanguageType.ZHCN: "\x01",
+    LanguageType.EN: "\x02",
+    LanguageType.JP: "\x03",
+}
+SpaceCharFlag = "\x04"
+
+def _getLanguageCharTable():
+    """Get (and build once) the str.translate table, which map each space/language char into its flag char
+
+    Note: use str (index by code point) as table, is faster than dict. char out of table range is kept as is
+    """
+    if "languageCharTable" not in gVal:
+        maxCodePoint = max(endCodePoint for eachRangeList in LanguageCharRangeDict.values() for (_, endCodePoint) in eachRangeList)
+        charList = [chr(eachCodePoint) for eachCodePoint in range(maxCodePoint + 1)]
+        # original flag char -> not counted into any language
+        for eachFlagChar in list(LanguageCharFlagDict.values()) + [SpaceCharFlag]:
+            charList[ord(eachFlagChar)] = "\x00"
+        # same with \s in re, max unicode space char is U+3000
+        for eachCodePoint in range(0x3000 + 1):
+            if chr(eachCodePoint).isspace():
+                charList[eachCodePoint] = SpaceCharFlag
+        for eachLanType, eachRangeList in LanguageCharRangeDict.items():
+            curFlagChar = LanguageCharFlagDict[eachLanType]
+            for (startCodePoint, endCodePoint) in eachRangeList:
+                for eachCodePoint in range(startCodePoint, endCodePoint + 1):
+                    charList[eachCodePoint] = curFlagChar
+        gVal["languageCharTable"] = "".join(charList)
+    return gVal["languageCharTable"]
+
+def countLanguageChar(inputString):
+    """Count non-space char and each language char in single pass
+
+    Args:
+        inputString (str): input string
+    Returns:
+        (total non-space char number, zh-CN char number, en char number, jp char number) (tuple)
+    Raises:
+    Examples:
+        "测试Python代码的编程逻辑和基本语法" -> (20, 14, 6, 0)
+    """
+    flagStr = inputString.translate(_getLanguageCharTable())
+    totalCharNumLen = len(flagStr) - flagStr.count(SpaceCharFlag)
+    zhCharNum = flagStr.count(LanguageCharFlagDict[LanguageType.ZHCN])
+    enCharNum = flagStr.count(LanguageCharFlagDict[LanguageType.EN])
+    jpCharNum = flagStr.count(LanguageCharFlagDict[LanguageType.JP])
+    return totalCharNumLen, zhCharNum, enCharNum, jpCharNum
+
 def detectLanguageType(inputString, possibilityRatioThreshold = 0.7):
     """
         input: a string
@@ -932,37 +971,55 @@ def detectLanguageType(inputString, possibilityRatioThreshold = 0.7):
     """
     lanType = LanguageType.UNKNOWN
     lanPossibilityRatio = 0.0
-    inputStrNoSpace = re.sub("\s", "", inputString)
-    totalCharNumLen = len(inputStrNoSpace)
+    totalCharNumLen, zhCharNum, enCharNum, jpCharNum = countLanguageChar(inputString)
     if totalCharNumLen <= 0:
         return lanType, lanPossibilityRatio
 
-    languagePatternList = [
-        {
-            "lanType" : LanguageType.ZHCN,
-            "lanPattern" : "[\\u4e00-\\u9fa5]"
-        },
-        {
-            "lanType" : LanguageType.EN,
-            "lanPattern" : "[a-zA-Z]"
-        },
-        {
-            "lanType" : LanguageType.JP,
-            "lanPattern" : "[\\u3040-\\u309F\\u30A0-\\u30FF]"
-        }
+    lanCharNumList = [
+        (LanguageType.ZHCN, zhCharNum),
+        (LanguageType.EN, enCharNum),
+        (LanguageType.JP, jpCharNum),
     ]
-    for curPatternDict in languagePatternList:
-        # curCharNumList = re.compile(curPatternDict['lanPattern']).findall(inputStrNoSpace)
-        curCharNumList = re.findall(curPatternDict['lanPattern'], inputStrNoSpace)
-        curCharNumLen = len(curCharNumList)
+    for curLanType, curCharNumLen in lanCharNumList:
         curLanCharRatio = float(curCharNumLen)/float(totalCharNumLen)
         if curLanCharRatio >= possibilityRatioThreshold:
-            lanType = curPatternDict['lanType']
+            lanType = curLanType
             lanPossibilityRatio = curLanCharRatio
             break
 
     return lanType, lanPossibilityRatio
 
+def _detectLanguageTypeList(inputStrList, possibilityRatioThreshold):
+    """detectLanguageType for string list, run inside each process of detectLanguageTypeBatch"""
+    return [detectLanguageType(eachInputStr, possibilityRatioThreshold) for eachInputStr in inputStrList]
+
+def detectLanguageTypeBatch(inputStrIter, possibilityRatioThreshold=0.7, processNum=0, chunkSize=1000):
+    """Batch version of detectLanguageType, for large amount of (short) strings
+
+    Args:
+        inputStrIter (iterable): iterable of input string
+        possibilityRatioThreshold (float): same with detectLanguageType
+        processNum (int): process pool size. 0 means detect in current process
+        chunkSize (int): how many strings send to each process one time, only used when processNum > 0
+    Returns:
+        generator of (LanguageType, ratio) (tuple), same order with input
+    Raises:
+    Examples:
+        list(detectLanguageTypeBatch(["测试Python代码的编程逻辑和基本语法", "test python"]))
+        -> [(<LanguageType.ZHCN: '中文'>, 0.7), (<LanguageType.EN: '英文'>, 1.0)]
+    """
+    if processNum > 0:
+        # send list of strings to each process, avoid too many inter process call for short string
+        inputStrIter = iter(inputStrIter)
+        strListIter = iter(lambda: list(itertools.islice(inputStrIter, chunkSize)), [])
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processNum) as processPool:
+            for eachResultList in processPool.map(_detectLanguageTypeList, strListIter, itertools.repeat(possibilityRatioThreshold)):
+                for eachResult in eachResultList:
+                    yield eachResult
+    else:
+        for eachInputStr in inputStrIter:
+            yield detectLanguageType(eachInputStr, possibilityRatioThreshold)
+
 ################################################################################
 # Program Language Detection
 ################################################################################
@@ -1320,6 +1377,181 @@ def isPythonLanguage(codeStr):
 
     return isPyLang
 
+class ProgramLanguageClassifier(object):
+    """Detect code snippet programming language: python/javascript/html/xml, otherwise shell
+
+    Same rules and same result with isPythonLanguage -> isJavascriptLanguage -> isHtmlXmlLanguage,
+    but all re pattern are compiled and keyword set are built only once when init,
+    and each rule stop scanning as soon as the language reach its threshold.
+
+    Note: each rule still scan the snippet by its own finditer, language by language, NOT combined into one pass:
+        one alternation re lose overlapped matches of different rules, so rule count (and result) changed;
+        one re with a lookahead group per rule keep same count, but is about 3x slower with python re,
+        as each position try all rules and the literal prefix search of each single rule is lost.
+
+    Examples:
+        classifier = ProgramLanguageClassifier()
+        classifier.detect("import os\nimport sys") -> "python"
+        list(classifier.detectBatch(codeSnippetList)) -> ["python", "shell", "html", ...]
+    """
+
+    DefaultLang = "shell"
+
+    ValidPythonMinRuleNum = 2
+    ValidJsMinKeyValueNum = 1
+    ValidHtmlMinTagNum = 2
+
+    def __init__(self):
+        pythonPList = [
+            # import evernote.edam.type.ttypes as Types
+            ("import\s+[\w\.]+(?:\s+as\w+)?", re.I),
+            # from evernote.api.client import EvernoteClient
+            ("from\s+[\w\.]+\s+import\s+[\w\*]+", re.I),
+            # class Evernote(object):
+            ("class\s+\w+(?:\([^\(\)]+\))?", re.I),
+            # special key
+            ("__init__", re.I),
+            ("__main__", re.I),
+            ("__name__", re.I),
+            ("@staticmethod", re.I),
+            # def getHost(isSandbox=False, isChina=True):
+            ("def\s+\w+\(\w+", re.I),
+            # common function
+            ("logging\.(?:(?:debug)|(?:info)|(?:warning)|(?:warn)|(?:error)|(?:critical)|(?:exception)|(?:log))", re.I),
+            ("sys\.path\.(?:(?:clear)|(?:copy)|(?:append)|(?:extend)|(?:pop)|(?:index)|(?:count)|(?:insert)|(?:remove)|(?:reverse)|(?:sort))", re.I),
+            ("os\.path\.(?:(?:abspath)|(?:basename)|(?:commonpath)|(?:commonprefix)|(?:dirname)|(?:exists)|(?:lexists)|(?:expanduser)|(?:expandvars)|(?:getatime)|(?:getmtime)|(?:getctime)|(?:getsize)|(?:isabs)|(?:isfile)|(?:isdir)|(?:islink)|(?:ismount)|(?:join)|(?:normcase)|(?:normpath)|(?:realpath)|(?:relpath)|(?:samefile)|(?:sameopenfile)|(?:samestat)|(?:split)|(?:splitdrive)|(?:splitext)|(?:supports_unicode_filenames))", re.I),
+            # mutiple line string
+            ('""".+?"""', re.S),
+            ("'''.+?'''", re.S),
+            # other single rule
+            ("with\s+open\(.+?\s+as\s+.+:", re.I|re.M),
+            ("""\w+\s*=\s*\w+\[['"]\w+['"]\]""", re.I|re.M),
+            ("""\w+\.\w+\s*=\s*['"][^']+['"]""", re.I|re.M),
+            ("\w+(?:\.\w+)?\s*=\s*[\.\w]+(?:\(.*\))?", re.I|re.M),
+            ("""r['"][^"'\n]+['"]""", re.I|re.M),
+            ("^>>>.*$", re.I|re.M),
+            ("^#.*$", re.I|re.M),
+        ]
+        self.pythonPatternList = [re.compile(eachP, eachFlags) for (eachP, eachFlags) in pythonPList]
+
+        self.jsJsonPatternList = [
+            re.compile("\{.+\}?", re.S),
+            re.compile("\[.+\]?", re.S),
+        ]
+        self.jsKeyValuePatternList = [
+            re.compile('"?\w+"?\s*:\s*"?[^"]+"?,?$', re.M),
+            re.compile("'?\w+'?\s*:\s*'?[^']+'?,?$", re.M),
+        ]
+
+        self.xmlTagPatternList = [
+            re.compile("<(?P<tagName>\w+)>[^<>]*(</(?P=tagName)>)?", re.M),
+            re.compile("<(?P<tagName>\w+)\s*/>"),
+        ]
+        self.htmlTagSet = frozenset(HtmlTagList)
+
+    def _countMatch(self, patternList, codeStr, maxNum=None):
+        """Count all matched number of pattern list, stop once reach maxNum"""
+        matchedNum = 0
+        for eachPattern in patternList:
+            for _ in eachPattern.finditer(codeStr):
+                matchedNum += 1
+                if maxNum and (matchedNum >= maxNum):
+                    return matchedNum
+        return matchedNum
+
+    def _scorePython(self, codeStr, isEarlyExit):
+        maxNum = self.ValidPythonMinRuleNum if isEarlyExit else None
+        return self._countMatch(self.pythonPatternList, codeStr, maxNum)
+
+    def _scoreJavascript(self, codeStr, isEarlyExit):
+        isMatchJson = any(eachPattern.search(codeStr) for eachPattern in self.jsJsonPatternList)
+        if not isMatchJson:
+            return 0
+        maxNum = self.ValidJsMinKeyValueNum if isEarlyExit else None
+        return self._countMatch(self.jsKeyValuePatternList, codeStr, maxNum)
+
+    def _scoreHtmlXml(self, codeStr, isEarlyExit):
+        """Return (html tag number, all tag number), tag number is non-duplicated tag name number"""
+        tagNameSet = set()
+        htmlTagNameSet = set()
+        for eachPattern in self.xmlTagPatternList:
+            for eachMatch in eachPattern.finditer(codeStr):
+                curTagName = eachMatch.group("tagName")
+                tagNameSet.add(curTagName)
+                if curTagName in self.htmlTagSet:
+                    htmlTagNameSet.add(curTagName)
+                    if isEarlyExit and (len(htmlTagNameSet) >= self.ValidHtmlMinTagNum):
+                        return len(htmlTagNameSet), len(tagNameSet)
+        return len(htmlTagNameSet), len(tagNameSet)
+
+    def score(self, codeSnippet, isEarlyExit=True):
+        """Score each programming language for code snippet
+
+        Args:
+            codeSnippet (str): input string of code snippet
+            isEarlyExit (bool): True to stop once one language reach its threshold, later language not scored
+        Returns:
+            score dict(dict), eg: {"python": 2, "javascript": 0, "html": 0, "xml": 0}
+        Raises:
+        """
+        scoreDict = {
+            "python": 0,
+            "javascript": 0,
+            "html": 0,
+            "xml": 0,
+        }
+
+        scoreDict["python"] = self._scorePython(codeSnippet, isEarlyExit)
+        if isEarlyExit and (scoreDict["python"] >= self.ValidPythonMinRuleNum):
+            return scoreDict
+
+        scoreDict["javascript"] = self._scoreJavascript(codeSnippet, isEarlyExit)
+        if isEarlyExit and (scoreDict["javascript"] >= self.ValidJsMinKeyValueNum):
+            return scoreDict
+
+        scoreDict["html"], scoreDict["xml"] = self._scoreHtmlXml(codeSnippet, isEarlyExit)
+        return scoreDict
+
+    def detect(self, codeSnippet):
+        """Detect code snippet possible programming language
+
+        Args:
+            codeSnippet (str): input string of code snippet
+        Returns:
+            str, programming language
+        Raises:
+        """
+        scoreDict = self.score(codeSnippet)
+        if scoreDict["python"] >= self.ValidPythonMinRuleNum:
+            curLang = "python"
+        elif scoreDict["javascript"] >= self.ValidJsMinKeyValueNum:
+            curLang = "javascript"
+        elif scoreDict["html"] >= self.ValidHtmlMinTagNum:
+            curLang = "html"
+        elif scoreDict["xml"] > 0:
+            curLang = "xml"
+        else:
+            curLang = self.DefaultLang
+        return curLang
+
+    def detectBatch(self, codeSnippetIter):
+        """Detect programming language for each code snippet
+
+        Args:
+            codeSnippetIter (iterable): iterable of code snippet
+        Returns:
+            generator of programming language(str), same order with input
+        Raises:
+        """
+        for eachCodeSnippet in codeSnippetIter:
+            yield self.detect(eachCodeSnippet)
+
+def _getProgramLanguageClassifier():
+    """Get (and create once) the shared ProgramLanguageClassifier"""
+    if "programLanguageClassifier" not in gVal:
+        gVal["programLanguageClassifier"] = ProgramLanguageClassifier()
+    return gVal["programLanguageClassifier"]
+
 def detectProgramLanguage(codeSnippet):
     """Detect code snippet possible programming language
 
@@ -1333,34 +1565,10 @@ def detectProgramLanguage(codeSnippet):
     # guessInstance = Guess()
     # languageName = guessInstance.language_name(codeSnippet)
     # return languageName
-    # TODO: add re rule to detect python/java/xml/...
-    # return defaultLan
-
-    DefaultLang = "shell"
-
-    curLang = None
-
-    if not curLang:
-        if isPythonLanguage(codeSnippet):
-            curLang = "python"
-
-    if not curLang:
-        if isJavascriptLanguage(codeSnippet):
-            curLang = "javascript"
-
-    if not curLang:
-        isHtmlOrXml, xmlOrHtmlLang = isHtmlXmlLanguage(codeSnippet)
-        if isHtmlOrXml:
-            curLang = xmlOrHtmlLang
-
-    # if not curLang:
-    #     if isJavaLanguage(codeSnippet):
-    #         curLang = "java"
-
-    if not curLang:
-        curLang = DefaultLang
+    # TODO: add re rule to detect java/...
 
-    return curLang
+    # python -> javascript -> html/xml -> shell
+    return _getProgramLanguageClassifier().detect(codeSnippet)
 
 
 #----------------------------------------
@@ -1402,7 +1610,7 @@ def extractTags(curStr, topK=10, withWeight=False, allowPOS=()):
     #     "TIME",
     # )
     # topTagList = jieba.analyse.extract_tags(curStr, topK=topK, withWeight=withWeight, allowPOS=allowPOS)
-    topTagList = jieba.analyse.extract_tags(curStr, topK=topK, withWeight=withWeight, allowPOS=allowPOS)
+    topTagList = jiebaAnalyse.extract_tags(curStr, topK=topK, withWeight=withWeight, allowPOS=allowPOS)
     return topTagList
 
 def toPureStr(originStr):
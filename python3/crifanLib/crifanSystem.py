@@ -17,6 +17,8 @@ import sys
 import subprocess
 import time
 import re
+import importlib
+import threading
 
 ################################################################################
 # Config
@@ -45,6 +47,51 @@ gConst = {
 # Python System Function
 ################################################################################
 
+class LazyModule(object):
+    """Module proxy, only import the real module when first access its attribute
+
+    For heavy or optional library, avoid import cost and import error when not use it
+
+    Examples:
+        chardet = LazyModule("chardet", "need chardet if using crifanFile functions: extractRawSubtitleList")
+        chardet.detect(someBytes) # real import chardet here
+    """
+
+    def __init__(self, moduleName, importErrorHint=""):
+        self._moduleName = moduleName
+        self._importErrorHint = importErrorHint
+        self._module = None
+        self._importLock = threading.Lock()
+
+    def _loadModule(self):
+        if self._module is None:
+            with self._importLock:
+                if self._module is None:
+                    try:
+                        self._module = importlib.import_module(self._moduleName)
+                    except ImportError as importErr:
+                        errMsg = self._importErrorHint or ("Can not found lib %s" % self._moduleName)
+                        raise ImportError("%s: %s" % (errMsg, importErr)) from importErr
+        return self._module
+
+    def __getattr__(self, attrName):
+        return getattr(self._loadModule(), attrName)
+
+    def __repr__(self):
+        return "<LazyModule %s loaded=%s>" % (self._moduleName, self._module is not None)
+
+def lazyImport(moduleName, importErrorHint=""):
+    """Lazy import module, real import when first use it
+
+    Args:
+        moduleName (str): module name, support sub module, eg: 'jieba.analyse'
+        importErrorHint (str): hint message for ImportError when real import failed
+    Returns:
+        LazyModule
+    Raises:
+    """
+    return LazyModule(moduleName, importErrorHint)
+
 
 def isPython2():
     """check whether is python 2"""
@@ -8,6 +8,7 @@ Latest: https://github.com/crifan/crifanLibPython/blob/master/python3/crifanLib/
 """
 
 import re
+import pickle
 
 __author__ = "Crifan Li (admin@crifan.com)"
 __version__ = "20210709"
@@ -69,60 +70,114 @@ def genFullUrl(mainUrl, paraDict):
     return fullUrl
 
 
+def genSimilarUrlKey(url):
+    """
+    generate key for similar url, two url is similar if and only if their keys are same
+        key = (slash splitted part number, suffix, part except name)
+    eg:
+        "http://www.crifan.com/files/pic/001.jpg" -> (6, "jpg", "http://www.crifan.com/files/pic")
+    """
+    url = str(url)
+    slashPartNum = len(url.split('/'))
+    sufPos = url.rfind('.')
+    suffix = url[(sufPos + 1) : ]
+    lastSlashPos = url.rfind('/')
+    exceptName = url[:lastSlashPos]
+    return (slashPartNum, suffix, exceptName)
+
 def urlIsSimilar(url1, url2):
     """
     check whether two url is similar
         Note: input two url both should be str type
+    similar means:
+        all should have same structure
+        at least, suffix should same
+        except name, all other part should same
     """
-    isSim = False
-
-    url1 = str(url1)
-    url2 = str(url2)
-
-    slashList1 = url1.split('/')
-    slashList2 = url2.split('/')
-    lenS1 = len(slashList1)
-    lenS2 = len(slashList2)
-
-    # all should have same structure
-    if lenS1 != lenS2:
-        # not same sturcture -> must not similar
-        isSim = False
-    else:
-        sufPos1 = url1.rfind('.')
-        sufPos2 = url2.rfind('.')
-        suf1 = url1[(sufPos1 + 1) : ]
-        suf2 = url2[(sufPos2 + 1) : ]
-        # at least, suffix should same
-        if (suf1 == suf2):
-            lastSlashPos1 = url1.rfind('/')
-            lastSlashPos2 = url2.rfind('/')
-            exceptName1 = url1[:lastSlashPos1]
-            exceptName2 = url2[:lastSlashPos2]
-            # except name, all other part should same
-            if (exceptName1 == exceptName2):
-                isSim = True
-            else :
-                # except name, other part is not same -> not similar
-                isSim = False
-        else:
-            # suffix not same -> must not similar
-            isSim = False
-
+    isSim = genSimilarUrlKey(url1) == genSimilarUrlKey(url2)
     return isSim
 
+class SimilarUrlIndex(object):
+    """Index of url by similar key, for O(1) findSimilarUrl
+
+    Same result with findSimilarUrl for the url list: found url is the first added similar one.
+    Can pickle to file, for later reload.
+
+    Examples:
+        urlIndex = SimilarUrlIndex(crawledUrlList)
+        isSimilar, similarSrcUrl = urlIndex.find("http://www.crifan.com/files/pic/002.jpg")
+        urlIndex.save("similarUrlIndex.pkl")
+        urlIndex = SimilarUrlIndex.load("similarUrlIndex.pkl")
+    """
+
+    def __init__(self, urlIter=None):
+        # similar key -> first added url
+        self.keyToUrlDict = {}
+        if urlIter:
+            self.build(urlIter)
+
+    def __len__(self):
+        return len(self.keyToUrlDict)
+
+    def __contains__(self, url):
+        return genSimilarUrlKey(url) in self.keyToUrlDict
+
+    def build(self, urlIter):
+        """bulk add url from iterable"""
+        keyToUrlDict = self.keyToUrlDict
+        for eachUrl in urlIter:
+            keyToUrlDict.setdefault(genSimilarUrlKey(eachUrl), eachUrl)
+
+    def add(self, url):
+        """
+            add url into index
+            if similar url already existed, return True, similarSrcUrl, and index not changed
+            if not existed, return False, ''
+        """
+        curKey = genSimilarUrlKey(url)
+        if curKey in self.keyToUrlDict:
+            return (True, self.keyToUrlDict[curKey])
+        self.keyToUrlDict[curKey] = url
+        return (False, '')
+
+    def find(self, url):
+        """
+            found whether the url is similar in index
+            if found, return True, similarSrcUrl
+            if not found, return False, ''
+        """
+        curKey = genSimilarUrlKey(url)
+        if curKey in self.keyToUrlDict:
+            return (True, self.keyToUrlDict[curKey])
+        return (False, '')
+
+    def save(self, indexFile):
+        """save index into (pickle) file"""
+        with open(indexFile, "wb") as indexFp:
+            pickle.dump(self, indexFp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(indexFile):
+        """load index from (pickle) file saved by save"""
+        with open(indexFile, "rb") as indexFp:
+            return pickle.load(indexFp)
+
 def findSimilarUrl(url, urlList):
     """
         found whether the url is similar in urlList
         if found, return True, similarSrcUrl
         if not found, return False, ''
     :param url:
-    :param urlList:
+    :param urlList: url list, or SimilarUrlIndex for O(1) lookup
     :return:
     """
+    if isinstance(urlList, SimilarUrlIndex):
+        return urlList.find(url)
+
     (isSimilar, similarSrcUrl) = (False, '')
+    urlKey = genSimilarUrlKey(url)
     for srcUrl in urlList:
-        if urlIsSimilar(url, srcUrl):
+        if genSimilarUrlKey(srcUrl) == urlKey:
             isSimilar = True
             similarSrcUrl = srcUrl
             break
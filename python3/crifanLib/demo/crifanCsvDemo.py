@@ -7,6 +7,7 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from crifanCsv import saveToCsvByHeaderAndList, saveToCsvByDictList, loadCsvFromFile
+from crifanCsv import iterCsvRows, CsvRowType, CsvDictFileWriter
 
 OutputFilenameByHeaderAndList = "OutputDemoData_ByHeaderAndList.csv"
 OutputFilenameByDictList = "OutputDemoData_ByDictList.csv"
@@ -73,5 +74,38 @@ def demoCsvOutput():
   print("csvHeaderList=%s, csvRowList=%s" % (csvHeaderList, csvRowList))
   # csvHeaderList=['单词', '重复频率', '来源列表'], csvRowList=[['a', '0.5', "['NewConcept', 'FamilyAndFriends']"], ['about', '0.75', "['NewConcept', 'YLE', 'EverybodyUp']"], ['above', '0.5', "['NewConcept', 'YLE']"], ['abroad', '0.25', "['NewConcept']"]]
 
+def demoCsvStreaming():
+  normalCsvFileFullPath = os.path.join(OutputRootFolder, OutputFilenameByDictList)
+
+  # read one row each time, with typed column
+  for eachRowDict in iterCsvRows(normalCsvFileFullPath, typeConverterDict={"重复频率": float}):
+    print("eachRowDict=%s" % eachRowDict)
+    # eachRowDict={'单词': 'a', '重复频率': 0.5, '来源列表': "['NewConcept', 'FamilyAndFriends']"}
+
+  # read chunk of rows, eg: for bulk insert into database
+  for eachRecordList in iterCsvRows(normalCsvFileFullPath, rowType=CsvRowType.RECORD, chunkSize=3):
+    print("eachRecordList len=%s, first=%s" % (len(eachRecordList), eachRecordList[0]))
+    # eachRecordList len=3, first=CsvRecord(单词='a', 重复频率='0.5', 来源列表="['NewConcept', 'FamilyAndFriends']")
+    # eachRecordList len=1, first=CsvRecord(单词='abroad', 重复频率='0.25', 来源列表="['NewConcept']")
+
+  # write one row each time
+  streamingCsvFileFullPath = os.path.join(OutputRootFolder, "OutputDemoData_ByStreaming.csv")
+  with CsvDictFileWriter(streamingCsvFileFullPath) as csvWriter:
+    for eachRowDict in iterCsvRows(normalCsvFileFullPath):
+      csvWriter.writeRow(eachRowDict)
+
+  # append: row is written in column order of existed file header, not order of row dict keys
+  with CsvDictFileWriter(streamingCsvFileFullPath, isAppend=True) as csvWriter:
+    csvWriter.writeRow({"来源列表": "['YLE']", "单词": "zoo", "重复频率": "0.25"})
+  print("last row=%s" % list(iterCsvRows(streamingCsvFileFullPath))[-1])
+  # last row={'单词': 'zoo', '重复频率': '0.25', '来源列表': "['YLE']"}
+  try:
+    with CsvDictFileWriter(streamingCsvFileFullPath, isAppend=True) as csvWriter:
+      csvWriter.writeRow({"word": "zoo"})
+  except ValueError as err:
+    print("append not matched row: %s" % err)
+    # append not matched row: row keys ['word'] not match header ['单词', '重复频率', '来源列表'] of existed file
+
 if __name__ == "__main__":
   demoCsvOutput()
+  # demoCsvStreaming()
@@ -0,0 +1,148 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import json
+import time
+import tempfile
+import threading
+from types import SimpleNamespace
+
+from crifanLib.thirdParty.crifanEvernote import crifanEvernote
+
+class FakeNoteStore:
+  """In memory stand-in of evernote NoteStore: findNotesMetadata (max 250 notes each page), getSyncState, getFilteredSyncChunk, getNote"""
+  # all notes, each has: guid, title, notebookGuid, updateSequenceNum, active
+  noteList = []
+  # if > 0, delay of each api call, to simulate network latency
+  callDelaySeconds = 0
+  callCountDict = {}
+  createdNum = 0
+  dataLock = threading.Lock()
+
+  def __init__(self):
+    with self.dataLock:
+      FakeNoteStore.createdNum += 1
+    # each NoteStore (thrift client) should only used by single thread
+    self.ownerThreadId = None
+
+  def callApi(self, apiName):
+    curThreadId = threading.get_ident()
+    if self.ownerThreadId is None:
+      self.ownerThreadId = curThreadId
+    assert self.ownerThreadId == curThreadId, "NoteStore shared between threads"
+    with self.dataLock:
+      self.callCountDict[apiName] = self.callCountDict.get(apiName, 0) + 1
+    if self.callDelaySeconds:
+      time.sleep(self.callDelaySeconds)
+
+  def findNotesMetadata(self, authToken, noteFilter, offset, maxNotes, resultSpec):
+    self.callApi("findNotesMetadata")
+    matchedNoteList = [eachNote for eachNote in self.noteList if eachNote.notebookGuid == noteFilter.notebookGuid]
+    matchedNoteList.sort(key=lambda eachNote: eachNote.updateSequenceNum, reverse=True)
+    pageNoteList = matchedNoteList[offset:offset + min(maxNotes, crifanEvernote.SearchPageSize)]
+    return SimpleNamespace(totalNotes=len(matchedNoteList), startIndex=offset, notes=pageNoteList)
+
+  def getSyncState(self, authToken):
+    self.callApi("getSyncState")
+    updateCount = max([eachNote.updateSequenceNum for eachNote in self.noteList] or [0])
+    return SimpleNamespace(updateCount=updateCount)
+
+  def getFilteredSyncChunk(self, authToken, afterUSN, maxEntries, syncFilter):
+    self.callApi("getFilteredSyncChunk")
+    updateCount = max([eachNote.updateSequenceNum for eachNote in self.noteList] or [0])
+    changedNoteList = sorted([eachNote for eachNote in self.noteList if eachNote.updateSequenceNum > afterUSN], key=lambda eachNote: eachNote.updateSequenceNum)
+    chunkNoteList = changedNoteList[:maxEntries]
+    chunkHighUSN = chunkNoteList[-1].updateSequenceNum if chunkNoteList else None
+    return SimpleNamespace(notes=chunkNoteList, expungedNotes=None, chunkHighUSN=chunkHighUSN, updateCount=updateCount)
+
+  def getNote(self, authToken, guid, withContent, withResourcesData, withResourcesRecognition, withResourcesAlternateData):
+    self.callApi("getNote")
+    foundNote = [eachNote for eachNote in self.noteList if eachNote.guid == guid][0]
+    noteContent = '<?xml version="1.0" encoding="UTF-8"?><en-note><div>content of %s</div></en-note>' % foundNote.title
+    return SimpleNamespace(guid=guid, title=foundNote.title, content=noteContent if withContent else None, resources=[])
+
+def addFakeNote(notebookGuid, noteTitle, isActive=True):
+  """add note with next USN, same as evernote: each change of note get new USN"""
+  noteList = FakeNoteStore.noteList
+  curUsn = max([eachNote.updateSequenceNum for eachNote in noteList] or [0]) + 1
+  newNote = SimpleNamespace(guid="note-guid-%d" % curUsn, title=noteTitle, notebookGuid=notebookGuid, updateSequenceNum=curUsn, active=isActive)
+  noteList.append(newNote)
+  return newNote
+
+def demoIterNotes():
+  FakeNoteStore.noteList = []
+  for noteIdx in range(600):
+    # 2 notebooks, some notes in trash
+    addFakeNote("notebook-a" if noteIdx % 3 else "notebook-b", "note %d" % noteIdx, isActive=(noteIdx % 50 != 0))
+  # noteStoreFactory: not connect to evernote server, no token, no OCR
+  curEvernote = crifanEvernote("fakeAuthToken", noteStoreFactory=FakeNoteStore)
+
+  # page by page, server return max 250 notes for each page
+  FakeNoteStore.callCountDict.clear()
+  notebookANoteList = list(curEvernote.iterNotes("notebook-a"))
+  realNoteNum = len([eachNote for eachNote in FakeNoteStore.noteList if eachNote.notebookGuid == "notebook-a"])
+  print("iterNotes: got %d/%d notes, callCountDict=%s" % (len(notebookANoteList), realNoteNum, FakeNoteStore.callCountDict))
+  # iterNotes: got 400/400 notes, callCountDict={'findNotesMetadata': 2}
+
+  # changed notes: resume from last synced USN saved in syncStateFile
+  syncStateFile = os.path.join(tempfile.mkdtemp(), "evernoteSyncState.json")
+  changedNoteList = list(curEvernote.iterChangedNotes("notebook-a", syncStateFile=syncStateFile))
+  with open(syncStateFile) as stateFp:
+    print("iterChangedNotes first time: %d changed active notes, syncState=%s" % (len(changedNoteList), json.load(stateFp)))
+  # iterChangedNotes first time: 392 changed active notes, syncState={'afterUsnDict': {'notebook-a': 600}}
+  updatedNote = addFakeNote("notebook-a", "new note after synced")
+  FakeNoteStore.callCountDict.clear()
+  changedNoteList = list(curEvernote.iterChangedNotes("notebook-a", syncStateFile=syncStateFile))
+  print("iterChangedNotes again: changed=%s, callCountDict=%s" % ([eachNote.title for eachNote in changedNoteList], FakeNoteStore.callCountDict))
+  # iterChangedNotes again: changed=['new note after synced'], callCountDict={'getSyncState': 1, 'getFilteredSyncChunk': 1}
+
+  # stop during processing: chunk not fully processed is got again next time
+  for noteIdx in range(5):
+    addFakeNote("notebook-a", "new note %d" % noteIdx)
+  for eachNote in curEvernote.iterChangedNotes("notebook-a", syncStateFile=syncStateFile):
+    break
+  changedNoteList = list(curEvernote.iterChangedNotes("notebook-a", syncStateFile=syncStateFile))
+  print("iterChangedNotes after stopped: got %d changed notes again" % len(changedNoteList))
+  # iterChangedNotes after stopped: got 5 changed notes again
+
+  # state file without afterUsnDict (eg: created by other tool) is also supported
+  with open(syncStateFile, "w") as stateFp:
+    json.dump({}, stateFp)
+  changedNoteList = list(curEvernote.iterChangedNotes("notebook-a", syncStateFile=syncStateFile))
+  print("iterChangedNotes with empty state file: %d changed notes" % len(changedNoteList))
+  # iterChangedNotes with empty state file: 398 changed notes
+  os.remove(syncStateFile)
+
+def demoIterNoteDetails():
+  FakeNoteStore.noteList = []
+  for noteIdx in range(100):
+    addFakeNote("notebook-a", "note %d" % noteIdx)
+  FakeNoteStore.callDelaySeconds = 0.02
+  curEvernote = crifanEvernote("fakeAuthToken", noteStoreFactory=FakeNoteStore)
+  noteList = list(curEvernote.iterNotes("notebook-a"))
+
+  # old: get note detail one by one
+  startTime = time.time()
+  serialTitleList = [eachNoteDetail.title for eachNoteDetail in curEvernote.iterNoteDetails(noteList)]
+  print("iterNoteDetails threadNum=1: %d notes cost %.2f seconds" % (len(serialTitleList), time.time() - startTime))
+  # iterNoteDetails threadNum=1: 100 notes cost 2.05 seconds
+
+  # new: get note detail in parallel, each thread use its own NoteStore, still in same order of input notes
+  FakeNoteStore.createdNum = 0
+  startTime = time.time()
+  parallelTitleList = [eachNoteDetail.title for eachNoteDetail in curEvernote.iterNoteDetails(noteList, threadNum=8)]
+  print("iterNoteDetails threadNum=8: %d notes cost %.2f seconds, same order=%s, new NoteStore num=%d" % (len(parallelTitleList), time.time() - startTime, parallelTitleList == serialTitleList, FakeNoteStore.createdNum))
+  # iterNoteDetails threadNum=8: 100 notes cost 0.28 seconds, same order=True, new NoteStore num=8
+  FakeNoteStore.callDelaySeconds = 0
+
+if __name__ == "__main__":
+  demoIterNotes()
+  demoIterNoteDetails()
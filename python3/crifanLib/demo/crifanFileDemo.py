@@ -10,6 +10,7 @@ sys.path.append(parentParentFolder)
 sys.path.append(parentParentParentFolder)
 
 from crifanFile import getFileFolderSize, formatSize, findNextNumberFilename
+from crifanFile import walkFolder, calcFolderSize
 
 def testNormalFile():
   normalFile = "/Users/crifan/dev/dev_root/crifan/CrifanLib/crifanLib/python/crifanLib/demo/crifanFileDemo.py"
@@ -95,7 +96,22 @@ def demoFindNextNumberFilename():
   print("realExistFile=%s -> nextUntilNotExistFilename=%s" % (realExistFile, nextUntilNotExistFilename))
   # realExistFile=crifanLib/demo/input/image/20191219_172616_drawRect_40x40.jpg -> nextUntilNotExistFilename=crifanLib/demo/input/image/20191219_172616_drawRect_40x40_2.jpg
 
+def demoWalkFolder():
+  userFolder = "/Users/crifan/dev/dev_root/crifan/CrifanLib/crifanLib/python"
+  fileNum = 0
+  for folderPath, fileEntryList, subFolderEntryList, _ in walkFolder(userFolder, threadNum=8):
+    fileNum += len(fileEntryList)
+  print("fileNum=%s" % fileNum)
+
+  folderSizeDict = calcFolderSize(userFolder, threadNum=8)
+  for eachFolder, eachSize in folderSizeDict.items():
+    print("%s -> %s" % (eachFolder, formatSize(eachSize)))
+  # /Users/crifan/dev/dev_root/crifan/CrifanLib/crifanLib/python -> 289.8KB
+  # /Users/crifan/dev/dev_root/crifan/CrifanLib/crifanLib/python/crifanLib -> 193.6KB
+  # ...
+
 if __name__ == "__main__":
   # demoGetFileFolderSize()
   # demoFormatSize()
+  # demoWalkFolder()
   demoFindNextNumberFilename()
@@ -0,0 +1,71 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import re
+import io
+import timeit
+import html.entities as htmlentitydefs
+
+from crifanLib.crifanHtml import htmlEntityNameToCodepoint, htmlEntityCodepointToName, decodeHtmlEntity
+from crifanLib.crifanHtml import htmlEntityNameToCodepointStream
+
+# old implementation: one re.compile(key).sub per entity over whole html
+def oldHtmlEntityNameToCodepoint(htmlWithEntityName):
+  nameToCodepointDict = {}
+  for eachName in htmlentitydefs.name2codepoint:
+    nameToCodepointDict["&" + eachName + ";"] = "&#" + str(htmlentitydefs.name2codepoint[eachName]) + ";"
+  htmlWithCodepoint = htmlWithEntityName
+  for key in nameToCodepointDict.keys():
+    htmlWithCodepoint = re.compile(key).sub(nameToCodepointDict[key], htmlWithCodepoint)
+  return htmlWithCodepoint
+
+def oldHtmlEntityCodepointToName(htmlWithCodepoint):
+  codepointToNameDict = {}
+  for eachCodepoint in htmlentitydefs.codepoint2name:
+    codepointToNameDict["&#" + str(eachCodepoint) + ";"] = "&" + htmlentitydefs.codepoint2name[eachCodepoint] + ";"
+  htmlWithEntityName = htmlWithCodepoint
+  for key in codepointToNameDict.keys():
+    htmlWithEntityName = re.compile(key).sub(codepointToNameDict[key], htmlWithEntityName)
+  return htmlWithEntityName
+
+def generateDemoHtml(repeatNum):
+  singleHtml = "<p>Washer&Dryer;, Awning &amp; more&nbsp;&copy; 2021 &#169; &#xa9; &lt;tag&gt; &#8364; price&#160;100 &euro;</p>\n"
+  return singleHtml * repeatNum
+
+def demoBenchmarkHtmlEntity():
+  demoHtml = generateDemoHtml(20000) # ~2MB
+  print("demoHtml len=%s" % len(demoHtml))
+
+  assert htmlEntityNameToCodepoint(demoHtml) == oldHtmlEntityNameToCodepoint(demoHtml)
+  assert htmlEntityCodepointToName(demoHtml) == oldHtmlEntityCodepointToName(demoHtml)
+
+  benchmarkList = [
+    ("old htmlEntityNameToCodepoint", lambda: oldHtmlEntityNameToCodepoint(demoHtml)),
+    ("new htmlEntityNameToCodepoint", lambda: htmlEntityNameToCodepoint(demoHtml)),
+    ("old htmlEntityCodepointToName", lambda: oldHtmlEntityCodepointToName(demoHtml)),
+    ("new htmlEntityCodepointToName", lambda: htmlEntityCodepointToName(demoHtml)),
+    ("new decodeHtmlEntity", lambda: decodeHtmlEntity(demoHtml)),
+  ]
+  for eachName, eachFunc in benchmarkList:
+    costSeconds = min(timeit.repeat(eachFunc, number=1, repeat=3))
+    print("%-32s %.4f seconds" % (eachName, costSeconds))
+
+def demoHtmlEntityStream():
+  demoHtml = generateDemoHtml(1000)
+  htmlFp = io.StringIO(demoHtml)
+  chunkIter = iter(lambda: htmlFp.read(4096), "")
+  convertedHtml = "".join(htmlEntityNameToCodepointStream(chunkIter))
+  print("stream converted same as whole converted: %s" % (convertedHtml == htmlEntityNameToCodepoint(demoHtml)))
+  # stream converted same as whole converted: True
+
+if __name__ == "__main__":
+  demoBenchmarkHtmlEntity()
+  demoHtmlEntityStream()
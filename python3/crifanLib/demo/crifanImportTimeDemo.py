@@ -0,0 +1,59 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import subprocess
+
+# each module is imported in new python process, so not affected by already imported modules
+DemoModuleList = [
+  "crifanLib.crifanSystem",
+  "crifanLib.crifanList",
+  "crifanLib.crifanFile",
+  "crifanLib.crifanString",
+  "crifanLib.crifanHtml",
+  "crifanLib.crifanMultimedia",
+]
+
+ImportTimeCode = """
+import time
+startTime = time.perf_counter()
+import %s
+costSeconds = time.perf_counter() - startTime
+print("__COST__%%.6f" %% costSeconds)
+"""
+
+RepeatNum = 5
+
+def measureImportTime(moduleName):
+  """import module in new process, return (min import seconds, other stdout output during import)"""
+  costSecondsList = []
+  otherOutput = ""
+  for _ in range(RepeatNum):
+    importCode = ImportTimeCode % moduleName
+    processOutput = subprocess.check_output([sys.executable, "-c", importCode], cwd=parentParentParentFolder)
+    processOutput = processOutput.decode("utf-8")
+    otherLineList = []
+    for eachLine in processOutput.splitlines():
+      if eachLine.startswith("__COST__"):
+        costSecondsList.append(float(eachLine[len("__COST__"):]))
+      else:
+        otherLineList.append(eachLine)
+    otherOutput = "\n".join(otherLineList)
+  return min(costSecondsList), otherOutput
+
+def demoBenchmarkImportTime():
+  for eachModuleName in DemoModuleList:
+    costSeconds, otherOutput = measureImportTime(eachModuleName)
+    print("%-30s %.4f seconds, import print: %s" % (eachModuleName, costSeconds, repr(otherOutput)))
+  # crifanLib.crifanSystem         0.0012 seconds, import print: ''
+  # crifanLib.crifanString         0.0101 seconds, import print: ''
+
+if __name__ == "__main__":
+  demoBenchmarkImportTime()
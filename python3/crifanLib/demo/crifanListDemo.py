@@ -0,0 +1,92 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import time
+import random
+
+from crifanLib.crifanList import uniqueList, filterList, genListStr, iterUniqueList
+
+# old O(n^2) implementation is too slow for more than this number of items
+OldMaxItemNum = 100000
+
+# old implementation: membership test against list
+def oldUniqueList(oldList):
+  newList = []
+  for curItem in oldList:
+    if curItem not in newList:
+      newList.append(curItem)
+  return newList
+
+def oldFilterList(listToFilter, listToCompare):
+  filteredList = []
+  existedList = []
+  for singleOne in listToFilter:
+    if (not (singleOne in listToCompare)):
+      filteredList.append(singleOne)
+    else:
+      existedList.append(singleOne)
+  return (filteredList, existedList)
+
+def oldGenListStr(listValue, delimiter=","):
+  generatedListStr = ""
+  for eachValue in listValue:
+    generatedListStr += str(eachValue)
+    generatedListStr += delimiter
+  if (generatedListStr and (generatedListStr[-1] == delimiter)):
+    generatedListStr = generatedListStr[:-1]
+  return generatedListStr
+
+def generateUrlList(itemNum):
+  # about 10% duplicated urls
+  urlNum = max(1, int(itemNum * 0.9))
+  return ["https://www.crifan.com/files/pic/%d.jpg" % random.randint(0, urlNum) for _ in range(itemNum)]
+
+def calcCostSeconds(func):
+  startTime = time.time()
+  result = func()
+  return time.time() - startTime, result
+
+def demoUniqueList():
+  urlDictList = [{"url": "a.jpg"}, {"url": "b.jpg"}, {"url": "a.jpg"}]
+  print(uniqueList(urlDictList))
+  # [{'url': 'a.jpg'}, {'url': 'b.jpg'}]
+  print(uniqueList(["A.jpg", "a.jpg", "b.jpg"], keyFunc=str.lower))
+  # ['A.jpg', 'b.jpg']
+  # same as old (compare by ==): tuple and list are different item
+  print(uniqueList([(1, [2]), [1, [2]], (1, [2])]))
+  # [(1, [2]), [1, [2]]]
+  lineIter = (eachLine.strip() for eachLine in ["x\n", "y\n", "x\n"])
+  print(list(iterUniqueList(lineIter)))
+  # ['x', 'y']
+
+def demoBenchmarkList():
+  for itemNum in [10000, 100000, 1000000]:
+    urlList = generateUrlList(itemNum)
+    compareUrlList = generateUrlList(itemNum // 10)
+    print("---------- itemNum=%s ----------" % itemNum)
+
+    benchmarkList = [
+      ("uniqueList", lambda: oldUniqueList(urlList), lambda: uniqueList(urlList)),
+      ("filterList", lambda: oldFilterList(urlList, compareUrlList), lambda: filterList(urlList, compareUrlList)),
+      ("genListStr", lambda: oldGenListStr(urlList), lambda: genListStr(urlList)),
+    ]
+    for eachName, oldFunc, newFunc in benchmarkList:
+      newCost, newResult = calcCostSeconds(newFunc)
+      isOldTooSlow = (itemNum > OldMaxItemNum) and (eachName != "genListStr")
+      if isOldTooSlow:
+        print("%-12s old: skipped, new: %.4f seconds" % (eachName, newCost))
+      else:
+        oldCost, oldResult = calcCostSeconds(oldFunc)
+        print("%-12s old: %.4f seconds, new: %.4f seconds, same result: %s" % (eachName, oldCost, newCost, oldResult == newResult))
+
+if __name__ == "__main__":
+  demoUniqueList()
+  demoBenchmarkList()
@@ -9,9 +9,14 @@ sys.path.append(parentFolder)
 sys.path.append(parentParentFolder)
 # sys.path.append(parentParentParentFolder)
 
-from crifanLogging import loggingInit
+import crifanLogging
+from crifanLogging import loggingInit, getFilenameNoPointSuffix, getCurDatetimeStr
 
 import logging
+import time
+import tempfile
+import queue
+import threading
 
 def demoLoggingInit():
   # ---------- New demo ----------
@@ -22,6 +27,7 @@ def demoLoggingInit():
   # 'TIAutoOrder_20221201_174058.log'
   curLogFullFile = os.path.join("debug", "log", curLogFile)
   # 'debug\\log\\TIAutoOrder_20221201_174112.log'
+  os.makedirs(os.path.dirname(curLogFullFile), exist_ok=True)
 
   # 2. call loggingInit then call loggging self 
   crifanLogging.loggingInit(filename=curLogFullFile)
@@ -50,5 +56,109 @@ def demoLoggingInit():
   # # Console:
   # # 20181201 09:49:38 21   INFO    you can see this info in File and Console
 
+def resetRootLogger():
+  crifanLogging.loggingStop()
+  rootLogger = logging.getLogger("")
+  for eachHandler in list(rootLogger.handlers):
+    rootLogger.removeHandler(eachHandler)
+    eachHandler.close()
+
+def demoBenchmarkAsyncLogging():
+  # log calls per second seen by caller thread: sync FileHandler vs async queue + listener thread
+  logNum = 100000
+  tmpFolder = tempfile.mkdtemp()
+  for isAsync in [False, True]:
+    resetRootLogger()
+    curLogFile = os.path.join(tmpFolder, "benchmark_async%s.log" % isAsync)
+    loggingInit(filename=curLogFile, enableConsole=False, isAsync=isAsync, maxBytes=5 * 1024 * 1024, backupCount=3)
+    startTime = time.time()
+    for logIdx in range(logNum):
+      logging.debug("crawl item %d from %s", logIdx, "https://www.crifan.org/page/%d" % logIdx)
+    callSeconds = time.time() - startTime
+    # make sure all log written, for async is wait listener thread handle all queued records
+    resetRootLogger()
+    totalSeconds = time.time() - startTime
+    logFileList = [eachFile for eachFile in os.listdir(tmpFolder) if eachFile.startswith(os.path.basename(curLogFile))]
+    print("isAsync=%s: %d log calls, caller cost %.2fs (%.0f calls/s), until all written %.2fs, log files=%s" %
+      (isAsync, logNum, callSeconds, logNum / callSeconds, totalSeconds, sorted(logFileList)))
+  # isAsync=False: 100000 log calls, caller cost 1.92s (52186 calls/s), until all written 1.92s, log files=['benchmark_asyncFalse.log']
+  # isAsync=True: 100000 log calls, caller cost 1.85s (53973 calls/s), until all written 1.86s, log files=['benchmark_asyncTrue.log', 'benchmark_asyncTrue.log.1', 'benchmark_asyncTrue.log.2']
+  # Note: above is on single CPU machine, result of several runs is nearly same (within +-5%, async sometimes slower):
+  #   format and write is moved to listener thread, but it still need GIL, so run interleaved with caller thread,
+  #   total CPU work is not reduced, so log calls per second of caller is not faster.
+  #   Async only help caller when write is blocked on slow disk/network (GIL released during IO), or on multi CPU,
+  #   and it add file rotation (maxBytes/rotateSeconds) and buffered write
+
+class CountHandler(logging.Handler):
+  def __init__(self):
+    logging.Handler.__init__(self)
+    self.handledNum = 0
+
+  def emit(self, record):
+    self.handledNum += 1
+
+def demoAsyncLogListenerStop():
+  # stop sentinel is in any position of batch (eg: first one after full batch), listener thread should still stop
+  for recordNum in [999, 1000, 1001, 2000, 2001]:
+    logQueue = queue.Queue()
+    countHandler = CountHandler()
+    asyncListener = crifanLogging.AsyncLogListener(logQueue, [countHandler], batchSize=crifanLogging.LOG_ASYNC_BATCH_SIZE)
+    for recordIdx in range(recordNum):
+      logQueue.put(logging.LogRecord("crawler", logging.INFO, __file__, recordIdx, "item %d", (recordIdx,), None))
+    # put stop sentinel before start, so it is got in batch, same as stop() when many records are queued
+    logQueue.put(asyncListener._sentinel)
+    asyncListener.start()
+    asyncListener.thread.join(timeout=5)
+    print("recordNum=%d: listener stopped=%s, handled=%d" % (recordNum, not asyncListener.thread.is_alive(), countHandler.handledNum))
+  # recordNum=999: listener stopped=True, handled=999
+  # recordNum=1000: listener stopped=True, handled=1000
+  # recordNum=1001: listener stopped=True, handled=1001
+  # recordNum=2000: listener stopped=True, handled=2000
+  # recordNum=2001: listener stopped=True, handled=2001
+  # (before: sentinel after full batch is lost, recordNum=1000/2001: listener stopped=False, stop() hang forever)
+
+def demoBenchmarkLogFormatter():
+  # format same records by old LogFormatter, CompiledLogFormatter and JsonLogFormatter
+  os.environ["LOGZERO_FORCE_COLOR"] = "1"
+  colorFmt = "%(color)s%(asctime)s %(filename)s:%(lineno)-4d %(levelname)-7s%(end_color)s %(message)s"
+  recordList = []
+  for recordIdx in range(1000):
+    curLevel = [logging.DEBUG, logging.INFO, logging.WARNING][recordIdx % 3]
+    curRecord = logging.LogRecord("crawler", curLevel, __file__, recordIdx, "crawl item %d from %s", (recordIdx, "https://www.crifan.org/page/%d" % recordIdx), None)
+    recordList.append(curRecord)
+  try:
+    1 / 0
+  except ZeroDivisionError:
+    recordList.append(logging.LogRecord("crawler", logging.ERROR, __file__, 1, "multiple\nline", None, sys.exc_info()))
+
+  for curFmt in [colorFmt, crifanLogging.LOG_FORMAT_FILE]:
+    formatterList = [
+      crifanLogging.LogFormatter(fmt=curFmt, datefmt=crifanLogging.LOG_FORMAT_FILE_DATETIME),
+      crifanLogging.CompiledLogFormatter(fmt=curFmt, datefmt=crifanLogging.LOG_FORMAT_FILE_DATETIME),
+      crifanLogging.JsonLogFormatter(),
+    ]
+    outputListList = []
+    for curFormatter in formatterList:
+      startTime = time.time()
+      for _ in range(100):
+        outputList = [curFormatter.format(eachRecord) for eachRecord in recordList]
+      costSeconds = time.time() - startTime
+      outputListList.append(outputList)
+      print("%-20s: format %d records cost %.3fs (%.0f records/s)" % (type(curFormatter).__name__, 100 * len(recordList), costSeconds, 100 * len(recordList) / costSeconds))
+    print("isColorFmt=%s, compiled output same as old: %s" % (curFmt == colorFmt, outputListList[0] == outputListList[1]))
+  print("json line: %s" % outputListList[2][0])
+  # LogFormatter        : format 100100 records cost 0.438s (228626 records/s)
+  # CompiledLogFormatter: format 100100 records cost 0.296s (337741 records/s)
+  # JsonLogFormatter    : format 100100 records cost 1.050s (95360 records/s)
+  # isColorFmt=True, compiled output same as old: True
+  # LogFormatter        : format 100100 records cost 0.440s (227307 records/s)
+  # CompiledLogFormatter: format 100100 records cost 0.333s (300431 records/s)
+  # JsonLogFormatter    : format 100100 records cost 0.910s (110005 records/s)
+  # isColorFmt=False, compiled output same as old: True
+  # json line: {"created": 1792293824.5156374, "levelname": "DEBUG", "name": "crawler", "filename": "crifanLoggingDemo.py", "lineno": 0, "message": "crawl item 0 from https://www.crifan.org/page/0"}
+
 if __name__ == "__main__":
   demoLoggingInit()
+  demoAsyncLogListenerStop()
+  demoBenchmarkAsyncLogging()
+  demoBenchmarkLogFormatter()
@@ -0,0 +1,271 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import re
+import time
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+
+import pymysql
+
+from crifanLib.thirdParty.crifanMysql import MysqlDb, MysqlConnectionPool
+
+DemoCreateTableSqlTemplate = """CREATE TABLE IF NOT EXISTS `%s` (
+  `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `category` char(20) NOT NULL,
+  `name` char(20) NOT NULL,
+  `value` int(11) NOT NULL,
+  `comments` varchar(200) DEFAULT '',
+  UNIQUE (`category`,`name`)
+)"""
+
+class FakeMysqlCursor:
+  """DB-API cursor of FakeMysqlConnection: translate mysql (format paramstyle) sql to sqlite, each call cost one network round trip"""
+
+  def __init__(self, fakeConnection, isDictRow=True):
+    self.fakeConnection = fakeConnection
+    self.isDictRow = isDictRow
+    self.sqliteCursor = fakeConnection.sqliteConnection.cursor()
+    self.rowcount = -1
+
+  def toSqliteSql(self, sqlStr):
+    # INSERT ... ON DUPLICATE KEY UPDATE `b`=VALUES(`b`) -> INSERT ... ON CONFLICT DO UPDATE SET `b`=excluded.`b`
+    sqlStr = re.sub(r"\s+ON DUPLICATE KEY UPDATE\s+", " ON CONFLICT DO UPDATE SET ", sqlStr)
+    sqlStr = re.sub(r"VALUES\((`\w+`)\)", r"excluded.\1", sqlStr)
+    return sqlStr.replace("%s", "?")
+
+  def runSqlite(self, sqliteFunc, sqlStr, params):
+    self.fakeConnection.roundTrip()
+    try:
+      sqliteFunc(self.toSqliteSql(sqlStr), params)
+    except sqlite3.IntegrityError as err:
+      raise pymysql.err.IntegrityError(1062, str(err))
+    except sqlite3.Error as err:
+      raise pymysql.err.ProgrammingError(1064, str(err))
+    self.rowcount = self.sqliteCursor.rowcount
+    return self.rowcount
+
+  def execute(self, sqlStr, params=None):
+    return self.runSqlite(self.sqliteCursor.execute, sqlStr, params or ())
+
+  def executemany(self, sqlStr, paramsList):
+    # like pymysql: all rows sent in one (multiple rows VALUES) statement
+    return self.runSqlite(self.sqliteCursor.executemany, sqlStr, paramsList)
+
+  def toRowList(self, sqliteRowList):
+    if not self.isDictRow:
+      return sqliteRowList
+    columnList = [eachDesc[0] for eachDesc in (self.sqliteCursor.description or [])]
+    return [dict(zip(columnList, eachRow)) for eachRow in sqliteRowList]
+
+  def fetchall(self):
+    return self.toRowList(self.sqliteCursor.fetchall())
+
+  def fetchmany(self, size):
+    # like unbuffered cursor: each fetch get rows from server
+    self.fakeConnection.roundTrip()
+    return self.toRowList(self.sqliteCursor.fetchmany(size))
+
+  def close(self):
+    self.sqliteCursor.close()
+
+class FakeMysqlConnection:
+  """DB-API connection, backed by sqlite file, simulate mysql server network round trip for execute and commit"""
+  RoundTripSeconds = 0.001
+  connectCount = 0
+
+  def __init__(self, database, **otherConfig):
+    FakeMysqlConnection.connectCount += 1
+    self.sqliteConnection = sqlite3.connect(database, timeout=30, check_same_thread=False)
+
+  def roundTrip(self):
+    time.sleep(self.RoundTripSeconds)
+
+  def cursor(self, cursorclass=None):
+    isDictRow = (cursorclass is None) or issubclass(cursorclass, pymysql.cursors.DictCursorMixin)
+    return FakeMysqlCursor(self, isDictRow=isDictRow)
+
+  def commit(self):
+    self.roundTrip()
+    self.sqliteConnection.commit()
+
+  def rollback(self):
+    self.sqliteConnection.rollback()
+
+  def close(self):
+    self.sqliteConnection.close()
+
+def createDemoMysqlDb(tableName, poolSize=5):
+  dbFile = os.path.join(tempfile.mkdtemp(), "demo.db")
+  demoConfig = {"host": "127.0.0.1", "database": dbFile}
+  mysqlObj = MysqlDb(config=demoConfig, needCreateTable=True, tableName=tableName,
+    createTableSqlTemplate=DemoCreateTableSqlTemplate, poolSize=poolSize, connectFunc=FakeMysqlConnection)
+  mysqlObj.isUseLog = False
+  return mysqlObj
+
+def genDemoRows(rowNum, namePrefix="name"):
+  for rowIdx in range(rowNum):
+    yield {
+      "category": "word_type",
+      "name": "%s%d" % (namePrefix, rowIdx),
+      "value": rowIdx,
+      "comments": 'has "quote" and \' and None: %s' % None if rowIdx == 0 else None,
+    }
+
+def countRows(mysqlObj, tableName):
+  isOk, resultDict = mysqlObj.executeSql("SELECT COUNT(*) AS rowNum FROM %s" % tableName)
+  return resultDict["data"][0]["rowNum"]
+
+def demoBulkInsert():
+  tableName = "enum_value_dict"
+  rowNum = 2000
+
+  # old: insert row by row, each is one execute + one commit
+  mysqlObj = createDemoMysqlDb(tableName)
+  startTime = time.time()
+  for eachRow in genDemoRows(rowNum):
+    mysqlObj.insert(eachRow, tablename=tableName)
+  print("insert one by one: %d rows cost %.2fs, table row num=%d" % (rowNum, time.time() - startTime, countRows(mysqlObj, tableName)))
+
+  # new: bulkInsert, each batch is one executemany + one commit
+  mysqlObj = createDemoMysqlDb(tableName)
+  startTime = time.time()
+  isOk, resultDict = mysqlObj.bulkInsert(genDemoRows(rowNum), batchSize=500, tablename=tableName)
+  print("bulkInsert: %d rows cost %.2fs, isOk=%s, data=%s, table row num=%d" % (rowNum, time.time() - startTime, isOk, resultDict["data"], countRows(mysqlObj, tableName)))
+  # insert one by one: 2000 rows cost 8.83s, table row num=2000
+  # bulkInsert: 2000 rows cost 0.03s, isOk=True, data={'rowNum': 2000, 'affectedRowNum': 2000, 'batchNum': 4}, table row num=2000
+
+  # value with quote and None is kept as it is
+  isOk, resultDict = mysqlObj.executeSql("SELECT comments FROM %s WHERE name=%%s" % tableName, sqlParams=("name0", ))
+  print("comments of name0: %s" % resultDict["data"][0]["comments"])
+  # comments of name0: has "quote" and ' and None: None
+
+  # duplicated key: failed without ON DUPLICATE KEY UPDATE
+  updatedRowList = [{"category": "word_type", "name": "name1", "value": 100}, {"category": "word_type", "name": "name2", "value": 200}]
+  isOk, resultDict = mysqlObj.bulkInsert(updatedRowList, tablename=tableName)
+  print("bulkInsert duplicated: isOk=%s, code=%s" % (isOk, resultDict["code"]))
+  # bulkInsert duplicated: isOk=False, code=1062
+  isOk, resultDict = mysqlObj.bulkInsert(updatedRowList, tablename=tableName, updateFieldList=["value"])
+  isSelectOk, selectResultDict = mysqlObj.executeSql("SELECT name, value FROM %s WHERE name IN (%%s, %%s)" % tableName, sqlParams=("name1", "name2"))
+  print("bulkInsert with updateFieldList: isOk=%s, updated=%s, table row num=%d" % (isOk, selectResultDict["data"], countRows(mysqlObj, tableName)))
+  # bulkInsert with updateFieldList: isOk=True, updated=[{'name': 'name1', 'value': 100}, {'name': 'name2', 'value': 200}], table row num=2000
+
+  # multiple threads share the connection pool, for both bulkInsert and executeSql (insert)
+  def insertOneByOne(rows):
+    for eachRow in rows:
+      mysqlObj.insert(eachRow, tablename=tableName)
+
+  mysqlObj = createDemoMysqlDb(tableName, poolSize=2)
+  FakeMysqlConnection.connectCount = 0
+  threadList = []
+  for threadIdx in range(6):
+    curThread = threading.Thread(target=mysqlObj.bulkInsert, args=(genDemoRows(1000, namePrefix="thread%d_" % threadIdx), ), kwargs={"batchSize": 100, "tablename": tableName})
+    threadList.append(curThread)
+    curThread = threading.Thread(target=insertOneByOne, args=(genDemoRows(20, namePrefix="insertThread%d_" % threadIdx), ))
+    threadList.append(curThread)
+  for curThread in threadList:
+    curThread.start()
+  for curThread in threadList:
+    curThread.join()
+  print("6 threads bulkInsert and 6 threads insert with poolSize=2: pool connection num=%d, table row num=%d" % (mysqlObj.pool.createdNum, countRows(mysqlObj, tableName)))
+  # 6 threads bulkInsert and 6 threads insert with poolSize=2: pool connection num=2, table row num=6120
+  mysqlObj.close()
+
+def demoQueryIter():
+  tableName = "enum_value_dict"
+  rowNum = 100000
+  mysqlObj = createDemoMysqlDb(tableName, poolSize=2)
+  mysqlObj.bulkInsert(genDemoRows(rowNum), batchSize=5000, tablename=tableName)
+  selectSql = "SELECT * FROM %s WHERE value >= %%s" % tableName
+
+  # old: executeSql fetchall all rows into list of dict
+  tracemalloc.start()
+  isOk, resultDict = mysqlObj.executeSql(selectSql, sqlParams=(0, ))
+  valueSum = sum(eachRow["value"] for eachRow in resultDict["data"])
+  del resultDict
+  _, peakBytes = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  print("executeSql fetchall: valueSum=%d, peak memory=%.1fMB" % (valueSum, peakBytes / 1024 / 1024))
+
+  # new: queryIter, only one chunk in memory
+  for isDictRow, isYieldChunk in [(True, False), (False, True)]:
+    FakeMysqlConnection.connectCount = 0
+    tracemalloc.start()
+    if isYieldChunk:
+      valueSum = 0
+      for chunkRowList in mysqlObj.queryIter(selectSql, (0, ), chunkSize=1000, isDictRow=isDictRow, isYieldChunk=True):
+        valueSum += sum(eachRow[3] for eachRow in chunkRowList)
+    else:
+      valueSum = sum(eachRow["value"] for eachRow in mysqlObj.queryIter(selectSql, (0, ), chunkSize=1000))
+    _, peakBytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("queryIter isDictRow=%s, isYieldChunk=%s: valueSum=%d, peak memory=%.1fMB, new connection num=%d" % (isDictRow, isYieldChunk, valueSum, peakBytes / 1024 / 1024, FakeMysqlConnection.connectCount))
+  # executeSql fetchall: valueSum=4999950000, peak memory=43.8MB
+  # queryIter isDictRow=True, isYieldChunk=False: valueSum=4999950000, peak memory=0.7MB, new connection num=0
+  # queryIter isDictRow=False, isYieldChunk=True: valueSum=4999950000, peak memory=0.4MB, new connection num=0
+  # (new connection num=0: reuse the one created by bulkInsert, released back to pool)
+
+  # stop early: connection is discarded, not put back to pool
+  for eachRow in mysqlObj.queryIter(selectSql, (0, )):
+    break
+  print("after break: pool created connection num=%d, idle connection num=%d" % (mysqlObj.pool.createdNum, len(mysqlObj.pool.idleList)))
+  # after break: pool created connection num=0, idle connection num=0
+  mysqlObj.close()
+
+def demoPoolDiscardWakeWaiter():
+  # maxSize=1, waiter is blocked in getConnection, then holder's connection is broken and discarded:
+  # waiter should be woken up and create new connection, not wait forever
+  dbFile = os.path.join(tempfile.mkdtemp(), "demo.db")
+  curPool = MysqlConnectionPool(lambda: FakeMysqlConnection(dbFile), maxSize=1)
+  waiterResultList = []
+  def waiterThreadFunc():
+    with curPool.connection() as curConnection:
+      waiterResultList.append(curConnection)
+
+  FakeMysqlConnection.connectCount = 0
+  waiterThread = threading.Thread(target=waiterThreadFunc, daemon=True)
+  try:
+    with curPool.connection() as holderConnection:
+      waiterThread.start()
+      time.sleep(0.1)
+      raise pymysql.err.OperationalError(2013, "Lost connection to MySQL server during query")
+  except pymysql.err.OperationalError:
+    pass
+  waiterThread.join(timeout=5)
+  print("discard then wake waiter: waiter got connection=%s, new connection num=%d, pool created connection num=%d" % (
+    bool(waiterResultList), FakeMysqlConnection.connectCount, curPool.createdNum))
+  # discard then wake waiter: waiter got connection=True, new connection num=2, pool created connection num=1
+  # (before: waiter hang forever: waiter got connection=False, new connection num=1, pool created connection num=0)
+
+  # queryIter stop early also discard connection: other thread waiting for connection still continue
+  tableName = "enum_value_dict"
+  mysqlObj = createDemoMysqlDb(tableName, poolSize=1)
+  mysqlObj.bulkInsert(genDemoRows(1000), tablename=tableName)
+  selectSql = "SELECT * FROM %s WHERE value >= %%s" % tableName
+  countResultList = []
+  countThread = threading.Thread(target=lambda: countResultList.append(sum(1 for _ in mysqlObj.queryIter(selectSql, (0, )))), daemon=True)
+  for eachRow in mysqlObj.queryIter(selectSql, (0, )):
+    countThread.start()
+    time.sleep(0.1)
+    break
+  countThread.join(timeout=5)
+  print("queryIter break then wake waiter: waiter got row num=%s" % countResultList)
+  # queryIter break then wake waiter: waiter got row num=[1000]
+  # (before: waiter hang forever: waiter got row num=[])
+  mysqlObj.close()
+  curPool.closeAll()
+
+if __name__ == "__main__":
+  demoBulkInsert()
+  demoQueryIter()
+  demoPoolDiscardWakeWaiter()
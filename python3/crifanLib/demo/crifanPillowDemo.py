@@ -0,0 +1,105 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import io
+import copy
+import time
+import tempfile
+import concurrent.futures
+
+from PIL import Image
+from PIL import ImageDraw
+
+from crifanLib.thirdParty.crifanPillow import resizeSingleImage, detectImageFormat, bytesToImage, imageToBytes, convertImageFormat, cfgDefaultImageResample
+from crifanLib.crifanFile import formatSize
+
+def genFakeScreenshot(screenshotIdx, imgSize=(1080, 2340)):
+  """generate phone screenshot like image: status bar, text lines, buttons and a photo (noise) area"""
+  curImg = Image.new("RGB", imgSize, (255, 255, 255))
+  curDraw = ImageDraw.Draw(curImg)
+  imgWidth, imgHeight = imgSize
+  curDraw.rectangle([0, 0, imgWidth, 80], fill=(30, 30, 30))
+  for lineIdx in range(60):
+    lineTop = 120 + lineIdx * 36
+    curDraw.text((40, lineTop), "screenshot %d line %d: some app text content ..." % (screenshotIdx, lineIdx), fill=(20, 20, 20))
+    if lineIdx % 8 == 0:
+      curDraw.rounded_rectangle([40, lineTop, imgWidth - 40, lineTop + 28], radius=10, outline=(0, 120, 255), width=3)
+  photoTop = imgHeight // 2 + (screenshotIdx % 3) * 100
+  photoImg = Image.effect_noise((imgWidth - 80, 500), 40 + screenshotIdx * 10).convert("RGB")
+  curImg.paste(photoImg, (40, photoTop))
+  return curImg
+
+def genFakeScreenshotFolder(screenshotNum=6):
+  screenshotFolder = tempfile.mkdtemp()
+  for screenshotIdx in range(screenshotNum):
+    curImg = genFakeScreenshot(screenshotIdx)
+    if screenshotIdx % 2 == 0:
+      curImg.save(os.path.join(screenshotFolder, "Screenshot_%d.png" % screenshotIdx))
+    else:
+      curImg.save(os.path.join(screenshotFolder, "Screenshot_%d.jpg" % screenshotIdx), quality=95)
+  return screenshotFolder
+
+def oldResizeSingleImage(imgBytes, newSize):
+  """old (before decode once) resizeSingleImage: for each candidate format, decode input, deepcopy and re-encode origin,
+  then convert format by save (default quality) and reopen, then encode again (JPEG quality 90)"""
+  candidateInfoList = []
+  originFormat = bytesToImage(imgBytes).format
+  anotherFormat = "PNG" if originFormat == "JPEG" else "JPEG"
+  for eachFormat in [originFormat, anotherFormat]:
+    imgObj = bytesToImage(imgBytes)
+    originLen = len(imageToBytes(copy.deepcopy(imgObj)))
+    imgObj.thumbnail(newSize, cfgDefaultImageResample)
+    imgObj = convertImageFormat(imgObj, eachFormat)
+    newBytes = imageToBytes(imgObj)
+    candidateInfoList.append({"newFormat": imgObj.format, "newLen": len(newBytes), "resizeRatio": len(newBytes) / originLen})
+  return min(candidateInfoList, key=lambda eachInfo: eachInfo["resizeRatio"])
+
+def demoBenchmarkResizeSingleImage(screenshotFolder=None):
+  # resize each phone screenshot in folder, output the smaller one of PNG/JPEG
+  if not screenshotFolder:
+    screenshotFolder = genFakeScreenshotFolder()
+
+  imgBytesList = []
+  for eachFilename in sorted(os.listdir(screenshotFolder)):
+    with open(os.path.join(screenshotFolder, eachFilename), "rb") as imgFp:
+      imgBytes = imgFp.read()
+    if detectImageFormat(imgBytes):
+      imgBytesList.append((eachFilename, imgBytes))
+
+  # old: run baseline implementation, to compare cost and output size
+  newSizeList = [resizeSingleImage(imgBytes)["newSize"] for _, imgBytes in imgBytesList]
+  startTime = time.time()
+  oldInfoList = [oldResizeSingleImage(imgBytes, newSize) for (_, imgBytes), newSize in zip(imgBytesList, newSizeList)]
+  oldCost = time.time() - startTime
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=2) as encodeExecutor:
+    startTime = time.time()
+    newInfoList = [resizeSingleImage(imgBytes, encodeExecutor=encodeExecutor) for _, imgBytes in imgBytesList]
+    newCost = time.time() - startTime
+
+  for (eachFilename, imgBytes), oldInfo, imgInfo in zip(imgBytesList, oldInfoList, newInfoList):
+    candidateStr = ", ".join("%s=%s" % (eachFormat, formatSize(eachLen)) for eachFormat, eachLen in imgInfo["candidateLenDict"].items())
+    print("%s: %s %s %s -> %s %s %s, candidate: %s; old: %s %s (%+.1f%%)" % (eachFilename,
+      imgInfo["originFormat"], imgInfo["originSize"], formatSize(imgInfo["originLen"]),
+      imgInfo["newFormat"], imgInfo["newSize"], formatSize(imgInfo["newLen"]), candidateStr,
+      oldInfo["newFormat"], formatSize(oldInfo["newLen"]), (imgInfo["newLen"] - oldInfo["newLen"]) * 100.0 / oldInfo["newLen"]))
+  print("resizeSingleImage %d images: old cost %.2fs, new cost %.2fs, total output old %s, new %s" % (len(imgBytesList), oldCost, newCost,
+    formatSize(sum(eachInfo["newLen"] for eachInfo in oldInfoList)), formatSize(sum(eachInfo["newLen"] for eachInfo in newInfoList))))
+  # Screenshot_0.png: PNG (1080, 2340) 1.2MB -> JPEG (360, 780) 53.2KB, candidate: PNG=82.7KB, JPEG=53.2KB; old: JPEG 46.4KB (+14.7%)
+  # Screenshot_1.jpg: JPEG (1080, 2340) 640.7KB -> JPEG (360, 780) 55.2KB, candidate: JPEG=55.2KB, PNG=95.6KB; old: JPEG 55.2KB (+0.0%)
+  # ...
+  # resizeSingleImage 6 images: old cost 3.25s, new cost 0.68s, total output old 327.6KB, new 344.1KB
+  # Note: output is NOT same as old for PNG input: old convert PNG to JPEG by encode in default quality (75) then reopen and
+  #   encode again in quality 90, new only encode once in quality 90, so JPEG output is 8%~15% larger (but better quality,
+  #   no double compression); for JPEG input output is same
+
+if __name__ == "__main__":
+  demoBenchmarkResizeSingleImage()
@@ -0,0 +1,336 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import re
+import time
+import hashlib
+import threading
+import http.server
+
+from crifanLib.thirdParty.crifanRequests import downloadFile, segmentedDownloadFile, SEGMENT_MANIFEST_SUFFIX
+from crifanLib.thirdParty.crifanRequests import isAndroidApkUrl, getFileSizeFromUrl, clearRespMetaCache
+from crifanLib.thirdParty.crifanRequests import isValidImageUrl, validateUrlBatch, UrlValidateType
+from crifanLib.thirdParty.crifanRequests import ProgressReporter, NullProgressReporter, streamingDownloadFile
+
+DemoOutputFolder = os.path.join(os.path.dirname(curFolder), "output")
+
+ExtToContentTypeDict = {
+  ".apk": "application/vnd.android.package-archive",
+  ".jpg": "image/jpeg",
+  ".png": "image/png",
+}
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+  """Local stand-in of CDN: serve in memory file, support HEAD and Range request"""
+  fileBytes = b""
+  # if > 0, only send this size for each GET, then close connection, to simulate interrupted download
+  maxSendSize = 0
+  # if > 0, limit send speed of each connection, to simulate throttled connection of CDN
+  maxBytesPerSecond = 0
+  SendBlockSize = 64 * 1024
+  # if False, HEAD return 501, to simulate server not support HEAD
+  isSupportHead = True
+  # if False, ignore Range header, always return 200 with whole file
+  isSupportRange = True
+  # url path -> status code, return error page (with Content-Length) for these url
+  errorPathDict = {}
+  # request count of each method, eg: {"HEAD": 1, "GET": 1}
+  requestCountDict = {}
+  # if > 0, delay before response, to simulate network latency
+  responseDelaySeconds = 0
+  # current and max concurrent request number of each Host header
+  hostConcurrentDict = {}
+  hostMaxConcurrentDict = {}
+  hostLock = threading.Lock()
+
+  def do_HEAD(self):
+    self.requestCountDict["HEAD"] = self.requestCountDict.get("HEAD", 0) + 1
+    if self.isSupportHead:
+      self.sendFile(isSendBody=False)
+    else:
+      self.send_error(501)
+
+  def do_GET(self):
+    self.requestCountDict["GET"] = self.requestCountDict.get("GET", 0) + 1
+    self.sendFile(isSendBody=True)
+
+  def sendFile(self, isSendBody):
+    curHost = self.headers.get("Host", "")
+    with self.hostLock:
+      self.hostConcurrentDict[curHost] = self.hostConcurrentDict.get(curHost, 0) + 1
+      self.hostMaxConcurrentDict[curHost] = max(self.hostMaxConcurrentDict.get(curHost, 0), self.hostConcurrentDict[curHost])
+    try:
+      if self.responseDelaySeconds:
+        time.sleep(self.responseDelaySeconds)
+      self.sendFileBytes(isSendBody)
+    finally:
+      with self.hostLock:
+        self.hostConcurrentDict[curHost] -= 1
+
+  def sendFileBytes(self, isSendBody):
+    errorCode = self.errorPathDict.get(self.path.split("?")[0])
+    if errorCode:
+      self.send_error(errorCode)
+      return
+
+    totalSize = len(self.fileBytes)
+    startPos = 0
+    endPos = totalSize - 1
+    statusCode = 200
+    foundRange = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+    if foundRange and self.isSupportRange:
+      startPos = int(foundRange.group(1))
+      if foundRange.group(2):
+        endPos = min(int(foundRange.group(2)), totalSize - 1)
+      statusCode = 206
+
+    self.send_response(statusCode)
+    urlPath = self.path.split("?")[0]
+    contentType = ExtToContentTypeDict.get(os.path.splitext(urlPath)[1], "text/html; charset=UTF-8")
+    self.send_header("Content-Type", contentType)
+    self.send_header("Accept-Ranges", "bytes")
+    self.send_header("Content-Length", str(endPos - startPos + 1))
+    if statusCode == 206:
+      self.send_header("Content-Range", "bytes %d-%d/%d" % (startPos, endPos, totalSize))
+    self.end_headers()
+
+    if isSendBody:
+      bodyBytes = self.fileBytes[startPos:endPos + 1]
+      if self.maxSendSize:
+        bodyBytes = bodyBytes[:self.maxSendSize]
+        self.close_connection = True
+      try:
+        for blockStart in range(0, len(bodyBytes), self.SendBlockSize):
+          self.wfile.write(bodyBytes[blockStart:blockStart + self.SendBlockSize])
+          if self.maxBytesPerSecond:
+            time.sleep(self.SendBlockSize / self.maxBytesPerSecond)
+      except (BrokenPipeError, ConnectionResetError):
+        # client only need headers, closed connection
+        self.close_connection = True
+
+  def log_message(self, format, *args):
+    pass
+
+def startRangeServer(fileBytes):
+  RangeRequestHandler.fileBytes = fileBytes
+  httpServer = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+  serverThread = threading.Thread(target=httpServer.serve_forever, daemon=True)
+  serverThread.start()
+  fileUrl = "http://127.0.0.1:%d/demo.apk" % httpServer.server_address[1]
+  return httpServer, fileUrl
+
+def calcFileMd5(filePath):
+  with open(filePath, "rb") as fileFp:
+    return hashlib.md5(fileFp.read()).hexdigest()
+
+def demoSegmentedDownload():
+  fileBytes = os.urandom(20 * 1024 * 1024)
+  fileMd5 = hashlib.md5(fileBytes).hexdigest()
+  httpServer, fileUrl = startRangeServer(fileBytes)
+  os.makedirs(DemoOutputFolder, exist_ok=True)
+  fileToSave = os.path.join(DemoOutputFolder, "segmentedDownload.apk")
+  if os.path.isfile(fileToSave):
+    os.remove(fileToSave)
+
+  # 1. interrupted: each segment only got first 1MB
+  RangeRequestHandler.maxSendSize = 1024 * 1024
+  isDownloadOk = segmentedDownloadFile(fileUrl, fileToSave, segmentNum=4, isShowSpeed=False)
+  print("interrupted: isDownloadOk=%s, manifest exist=%s" % (isDownloadOk, os.path.isfile(fileToSave + SEGMENT_MANIFEST_SUFFIX)))
+  # interrupted: isDownloadOk=False, manifest exist=True
+
+  # 2. resume each segment from its own downloaded position
+  RangeRequestHandler.maxSendSize = 0
+  isDownloadOk = downloadFile(fileUrl, fileToSave, segmentNum=4)
+  print("resumed: isDownloadOk=%s, same md5=%s, manifest exist=%s" % (isDownloadOk, calcFileMd5(fileToSave) == fileMd5, os.path.isfile(fileToSave + SEGMENT_MANIFEST_SUFFIX)))
+  # resumed: isDownloadOk=True, same md5=True, manifest exist=False
+
+  httpServer.shutdown()
+
+def demoBenchmarkSegmentedDownload():
+  fileBytes = os.urandom(20 * 1024 * 1024)
+  httpServer, fileUrl = startRangeServer(fileBytes)
+  # each connection is throttled to 8MB/s
+  RangeRequestHandler.maxBytesPerSecond = 8 * 1024 * 1024
+  os.makedirs(DemoOutputFolder, exist_ok=True)
+  fileToSave = os.path.join(DemoOutputFolder, "segmentedDownload.apk")
+  for segmentNum in [1, 4, 8]:
+    if os.path.isfile(fileToSave):
+      os.remove(fileToSave)
+    startTime = time.time()
+    isDownloadOk = segmentedDownloadFile(fileUrl, fileToSave, segmentNum=segmentNum, isShowSpeed=False)
+    print("segmentNum=%d, isDownloadOk=%s, cost %.2f seconds" % (segmentNum, isDownloadOk, time.time() - startTime))
+  # segmentNum=1, isDownloadOk=True, cost 2.61 seconds
+  # segmentNum=4, isDownloadOk=True, cost 0.68 seconds
+  # segmentNum=8, isDownloadOk=True, cost 0.36 seconds
+  RangeRequestHandler.maxBytesPerSecond = 0
+  os.remove(fileToSave)
+  httpServer.shutdown()
+
+def demoRespMetaReuse():
+  fileBytes = os.urandom(2 * 1024 * 1024)
+  httpServer, fileUrl = startRangeServer(fileBytes)
+  os.makedirs(DemoOutputFolder, exist_ok=True)
+  fileToSave = os.path.join(DemoOutputFolder, "respMetaReuse.apk")
+  # before: isAndroidApkUrl, downloadFile, streamingDownloadFile each open a GET -> {'GET': 3}
+  for isSupportHead in [True, False]:
+    RangeRequestHandler.isSupportHead = isSupportHead
+    RangeRequestHandler.requestCountDict.clear()
+    clearRespMetaCache()
+    if os.path.isfile(fileToSave):
+      os.remove(fileToSave)
+    isApk, apkSize = isAndroidApkUrl(fileUrl)
+    fileSize = getFileSizeFromUrl(fileUrl)
+    isDownloadOk = downloadFile(fileUrl, fileToSave)
+    isSameFile = open(fileToSave, "rb").read() == fileBytes
+    print("isSupportHead=%s: isApk=%s, size=%s, isDownloadOk=%s, isSameFile=%s, requestCountDict=%s" % (isSupportHead, isApk, fileSize, isDownloadOk, isSameFile, RangeRequestHandler.requestCountDict))
+  # isSupportHead=True: isApk=True, size=2097152, isDownloadOk=True, isSameFile=True, requestCountDict={'HEAD': 1, 'GET': 1}
+  # isSupportHead=False: isApk=True, size=2097152, isDownloadOk=True, isSameFile=True, requestCountDict={'HEAD': 1, 'GET': 2}
+  RangeRequestHandler.isSupportHead = True
+  os.remove(fileToSave)
+  httpServer.shutdown()
+
+def demoDownloadStatusCheck():
+  fileBytes = os.urandom(2 * 1024 * 1024)
+  httpServer, fileUrl = startRangeServer(fileBytes)
+  os.makedirs(DemoOutputFolder, exist_ok=True)
+  fileToSave = os.path.join(DemoOutputFolder, "statusCheck.apk")
+
+  # error page (404, fallback to GET also 404, with Content-Length) is not saved as downloaded file
+  notFoundUrl = fileUrl.replace("demo.apk", "notFound.apk")
+  RangeRequestHandler.errorPathDict["/notFound.apk"] = 404
+  isDownloadOk = downloadFile(notFoundUrl, fileToSave)
+  print("404: isDownloadOk=%s, file exist=%s" % (isDownloadOk, os.path.isfile(fileToSave)))
+  # 404: isDownloadOk=False, file exist=False
+  # (before: isDownloadOk=True, file exist=True, saved the error page)
+
+  # resume from half downloaded, but server ignore Range and return 200 whole file: not append it
+  with open(fileToSave, "wb") as fileFp:
+    fileFp.write(fileBytes[:len(fileBytes) // 2])
+  RangeRequestHandler.isSupportRange = False
+  isDownloadOk = downloadFile(fileUrl, fileToSave)
+  print("server ignore Range: isDownloadOk=%s, file size=%d" % (isDownloadOk, os.path.getsize(fileToSave)))
+  # server ignore Range: isDownloadOk=False, file size=1048576
+  # (before: isDownloadOk=True, file size=3145728 = half + whole file)
+
+  RangeRequestHandler.isSupportRange = True
+  isDownloadOk = downloadFile(fileUrl, fileToSave)
+  print("server support Range: isDownloadOk=%s, isSameFile=%s" % (isDownloadOk, open(fileToSave, "rb").read() == fileBytes))
+  # server support Range: isDownloadOk=True, isSameFile=True
+
+  RangeRequestHandler.errorPathDict.clear()
+  os.remove(fileToSave)
+  httpServer.shutdown()
+
+def demoValidateUrlBatch():
+  httpServer, fileUrl = startRangeServer(os.urandom(1024))
+  serverPort = httpServer.server_address[1]
+  RangeRequestHandler.responseDelaySeconds = 0.05
+  # 2 hosts, same local server
+  urlList = []
+  for urlIdx in range(200):
+    curHost = "127.0.0.1" if (urlIdx % 2) else "localhost"
+    curExt = [".jpg", ".png", ".apk", ".html"][urlIdx % 4]
+    urlList.append("http://%s:%d/file%d%s" % (curHost, serverPort, urlIdx, curExt))
+
+  clearRespMetaCache()
+  startTime = time.time()
+  singleResultDict = {eachUrl: isValidImageUrl(eachUrl) for eachUrl in urlList}
+  singleCost = time.time() - startTime
+
+  clearRespMetaCache()
+  RangeRequestHandler.hostMaxConcurrentDict.clear()
+  startTime = time.time()
+  batchResultDict = {}
+  for eachUrl, isValid, errMsg in validateUrlBatch(urlList, UrlValidateType.IMAGE, threadNum=32, perHostNum=8):
+    batchResultDict[eachUrl] = isValid
+  batchCost = time.time() - startTime
+  print("single: %.2f seconds, batch: %.2f seconds, same result: %s, host max concurrent: %s" % (
+    singleCost, batchCost, singleResultDict == batchResultDict, sorted(RangeRequestHandler.hostMaxConcurrentDict.values())))
+  # single: 11.26 seconds, batch: 1.56 seconds, same result: True, host max concurrent: [8, 8]
+
+  # skewed input: many urls of one host come first, urls of other host start once buffer (threadNum * BATCH_BUFFER_FACTOR urls) not full
+  skewedUrlList = ["http://localhost:%d/skewed%d.jpg" % (serverPort, urlIdx) for urlIdx in range(300)]
+  skewedUrlList += ["http://127.0.0.1:%d/skewed%d.jpg" % (serverPort, urlIdx) for urlIdx in range(100)]
+  clearRespMetaCache()
+  startTime = time.time()
+  otherHostFirstSeconds = None
+  for eachUrl, isValid, errMsg in validateUrlBatch(skewedUrlList, UrlValidateType.IMAGE, threadNum=32, perHostNum=8):
+    if ("127.0.0.1" in eachUrl) and (otherHostFirstSeconds is None):
+      otherHostFirstSeconds = time.time() - startTime
+  print("skewed batch: total %.2f seconds, first url of other host done at %.2f seconds" % (time.time() - startTime, otherHostFirstSeconds))
+  # skewed batch: total 3.03 seconds, first url of other host done at 1.30 seconds
+  # (buffer is limited, so not read far ahead to find other host: without limit first done at 0.08 seconds, but may read whole input into memory)
+
+  # single host: urlIter is consumed lazily, not read all urls into memory
+  readNumList = [0]
+  def singleHostUrlGenerator():
+    for urlIdx in range(1000):
+      readNumList[0] += 1
+      yield "http://localhost:%d/single%d.jpg" % (serverPort, urlIdx)
+  RangeRequestHandler.responseDelaySeconds = 0.01
+  clearRespMetaCache()
+  maxPendingNum = 0
+  doneNum = 0
+  for eachUrl, isValid, errMsg in validateUrlBatch(singleHostUrlGenerator(), UrlValidateType.IMAGE, threadNum=32, perHostNum=8):
+    doneNum += 1
+    maxPendingNum = max(maxPendingNum, readNumList[0] - doneNum)
+  print("single host batch: done %d urls, max read but not done urls: %d" % (doneNum, maxPendingNum))
+  # single host batch: done 1000 urls, max read but not done urls: 135
+  # (before: whole input read at once: max read but not done urls: 999)
+
+  RangeRequestHandler.responseDelaySeconds = 0
+  httpServer.shutdown()
+
+def demoProgressReporter():
+  fileBytes = os.urandom(8 * 1024 * 1024)
+  httpServer, fileUrl = startRangeServer(fileBytes)
+  RangeRequestHandler.maxBytesPerSecond = 8 * 1024 * 1024
+  os.makedirs(DemoOutputFolder, exist_ok=True)
+
+  # one reporter shared by concurrent downloads, speed is aggregated
+  reportedStatsList = []
+  progressReporter = ProgressReporter(intervalSeconds=0.2, callback=reportedStatsList.append)
+  fileToSaveList = [os.path.join(DemoOutputFolder, "progressReporter%d.apk" % fileIdx) for fileIdx in range(3)]
+  downloadThreadList = []
+  for eachFileToSave in fileToSaveList:
+    if os.path.isfile(eachFileToSave):
+      os.remove(eachFileToSave)
+    downloadThread = threading.Thread(target=streamingDownloadFile, args=(fileUrl, eachFileToSave), kwargs={"totalSize": len(fileBytes), "progressReporter": progressReporter})
+    downloadThread.start()
+    downloadThreadList.append(downloadThread)
+  for eachThread in downloadThreadList:
+    eachThread.join()
+  progressReporter.finish()
+  finalStats = reportedStatsList[-1]
+  print("report num=%d, totalSize=%d, downloadedSize=%d, ewmaSpeed=%.1fMB/s, percent=%s" % (
+    len(reportedStatsList), finalStats.totalSize, finalStats.downloadedSize, finalStats.ewmaSpeed / (1024 * 1024), finalStats.percent))
+  # report num=6, totalSize=25165824, downloadedSize=25165824, ewmaSpeed=22.5MB/s, percent=100.0
+  RangeRequestHandler.maxBytesPerSecond = 0
+
+  # default print reporter only format and print every 0.5 seconds, null reporter do nothing
+  for eachReporter in [None, NullProgressReporter()]:
+    startTime = time.time()
+    streamingDownloadFile(fileUrl, fileToSaveList[0], totalSize=len(fileBytes), chunkSize=1024, progressReporter=eachReporter)
+    print("%s: %.2f seconds" % (type(eachReporter).__name__, time.time() - startTime))
+  # NoneType: 0.13 seconds
+  # NullProgressReporter: 0.11 seconds
+
+  for eachFileToSave in fileToSaveList:
+    os.remove(eachFileToSave)
+  httpServer.shutdown()
+
+if __name__ == "__main__":
+  demoProgressReporter()
+  demoValidateUrlBatch()
+  demoRespMetaReuse()
+  demoDownloadStatusCheck()
+  demoSegmentedDownload()
+  demoBenchmarkSegmentedDownload()
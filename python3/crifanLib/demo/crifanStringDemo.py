@@ -0,0 +1,76 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import re
+import timeit
+
+from crifanLib.crifanString import LanguageType, detectLanguageType, detectLanguageTypeBatch
+
+DemoTitleList = [
+  "测试Python代码的编程逻辑和基本语法",
+  "test python basic programming logic and grammar",
+  "test python basic 代码逻辑和基本语法",
+  "Pythonコードプログラミングのロジックと基本スキルをテストする",
+]
+
+# old implementation: re.sub to remove space, then one re.findall per language
+def oldDetectLanguageType(inputString, possibilityRatioThreshold = 0.7):
+  lanType = LanguageType.UNKNOWN
+  lanPossibilityRatio = 0.0
+  inputStrNoSpace = re.sub(r"\s", "", inputString)
+  totalCharNumLen = len(inputStrNoSpace)
+  if totalCharNumLen <= 0:
+    return lanType, lanPossibilityRatio
+
+  languagePatternList = [
+    (LanguageType.ZHCN, "[\\u4e00-\\u9fa5]"),
+    (LanguageType.EN, "[a-zA-Z]"),
+    (LanguageType.JP, "[\\u3040-\\u309F\\u30A0-\\u30FF]"),
+  ]
+  for curLanType, curLanPattern in languagePatternList:
+    curCharNumLen = len(re.findall(curLanPattern, inputStrNoSpace))
+    curLanCharRatio = float(curCharNumLen)/float(totalCharNumLen)
+    if curLanCharRatio >= possibilityRatioThreshold:
+      lanType = curLanType
+      lanPossibilityRatio = curLanCharRatio
+      break
+
+  return lanType, lanPossibilityRatio
+
+def demoDetectLanguageType():
+  for eachTitle in DemoTitleList:
+    lanType, lanRatio = detectLanguageType(eachTitle)
+    print("%s -> %s, %s" % (eachTitle, lanType.value, lanRatio))
+  # 测试Python代码的编程逻辑和基本语法 -> 中文, 0.7
+  # test python basic programming logic and grammar -> 英文, 1.0
+  # test python basic 代码逻辑和基本语法 -> 未知语言, 0.0
+  # Pythonコードプログラミングのロジックと基本スキルをテストする -> 日文, 0.7575757575757576
+
+def demoBenchmarkDetectLanguageType():
+  titleList = DemoTitleList * 50000 # 200k titles
+  print("titleList len=%s" % len(titleList))
+
+  oldResultList = [oldDetectLanguageType(eachTitle) for eachTitle in titleList]
+  newResultList = list(detectLanguageTypeBatch(titleList))
+  print("old result same as new result: %s" % (oldResultList == newResultList))
+
+  benchmarkList = [
+    ("old detectLanguageType", lambda: [oldDetectLanguageType(eachTitle) for eachTitle in titleList]),
+    ("new detectLanguageTypeBatch", lambda: list(detectLanguageTypeBatch(titleList))),
+    ("new detectLanguageTypeBatch 4 process", lambda: list(detectLanguageTypeBatch(titleList, processNum=4, chunkSize=5000))),
+  ]
+  for eachName, eachFunc in benchmarkList:
+    costSeconds = min(timeit.repeat(eachFunc, number=1, repeat=3))
+    print("%-40s %.4f seconds" % (eachName, costSeconds))
+
+if __name__ == "__main__":
+  demoDetectLanguageType()
+  demoBenchmarkDetectLanguageType()
@@ -0,0 +1,323 @@
+import sys
+import os
+curFolder = os.path.abspath(__file__)
+parentFolder = os.path.dirname(curFolder)
+parentParentFolder = os.path.dirname(parentFolder)
+parentParentParentFolder = os.path.dirname(parentParentFolder)
+sys.path.append(curFolder)
+sys.path.append(parentFolder)
+sys.path.append(parentParentFolder)
+sys.path.append(parentParentParentFolder)
+
+import json
+import math
+import hashlib
+import time
+import threading
+import concurrent.futures
+import http.server
+from urllib.parse import urlparse, parse_qs
+
+from crifanLib.thirdParty.crifanWordpress import crifanWordpress
+from crifanLib.thirdParty.crifanRequests import isValidImageUrl
+
+DemoOutputFolder = os.path.join(os.path.dirname(curFolder), "output")
+
+class FakeWordpressHandler(http.server.BaseHTTPRequestHandler):
+  """Local stand-in of wordpress REST api: list(search, page, per_page)/create for categories, tags and media, and uploaded files"""
+  # api name -> item list, eg: "tags" -> [{"id": 1, "name": "xxx", ...}]
+  itemListDict = {}
+  # uploaded file url path -> file bytes, eg: "/files/pic/uploads/2021/03/xxx.png" -> b'\x89PNG...'
+  fileBytesDict = {}
+  requestCountDict = {}
+  # if > 0, delay before response, to simulate network latency
+  responseDelaySeconds = 0
+  dataLock = threading.Lock()
+
+  def getApiName(self):
+    urlPath = urlparse(self.path).path # '/wp-json/wp/v2/tags'
+    return urlPath.split("/")[-1] # 'tags'
+
+  def sendJson(self, respJson, statusCode=200, extraHeaderDict={}):
+    respBytes = json.dumps(respJson).encode("utf-8")
+    self.send_response(statusCode)
+    self.send_header("Content-Type", "application/json; charset=UTF-8")
+    self.send_header("Content-Length", str(len(respBytes)))
+    for eachKey, eachValue in extraHeaderDict.items():
+      self.send_header(eachKey, eachValue)
+    self.end_headers()
+    self.wfile.write(respBytes)
+
+  def sendFile(self, isSendBody):
+    urlPath = urlparse(self.path).path
+    fileBytes = self.fileBytesDict.get(urlPath)
+    if fileBytes is None:
+      self.send_error(404)
+      return
+    self.send_response(200)
+    self.send_header("Content-Type", "image/png")
+    self.send_header("Content-Length", str(len(fileBytes)))
+    self.end_headers()
+    if isSendBody:
+      self.wfile.write(fileBytes)
+
+  def do_HEAD(self):
+    with self.dataLock:
+      self.requestCountDict["HEAD"] = self.requestCountDict.get("HEAD", 0) + 1
+    if self.responseDelaySeconds:
+      time.sleep(self.responseDelaySeconds)
+    self.sendFile(isSendBody=False)
+
+  def do_GET(self):
+    apiName = self.getApiName()
+    with self.dataLock:
+      self.requestCountDict["GET"] = self.requestCountDict.get("GET", 0) + 1
+    if self.responseDelaySeconds:
+      time.sleep(self.responseDelaySeconds)
+    if not self.path.startswith("/wp-json/"):
+      self.sendFile(isSendBody=True)
+      return
+    queryDict = parse_qs(urlparse(self.path).query)
+    searchStr = queryDict.get("search", [""])[0].lower()
+    curPage = int(queryDict.get("page", ["1"])[0])
+    perPage = int(queryDict.get("per_page", ["10"])[0])
+    with self.dataLock:
+      matchedItemList = self.itemListDict.get(apiName, [])
+      if searchStr:
+        matchedItemList = [eachItem for eachItem in matchedItemList if searchStr in eachItem["name"].lower()]
+    totalPageNum = max(1, int(math.ceil(len(matchedItemList) / perPage)))
+    pageItemList = matchedItemList[(curPage - 1) * perPage:curPage * perPage]
+    # ETag of current page, like cache/proxy: 304 without X-WP-Total
+    pageEtag = '"%s"' % hashlib.md5(json.dumps(pageItemList).encode("utf-8")).hexdigest()
+    if self.headers.get("If-None-Match") == pageEtag:
+      self.send_response(304)
+      self.send_header("ETag", pageEtag)
+      self.end_headers()
+      return
+    self.sendJson(pageItemList, extraHeaderDict={"X-WP-Total": str(len(matchedItemList)), "X-WP-TotalPages": str(totalPageNum), "ETag": pageEtag})
+
+  def do_POST(self):
+    apiName = self.getApiName()
+    postBytes = self.rfile.read(int(self.headers["Content-Length"]))
+    with self.dataLock:
+      self.requestCountDict["POST"] = self.requestCountDict.get("POST", 0) + 1
+    if self.responseDelaySeconds:
+      time.sleep(self.responseDelaySeconds)
+    if apiName == "media":
+      # 'attachment; filename=f6956c30ef0b475fa2b99c2f49622e35.png'
+      uploadFilename = self.headers["Content-Disposition"].split("filename=")[-1]
+      with self.dataLock:
+        newItem = addFakeMedia("http://%s" % self.headers["Host"], uploadFilename, postBytes)
+      self.sendJson(newItem, statusCode=201)
+      return
+
+    postDict = json.loads(postBytes)
+    with self.dataLock:
+      itemList = self.itemListDict.setdefault(apiName, [])
+      newSlug = postDict["name"].lower().replace(" ", "-")
+      existedItemList = [eachItem for eachItem in itemList if eachItem["slug"] == newSlug]
+      if existedItemList:
+        self.sendJson({"code": "term_exists", "message": "A term with the name provided already exists with this parent.", "data": {"status": 400, "term_id": existedItemList[0]["id"]}}, statusCode=400)
+        return
+      newId = len(itemList) + 1
+      newItem = {
+        "id": newId,
+        "name": postDict["name"],
+        "slug": newSlug,
+        "link": "http://%s/tag/%s/" % (self.headers["Host"], newId),
+        "description": "",
+        "taxonomy": "category" if apiName == "categories" else "post_tag",
+      }
+      if apiName == "categories":
+        newItem["parent"] = 0
+      itemList.append(newItem)
+    self.sendJson(newItem, statusCode=201)
+
+  def log_message(self, format, *args):
+    pass
+
+def addFakeMedia(wordpressHost, uploadFilename, fileBytes, yearMonthStr=None):
+  """add media like wordpress: same file name is renamed to xxx-1.png, title is file name without suffix"""
+  if not yearMonthStr:
+    yearMonthStr = time.strftime("%Y/%m")
+  mediaList = FakeWordpressHandler.itemListDict.setdefault("media", [])
+  filenameStem, fileSuffix = os.path.splitext(uploadFilename)
+  savedFilename = uploadFilename
+  renameIdx = 0
+  while ("/files/pic/uploads/%s/%s" % (yearMonthStr, savedFilename)) in FakeWordpressHandler.fileBytesDict:
+    renameIdx += 1
+    savedFilename = "%s-%d%s" % (filenameStem, renameIdx, fileSuffix)
+  filePath = "/files/pic/uploads/%s/%s" % (yearMonthStr, savedFilename)
+  FakeWordpressHandler.fileBytesDict[filePath] = fileBytes
+  newId = len(mediaList) + 1
+  newItem = {
+    "id": newId,
+    "slug": os.path.splitext(savedFilename)[0],
+    "link": "%s/%s/" % (wordpressHost, newId),
+    "type": "attachment",
+    "guid": {"rendered": wordpressHost + filePath},
+    "title": {"rendered": filenameStem},
+    "source_url": wordpressHost + filePath,
+  }
+  mediaList.append(newItem)
+  return newItem
+
+def startFakeWordpress():
+  httpServer = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeWordpressHandler)
+  serverThread = threading.Thread(target=httpServer.serve_forever, daemon=True)
+  serverThread.start()
+  wordpressHost = "http://127.0.0.1:%d" % httpServer.server_address[1]
+  return httpServer, wordpressHost
+
+def demoTaxonomyIndex():
+  FakeWordpressHandler.itemListDict["tags"] = [
+    {"id": tagIdx + 1, "name": "tag%d" % tagIdx, "slug": "tag%d" % tagIdx, "link": "", "description": "", "taxonomy": "post_tag"}
+    for tagIdx in range(20000)
+  ]
+  FakeWordpressHandler.responseDelaySeconds = 0.05
+  httpServer, wordpressHost = startFakeWordpress()
+  # 10 posts, each with 6 tags
+  postTagNameList = [["tag1%d" % postIdx, "Tag12%d" % postIdx, "tag123%d" % postIdx, "tag1234", "tag%d" % (postIdx * 1500), "newTag%d" % postIdx] for postIdx in range(10)]
+
+  # old: search each name, get each search result page by page
+  FakeWordpressHandler.requestCountDict.clear()
+  oldWordpress = crifanWordpress(wordpressHost, "fakeJwtToken")
+  startTime = time.time()
+  oldTagIdList = []
+  for eachTagNameList in postTagNameList:
+    for eachTagName in eachTagNameList:
+      isSearchOk, foundTag = oldWordpress.searchTaxonomy(eachTagName, "post_tag", isUseIndex=False)
+      oldTagIdList.append(foundTag["id"] if foundTag else None)
+  print("old: requestCountDict=%s, cost %.2f seconds" % (FakeWordpressHandler.requestCountDict, time.time() - startTime))
+  # old: requestCountDict={'GET': 180}, cost 10.59 seconds
+
+  # new: load all tags once, rest pages in parallel, then find locally, and also update after create
+  FakeWordpressHandler.requestCountDict.clear()
+  os.makedirs(DemoOutputFolder, exist_ok=True)
+  taxonomyIndexFile = os.path.join(DemoOutputFolder, "wordpressTaxonomyIndex.json")
+  if os.path.isfile(taxonomyIndexFile):
+    os.remove(taxonomyIndexFile)
+  newWordpress = crifanWordpress(wordpressHost, "fakeJwtToken", taxonomyIndexFile=taxonomyIndexFile)
+  startTime = time.time()
+  newTagIdList = []
+  for eachTagNameList in postTagNameList:
+    newTagIdList.extend(newWordpress.getTaxonomyIdList(eachTagNameList, "post_tag"))
+  print("new: requestCountDict=%s, cost %.2f seconds" % (FakeWordpressHandler.requestCountDict, time.time() - startTime))
+  # new: requestCountDict={'GET': 210, 'POST': 10}, cost 5.76 seconds (only first time, later posts and processes reuse index)
+  # (10 GET: not found in index newTag is searched online before create, maybe created by others after index loaded)
+  isSameExisted = all(((oldTagId is None) or (oldTagId == newTagId)) for oldTagId, newTagId in zip(oldTagIdList, newTagIdList))
+  print("same id for existed tags: %s" % isSameExisted)
+  # same id for existed tags: True
+
+  # another process: load index from file, no request
+  FakeWordpressHandler.requestCountDict.clear()
+  fileWordpress = crifanWordpress(wordpressHost, "fakeJwtToken", taxonomyIndexFile=taxonomyIndexFile)
+  fileTagIdList = fileWordpress.getTaxonomyIdList(postTagNameList[0], "post_tag")
+  print("from index file: same id=%s, requestCountDict=%s" % (fileTagIdList == newTagIdList[:len(fileTagIdList)], FakeWordpressHandler.requestCountDict))
+  # from index file: same id=True, requestCountDict={}
+
+  # tag created by others after index loaded: not in index, but found online, not create again
+  # tag with same slug but different name: create failed with term_exists, use its term_id
+  FakeWordpressHandler.requestCountDict.clear()
+  with FakeWordpressHandler.dataLock:
+    tagList = FakeWordpressHandler.itemListDict["tags"]
+    tagList.append({"id": len(tagList) + 1, "name": "otherNewTag", "slug": "othernewtag", "link": "", "description": "", "taxonomy": "post_tag"})
+    tagList.append({"id": len(tagList) + 1, "name": "Same-Slug", "slug": "same-slug", "link": "", "description": "", "taxonomy": "post_tag"})
+  otherTagIdList = fileWordpress.getTaxonomyIdList(["otherNewTag", "same slug"], "post_tag")
+  print("created by others: tag id=%s, real id=%s, requestCountDict=%s" % (otherTagIdList, [tagList[-2]["id"], tagList[-1]["id"]], FakeWordpressHandler.requestCountDict))
+  # created by others: tag id=[20011, 20012], real id=[20011, 20012], requestCountDict={'GET': 3, 'POST': 1}
+
+  # index expired: first page not changed (304), but total changed by tag added in last page, so get all again
+  FakeWordpressHandler.requestCountDict.clear()
+  with FakeWordpressHandler.dataLock:
+    tagList.append({"id": len(tagList) + 1, "name": "zzzLastPageTag", "slug": "zzzlastpagetag", "link": "", "description": "", "taxonomy": "post_tag"})
+  isIndexOk, tagIndex = fileWordpress.getTaxonomyIndex("post_tag")
+  tagIndex["updateTime"] = 0
+  isIndexOk, tagIndex = fileWordpress.getTaxonomyIndex("post_tag")
+  isSearchOk, lastPageTag = fileWordpress.searchTaxonomy("zzzLastPageTag", "post_tag")
+  print("refresh expired index: total=%s, found last page tag id=%s, requestCountDict=%s" % (tagIndex["total"], lastPageTag["id"], FakeWordpressHandler.requestCountDict))
+  # refresh expired index: total=20013, found last page tag id=20013, requestCountDict={'GET': 203}
+  # not changed: only 1 GET (304)
+  FakeWordpressHandler.requestCountDict.clear()
+  tagIndex["updateTime"] = 0
+  isIndexOk, tagIndex = fileWordpress.getTaxonomyIndex("post_tag")
+  print("refresh not changed index: requestCountDict=%s" % FakeWordpressHandler.requestCountDict)
+  # refresh not changed index: requestCountDict={'GET': 2}
+
+  FakeWordpressHandler.responseDelaySeconds = 0
+  os.remove(taxonomyIndexFile)
+  httpServer.shutdown()
+
+def demoMediaIndex():
+  FakeWordpressHandler.responseDelaySeconds = 0.02
+  httpServer, wordpressHost = startFakeWordpress()
+  fakePngBytes = b"\x89PNG\r\n\x1a\n" + b"\x00" * 1024
+  # 3000 uploaded images, every 10th is uploaded twice, so is renamed to xxx-1.png by wordpress
+  FakeWordpressHandler.itemListDict["media"] = []
+  FakeWordpressHandler.fileBytesDict.clear()
+  for mediaIdx in range(3000):
+    addFakeMedia(wordpressHost, "guid%d.png" % mediaIdx, fakePngBytes)
+    if mediaIdx % 10 == 0:
+      addFakeMedia(wordpressHost, "other%d.png" % mediaIdx, fakePngBytes)
+      addFakeMedia(wordpressHost, "other%d.png" % mediaIdx, fakePngBytes)
+  # one note: 50 images, 40 uploaded before (include renamed 'other%d-1'), 10 new
+  checkNameList = ["guid%d" % (imgIdx * 70) for imgIdx in range(36)] + ["other%d-1" % (imgIdx * 10) for imgIdx in range(4)] + ["newImg%d" % imgIdx for imgIdx in range(10)]
+
+  # old: check each guessed image url
+  FakeWordpressHandler.requestCountDict.clear()
+  oldWordpress = crifanWordpress(wordpressHost, "fakeJwtToken")
+  startTime = time.time()
+  oldFoundNum = 0
+  for eachName in checkNameList:
+    if isValidImageUrl(oldWordpress.generateUploadedImageUrl(eachName + ".png")):
+      oldFoundNum += 1
+  print("old: found %d/%d existed, requestCountDict=%s, cost %.2f seconds" % (oldFoundNum, len(checkNameList), FakeWordpressHandler.requestCountDict, time.time() - startTime))
+  # old: found 40/50 existed, requestCountDict={'HEAD': 50, 'GET': 10}, cost 1.50 seconds
+
+  # new: load all media once (rest pages in parallel), then find locally
+  FakeWordpressHandler.requestCountDict.clear()
+  os.makedirs(DemoOutputFolder, exist_ok=True)
+  mediaIndexFile = os.path.join(DemoOutputFolder, "wordpressMediaIndex.json")
+  if os.path.isfile(mediaIndexFile):
+    os.remove(mediaIndexFile)
+  newWordpress = crifanWordpress(wordpressHost, "fakeJwtToken", mediaIndexFile=mediaIndexFile)
+  startTime = time.time()
+  newFoundNum = 0
+  for eachName in checkNameList:
+    isIndexOk, foundMedia = newWordpress.findMedia(name=eachName)
+    if foundMedia:
+      newFoundNum += 1
+  print("new: found %d/%d existed, requestCountDict=%s, cost %.2f seconds" % (newFoundNum, len(checkNameList), FakeWordpressHandler.requestCountDict, time.time() - startTime))
+  # new: found 40/50 existed, requestCountDict={'GET': 36}, cost 0.29 seconds (only first time, later notes and processes reuse index)
+
+  # upload new image with content hash, later find by hash without request, even for other file name
+  FakeWordpressHandler.requestCountDict.clear()
+  isUploadOk, respInfo = newWordpress.createMedia("image/png", "newImg0.png", fakePngBytes, contentHash="fakeMd5OfNewImg0")
+  isIndexOk, foundMedia = newWordpress.findMedia(name="anotherGuid", contentHash="fakeMd5OfNewImg0")
+  print("find new uploaded by hash: %s, requestCountDict=%s" % (foundMedia["url"] == respInfo["url"], FakeWordpressHandler.requestCountDict))
+  # find new uploaded by hash: True, requestCountDict={'POST': 1}
+
+  # concurrent upload: new media only added into index in memory, then save index file once
+  uploadNum = 200
+  startTime = time.time()
+  with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+    list(executor.map(lambda imgIdx: newWordpress.createMedia("image/png", "concurrentImg%d.png" % imgIdx, fakePngBytes), range(uploadNum)))
+  newWordpress.flushMediaIndexFile()
+  print("concurrent upload %d media and save index once: cost %.2f seconds" % (uploadNum, time.time() - startTime))
+  # concurrent upload 200 media and save index once: cost 1.19 seconds
+  # (before: save whole index file for each media under index lock: cost 9.23 seconds)
+
+  # another process: load index (with content hash) from file, no request
+  FakeWordpressHandler.requestCountDict.clear()
+  fileWordpress = crifanWordpress(wordpressHost, "fakeJwtToken", mediaIndexFile=mediaIndexFile)
+  isIndexOk, foundMedia = fileWordpress.findMedia(contentHash="fakeMd5OfNewImg0")
+  print("from index file: found by hash=%s, requestCountDict=%s" % (foundMedia["url"] == respInfo["url"], FakeWordpressHandler.requestCountDict))
+  # from index file: found by hash=True, requestCountDict={}
+
+  FakeWordpressHandler.responseDelaySeconds = 0
+  os.remove(mediaIndexFile)
+  httpServer.shutdown()
+
+if __name__ == "__main__":
+  demoTaxonomyIndex()
+  demoMediaIndex()
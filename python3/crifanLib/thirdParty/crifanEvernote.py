@@ -4,8 +4,13 @@
 # Latest: https://github.com/crifan/crifanLibPython/blob/master/python3/crifanLib/thirdParty/crifanEvernote.py
 
 import sys
+import os
 import re
+import time
 import logging
+import threading
+import concurrent.futures
+from collections import deque
 # from bs4 import BeautifulSoup
 from PIL import Image, ImageFilter
 
@@ -30,7 +35,7 @@ import evernote.edam.type.ttypes as Types
 from evernote.edam.error.ttypes import EDAMUserException, EDAMNotFoundException
 
 # from evernote.edam.notestore.ttypes import *
-from evernote.edam.notestore.ttypes import NotesMetadataResultSpec
+from evernote.edam.notestore.ttypes import NotesMetadataResultSpec, SyncChunkFilter
 
 # from evernote.api.client import *
 from evernote.api.client import EvernoteClient
@@ -136,12 +141,26 @@ class crifanEvernote(object):
     BaiduOcrApiKey = "changeToYours"
     BaiduOcrSecretKey = "changeToYours"
 
+    # server return max 250 notes for each findNotesMetadata call, no matter how large maxNotes is
+    SearchPageSize = 250
+    # max entries for each getFilteredSyncChunk call
+    SyncChunkMaxEntries = 100
+    # max total bytes of images being processed concurrently in processNoteImage, to limit memory usage
+    ProcessImageMaxInFlightBytes = 100 * 1024 * 1024
+
     ################################################################################
     # Class Method
     ################################################################################
 
-    def __init__(self, authToken, isSandbox=False, isChina=True):
-        self.searchPageSize = 5000
+    def __init__(self, authToken, isSandbox=False, isChina=True, noteStoreFactory=None, baiduOcr=None):
+        """
+        Args:
+            noteStoreFactory (function): optional, return new NoteStore (or local fake with same api) when called,
+                if set, not connect to evernote server to init client and user store
+            baiduOcr (BaiduOCR): optional, OCR (or local fake with same api) for findSensitiveInfoBoxList,
+                if not set, create BaiduOCR when first used, as it request access token from baidu server
+        """
+        self.searchPageSize = crifanEvernote.SearchPageSize
 
         self.authToken = authToken
         self.isSandbox = isSandbox
@@ -149,24 +168,35 @@ class crifanEvernote(object):
         # logging.debug("self.isSandbox=%s, self.isChina=%s", self.isSandbox, self.isChina)
         self.host = crifanEvernote.getHost(self.isSandbox, self.isChina)
 
-        self.client = self.initClient()
-        logging.info("self.client=%s", self.client)
-
-        self.userStore = self.client.get_user_store()
-        logging.info("self.userStore=%s", self.userStore)
+        # Thrift NoteStore client is not thread safe, so each thread use its own NoteStore, see getThreadNoteStore
+        self.threadLocal = threading.local()
 
-        self.isSdkLatest = self.userStore.checkVersion(
-            "Evernote EDAMTest (Python)",
-            EDAM_VERSION_MAJOR, # UserStoreConstants.EDAM_VERSION_MAJOR,
-            EDAM_VERSION_MINOR, # UserStoreConstants.EDAM_VERSION_MINOR
-        )
-        if self.isSdkLatest:
-            logging.info("Evernote API version is latest")
+        if noteStoreFactory:
+            self.client = None
+            self.userStore = None
+            self.noteStoreFactory = noteStoreFactory
         else:
-            logging.warning("Evernote API version is NOT latest -> need update")
+            self.client = self.initClient()
+            logging.info("self.client=%s", self.client)
+
+            self.userStore = self.client.get_user_store()
+            logging.info("self.userStore=%s", self.userStore)
+
+            self.isSdkLatest = self.userStore.checkVersion(
+                "Evernote EDAMTest (Python)",
+                EDAM_VERSION_MAJOR, # UserStoreConstants.EDAM_VERSION_MAJOR,
+                EDAM_VERSION_MINOR, # UserStoreConstants.EDAM_VERSION_MINOR
+            )
+            if self.isSdkLatest:
+                logging.info("Evernote API version is latest")
+            else:
+                logging.warning("Evernote API version is NOT latest -> need update")
+
+            self.noteStoreFactory = self.client.get_note_store
 
         # try:
-        self.noteStore = self.client.get_note_store()
+        self.noteStore = self.noteStoreFactory()
+        self.threadLocal.noteStore = self.noteStore
         logging.info("self.noteStore=%s", self.noteStore)
         # 注：当token过期会报错
         # 发生异常: EDAMUserException
@@ -174,8 +204,18 @@ class crifanEvernote(object):
         # except BaseException as curException:
         #     logging.error("init noteStore exception: %s -> possible reason is token expired -> need refresh Evernote token", curException)
 
-        self.baiduOcr = BaiduOCR(self.BaiduOcrApiKey, self.BaiduOcrSecretKey)
-        logging.info("self.baiduOcr=%s", self.baiduOcr)
+        self._baiduOcr = baiduOcr
+        self._baiduOcrLock = threading.Lock()
+
+    @property
+    def baiduOcr(self):
+        """BaiduOCR for findSensitiveInfoBoxList, create when first used"""
+        if self._baiduOcr is None:
+            with self._baiduOcrLock:
+                if self._baiduOcr is None:
+                    self._baiduOcr = BaiduOCR(self.BaiduOcrApiKey, self.BaiduOcrSecretKey)
+                    logging.info("self.baiduOcr=%s", self._baiduOcr)
+        return self._baiduOcr
 
     def initClient(self):
         client = EvernoteClient(
@@ -186,6 +226,14 @@ class crifanEvernote(object):
         )
         return client
 
+    def getThreadNoteStore(self):
+        """Get NoteStore of current thread, create it if not exist, for call NoteStore api in multiple thread"""
+        curNoteStore = getattr(self.threadLocal, "noteStore", None)
+        if curNoteStore is None:
+            curNoteStore = self.noteStoreFactory()
+            self.threadLocal.noteStore = curNoteStore
+        return curNoteStore
+
     def listNotebooks(self):
         """Get all notebook
         
@@ -196,56 +244,164 @@ class crifanEvernote(object):
         notebookList = self.noteStore.listNotebooks()
         return notebookList
 
-    def findNotes(self, notebookId):
-        """Fina all notes of a notebook
+    def genNotesMetadataResultSpec(self):
+        """Generate NotesMetadataResultSpec for findNotesMetadata, include all common fields"""
+        resultSpec = NotesMetadataResultSpec()
+        resultSpec.includeTitle = True
+        resultSpec.includeContentLength = True
+        resultSpec.includeCreated = True
+        resultSpec.includeUpdated = True
+        resultSpec.includeDeleted = True
+        resultSpec.includeUpdateSequenceNum = True
+        resultSpec.includeNotebookGuid = True
+        resultSpec.includeTagGuids = True
+        resultSpec.includeAttributes = True
+        resultSpec.includeLargestResourceMime = True
+        resultSpec.includeLargestResourceSize = True
+        return resultSpec
+
+    def iterNotes(self, notebookId, pageSize=None):
+        """Iterate all notes of a notebook, page by page, until got all notes
 
         Args:
             notebookId (str): notebook id
                 eg： '9bf6cecf-d91e-4391-a034-199c744424db'
+            pageSize (int): note number for each findNotesMetadata call, default is self.searchPageSize
         Returns:
-            Note list
+            generator of NoteMetadata
         Raises:
         """
         logging.debug("notebookId=%s", notebookId)
-        # find all notes in notebook
-        searchOffset = 0
-        # searchPageSize = 1000
-        # searchPageSize = 5000
-        searchPageSize = self.searchPageSize
+        if not pageSize:
+            pageSize = self.searchPageSize
         searchFilter = NoteStore.NoteFilter()
         searchFilter.order = NoteSortOrder.UPDATED
         searchFilter.ascending = False
         searchFilter.notebookGuid = notebookId
         logging.debug("searchFilter=%s", searchFilter)
-        resultSpec = NotesMetadataResultSpec()
-        resultSpec.includeTitle = True
-        resultSpec.includeContentLength = True
-        resultSpec.includeCreated = True
-        resultSpec.includeUpdated = True
-        resultSpec.includeDeleted = True
-        resultSpec.includeNotebookGuid = True
-        resultSpec.includeTagGuids = True
-        resultSpec.includeAttributes = True
-        resultSpec.includeLargestResourceMime = True
-        resultSpec.includeLargestResourceSize = True
+        resultSpec = self.genNotesMetadataResultSpec()
         logging.debug("resultSpec=%s", resultSpec)
 
-        # foundNoteResult = self.noteStore.findNotesMetadata(
-        #     authenticationToken=self.authToken,
-        #     filter=searchFilter,
-        #     offset=searchOffset,
-        #     maxNotes=pageSize,
-        #     resultSpec=resultSpec
-        # )
-        foundNoteResult = self.noteStore.findNotesMetadata(
-            self.authToken, searchFilter, searchOffset, searchPageSize, resultSpec
-        )
-        logging.debug("foundNoteResult=%s", foundNoteResult)
-        totalNotes = foundNoteResult.totalNotes
-        logging.info("Total %d notes for notebook of guid=%s", totalNotes, notebookId)
-        foundNoteList = foundNoteResult.notes
+        searchOffset = 0
+        totalNotes = None
+        while (totalNotes is None) or (searchOffset < totalNotes):
+            # foundNoteResult = self.noteStore.findNotesMetadata(
+            #     authenticationToken=self.authToken,
+            #     filter=searchFilter,
+            #     offset=searchOffset,
+            #     maxNotes=pageSize,
+            #     resultSpec=resultSpec
+            # )
+            foundNoteResult = self.noteStore.findNotesMetadata(
+                self.authToken, searchFilter, searchOffset, pageSize, resultSpec
+            )
+            logging.debug("foundNoteResult=%s", foundNoteResult)
+            if totalNotes is None:
+                totalNotes = foundNoteResult.totalNotes
+                logging.info("Total %d notes for notebook of guid=%s", totalNotes, notebookId)
+
+            pageNoteList = foundNoteResult.notes or []
+            if not pageNoteList:
+                # notes deleted during paging, so total is less than before
+                break
+
+            for eachNote in pageNoteList:
+                yield eachNote
+            searchOffset += len(pageNoteList)
+
+    def findNotes(self, notebookId):
+        """Fina all notes of a notebook
+
+        Args:
+            notebookId (str): notebook id
+                eg： '9bf6cecf-d91e-4391-a034-199c744424db'
+        Returns:
+            Note list
+        Raises:
+        """
+        foundNoteList = list(self.iterNotes(notebookId))
         return foundNoteList
-    
+
+    def iterChangedNotes(self, notebookId=None, syncStateFile=None, afterUsn=None, isIncludeInactive=False):
+        """Iterate notes changed (created/updated) since last sync, by update sequence number (USN)
+            if set syncStateFile, last synced USN is loaded from it, and saved into it after processed each sync chunk
+            Note: only save USN of chunk after all notes of that chunk yield and processed by caller,
+                so if caller exit during processing, next time will get the not processed notes again
+
+        Args:
+            notebookId (str): only get notes of this notebook, None means all notebooks
+            syncStateFile (str): json file to save last synced USN, eg: {"afterUsnDict": {"<notebookId>": 12345}}
+            afterUsn (int): only get notes changed after this USN, if set, not use USN from syncStateFile
+            isIncludeInactive (bool): whether include inactive (deleted, in trash) notes
+        Returns:
+            generator of Note, without content and resource data, can get detail by getNoteDetail
+        Raises:
+        """
+        syncStateDict = {}
+        if syncStateFile and os.path.isfile(syncStateFile):
+            syncStateDict = utils.loadJsonFromFile(syncStateFile)
+        afterUsnDict = syncStateDict.setdefault("afterUsnDict", {})
+        afterUsnKey = notebookId or ""
+        if afterUsn is None:
+            afterUsn = afterUsnDict.get(afterUsnKey, 0)
+
+        syncState = self.noteStore.getSyncState(self.authToken)
+        logging.info("Server updateCount=%s, last synced USN=%s", syncState.updateCount, afterUsn)
+
+        syncFilter = SyncChunkFilter()
+        syncFilter.includeNotes = True
+        syncFilter.includeExpunged = True
+        if notebookId:
+            syncFilter.notebookGuids = set([notebookId])
+
+        while afterUsn < syncState.updateCount:
+            syncChunk = self.noteStore.getFilteredSyncChunk(self.authToken, afterUsn, crifanEvernote.SyncChunkMaxEntries, syncFilter)
+            logging.debug("chunkHighUSN=%s, updateCount=%s", syncChunk.chunkHighUSN, syncChunk.updateCount)
+            if syncChunk.expungedNotes:
+                logging.info("%d notes expunged after USN %s", len(syncChunk.expungedNotes), afterUsn)
+
+            for eachNote in (syncChunk.notes or []):
+                if notebookId and (eachNote.notebookGuid != notebookId):
+                    continue
+                if (not isIncludeInactive) and (eachNote.active is False):
+                    continue
+                yield eachNote
+
+            if syncChunk.chunkHighUSN is None:
+                # no more changes after afterUsn
+                afterUsn = syncChunk.updateCount
+            else:
+                afterUsn = syncChunk.chunkHighUSN
+            if syncStateFile:
+                afterUsnDict[afterUsnKey] = afterUsn
+                utils.saveJsonToFile(syncStateFile, syncStateDict)
+
+    def iterNoteDetails(self, noteIter, threadNum=1):
+        """Iterate note detail of each note, in same order of input notes
+            if threadNum > 1, get note detail in parallel, each thread use its own NoteStore
+
+        Args:
+            noteIter (iterable): Note/NoteMetadata (has guid) iterable, eg: iterNotes/iterChangedNotes
+            threadNum (int): max number of concurrent getNoteDetail
+        Returns:
+            generator of Note with detail
+        Raises:
+        """
+        if threadNum <= 1:
+            for eachNote in noteIter:
+                yield self.getNoteDetail(eachNote.guid)
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threadNum) as executor:
+            # bounded number of fetching notes, not fetch all (large) note details into memory
+            futureQueue = deque()
+            for eachNote in noteIter:
+                futureQueue.append(executor.submit(self.getNoteDetail, eachNote.guid))
+                if len(futureQueue) >= (threadNum * 2):
+                    yield futureQueue.popleft().result()
+            while futureQueue:
+                yield futureQueue.popleft().result()
+
     def createNote(self, noteTitle, noteBody="", notebookId=None):
         """get note detail
 
@@ -299,7 +455,8 @@ class crifanEvernote(object):
         #     # withResourcesAlternateData=True,
         #     withResourcesAlternateData=False,
         # )
-        noteDetail = self.noteStore.getNote(self.authToken, noteId, True, True, False, False)
+        curNoteStore = self.getThreadNoteStore()
+        noteDetail = curNoteStore.getNote(self.authToken, noteId, True, True, False, False)
         return noteDetail
 
     def syncNote(self,
@@ -592,28 +749,18 @@ class crifanEvernote(object):
         logging.debug("curResMime=%s -> isValidImg=%s", curResMime, isValidImg)
         return isValidImg
 
-    def blurImageResource(self, imgRes, sensitiveInfoList):
-        """Blur image resource
-            Note: NOT process gif image
+    def findSensitiveInfoBoxList(self, imgBytes, sensitiveInfoList):
+        """Find sensitive info in image via OCR, return box list to blur
 
         Args:
-            imgRes (Resource): Note image resource
+            imgBytes (bytes): image bytes
+            sensitiveInfoList (list): sensitive info list
         Returns:
-            new image resouce
+            box list, each is [left, upper, right, lower]
         Raises:
         """
-        isBlurred = False
-
-        # isGif = "gif" in imgRes.mime
-        # if isGif:
-        #     logging.info("Omit process gif image: %s", imgRes.attributes.fileName)
-        #     return imgRes
-
-        imgBytes = imgRes.data.body
-
+        matchBoxList = []
         matchResultDict = self.baiduOcr.isStrInImage(sensitiveInfoList, imgBytes=imgBytes, isMatchMultiple=True, isRespShortInfo=False)
-
-        curImg = utils.bytesToImage(imgBytes)
         for eachSensitiveInfo, eachMatchResult in matchResultDict.items():
             isMatch, matchResultList = eachMatchResult
             if isMatch:
@@ -626,17 +773,31 @@ class crifanEvernote(object):
                     extraWidth = 5
                     extraHeight = 2
                     matchBox = [posX, posY, posX + posW + extraWidth, posY + posH + extraHeight]
-                    cropBoxImg = curImg.crop(matchBox) # <PIL.Image.Image image mode=RGBA size=72x16 at 0x101B9CA90>
-                    # Use GaussianBlur directly to blur the image 10 times
-                    blurImg = cropBoxImg.filter(ImageFilter.GaussianBlur(radius=10)) # <PIL.Image.Image image mode=RGBA size=72x16 at 0x103530DF0>
-                    curImg.paste(blurImg, matchBox)
+                    matchBoxList.append(matchBox)
+        return matchBoxList
 
-                    # # for debug
-                    # curImg.show()
+    @staticmethod
+    def blurImageResourceBoxes(imgRes, matchBoxList):
+        """Blur boxes of image resource, only Pillow process, so can run in other process
 
-                    isBlurred = True
+        Args:
+            imgRes (Resource): Note image resource
+            matchBoxList (list): box list to blur, each is [left, upper, right, lower]
+        Returns:
+            new image resouce
+        Raises:
+        """
+        curImg = utils.bytesToImage(imgRes.data.body)
+        for matchBox in matchBoxList:
+            cropBoxImg = curImg.crop(matchBox) # <PIL.Image.Image image mode=RGBA size=72x16 at 0x101B9CA90>
+            # Use GaussianBlur directly to blur the image 10 times
+            blurImg = cropBoxImg.filter(ImageFilter.GaussianBlur(radius=10)) # <PIL.Image.Image image mode=RGBA size=72x16 at 0x103530DF0>
+            curImg.paste(blurImg, matchBox)
+
+            # # for debug
+            # curImg.show()
 
-        if isBlurred:
+        if matchBoxList:
             logging.info("Blurred image: %s", imgRes.attributes.fileName)
 
         # # for debug
@@ -648,6 +809,34 @@ class crifanEvernote(object):
 
         return newImgRes
 
+    def blurImageResource(self, imgRes, sensitiveInfoList, blurExecutor=None):
+        """Blur image resource
+            Note: NOT process gif image
+
+        Args:
+            imgRes (Resource): Note image resource
+            sensitiveInfoList (list): sensitive info list
+            blurExecutor (Executor): if set, run Pillow blur in it (eg: ProcessPoolExecutor), else blur in current thread
+        Returns:
+            new image resouce
+        Raises:
+        """
+        # isGif = "gif" in imgRes.mime
+        # if isGif:
+        #     logging.info("Omit process gif image: %s", imgRes.attributes.fileName)
+        #     return imgRes
+
+        imgBytes = imgRes.data.body
+
+        matchBoxList = self.findSensitiveInfoBoxList(imgBytes, sensitiveInfoList)
+
+        if blurExecutor:
+            newImgRes = blurExecutor.submit(crifanEvernote.blurImageResourceBoxes, imgRes, matchBoxList).result()
+        else:
+            newImgRes = crifanEvernote.blurImageResourceBoxes(imgRes, matchBoxList)
+
+        return newImgRes
+
     @staticmethod
     def genNewImgRes(oldImgRes, newImgBytes, newMime=None):
         """Generate new image resource
@@ -725,15 +914,18 @@ class crifanEvernote(object):
         return newImgRes
 
     @staticmethod
-    def processNoteImage(noteDetail, processImageCallback, callbackParaDict=None):
+    def processNoteImage(noteDetail, processImageCallback, callbackParaDict=None, executor=None, maxInFlightBytes=None):
         """Process note each media image and update note content
 
         Args:
             noteDetail (Note): evernote note
             processCallback (func): callback function of process
             callbackParaDict (dict): callback function parameter dict. Default is None
+            executor (Executor): if set, run callback in it concurrently, eg: ThreadPoolExecutor/ProcessPoolExecutor.
+                Default is None, means process one by one in current thread
+            maxInFlightBytes (int): max total image bytes processing in executor, default is ProcessImageMaxInFlightBytes
         Returns:
-            new resouce list with updated imgage resource
+            new resouce list with updated imgage resource, same order with noteDetail.resources
         Raises:
         """
         newResList = []
@@ -742,6 +934,20 @@ class crifanEvernote(object):
             # is None
             return newResList
 
+        if not callbackParaDict:
+            callbackParaDict = {}
+        if not maxInFlightBytes:
+            maxInFlightBytes = crifanEvernote.ProcessImageMaxInFlightBytes
+
+        # (resource index, future, image bytes size), in resource order
+        pendingQueue = deque()
+        inFlightBytes = 0
+
+        def waitOldestPending():
+            curResIdx, curFuture, curResSize = pendingQueue.popleft()
+            newResList[curResIdx] = curFuture.result()
+            return curResSize
+
         originResNum = len(originResList)
         for curResIdx, eachResource in enumerate(originResList):
             curResNum = curResIdx + 1
@@ -758,11 +964,21 @@ class crifanEvernote(object):
                     logging.warning("Omit process not supported image type: %s", curImgMime)
                     newResList.append(eachResource)
                 else:
-                    if not callbackParaDict:
-                        callbackParaDict = {}
-                    callbackParaDict["imgRes"] = eachResource
-                    newImgRes = processImageCallback(**callbackParaDict)
-                    newResList.append(newImgRes)
+                    curParaDict = dict(callbackParaDict)
+                    curParaDict["imgRes"] = eachResource
+                    if executor:
+                        curResSize = len(eachResource.data.body)
+                        # wait oldest done to limit memory, but always allow at least one image in processing
+                        while pendingQueue and ((inFlightBytes + curResSize) > maxInFlightBytes):
+                            inFlightBytes -= waitOldestPending()
+                        curFuture = executor.submit(processImageCallback, **curParaDict)
+                        pendingQueue.append((curResIdx, curFuture, curResSize))
+                        inFlightBytes += curResSize
+                        # placeholder, replace with processed resource later
+                        newResList.append(None)
+                    else:
+                        newImgRes = processImageCallback(**curParaDict)
+                        newResList.append(newImgRes)
             else:
                 """
                     audio/wav
@@ -773,15 +989,20 @@ class crifanEvernote(object):
                 """
                 newResList.append(eachResource)
 
+        while pendingQueue:
+            waitOldestPending()
+
         return newResList
 
     @staticmethod
-    def resizeAndUpdateNoteImage(noteDetail, defaultMaxSize=None):
+    def resizeAndUpdateNoteImage(noteDetail, defaultMaxSize=None, processNum=1, maxInFlightBytes=None):
         """Resize evernote note image media, then update note content
 
             Args:
                 noteDetail (Note): Evernote note with details
                 defaultMaxSize (tuple): default max resize
+                processNum (int): if > 1, resize images in process pool of this size
+                maxInFlightBytes (int): max total image bytes resizing in process pool
             Returns:
                 updated note detail
             Raises:
@@ -789,17 +1010,25 @@ class crifanEvernote(object):
         paraDict = {
             "defaultMaxSize": defaultMaxSize,
         }
-        newResList = crifanEvernote.processNoteImage(noteDetail, crifanEvernote.resizeImageResource, paraDict)
+        if processNum > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=processNum) as processExecutor:
+                newResList = crifanEvernote.processNoteImage(noteDetail, crifanEvernote.resizeImageResource, paraDict,
+                    executor=processExecutor, maxInFlightBytes=maxInFlightBytes)
+        else:
+            newResList = crifanEvernote.processNoteImage(noteDetail, crifanEvernote.resizeImageResource, paraDict)
         if newResList:
             noteDetail = crifanEvernote.updateNoteImageResouces(noteDetail, newResList)
         return noteDetail
 
-    def blurAndUpdateNoteImage(self, noteDetail, sensitiveInfoList):
+    def blurAndUpdateNoteImage(self, noteDetail, sensitiveInfoList, ocrThreadNum=1, processNum=1, maxInFlightBytes=None):
         """Blur evernote note image media, then update note content
 
             Args:
                 noteDetail (Note): Evernote note with details
                 sensitiveInfoList (list): sensitive info list
+                ocrThreadNum (int): if > 1, OCR images in thread pool of this size
+                processNum (int): if > 1, blur images in process pool of this size
+                maxInFlightBytes (int): max total image bytes in processing
             Returns:
                 updated note detail
             Raises:
@@ -808,7 +1037,21 @@ class crifanEvernote(object):
             # "self": self,
             "sensitiveInfoList": sensitiveInfoList,
         }
-        newResList = crifanEvernote.processNoteImage(noteDetail, self.blurImageResource, paraDict)
+        if (ocrThreadNum > 1) or (processNum > 1):
+            processExecutor = None
+            if processNum > 1:
+                processExecutor = concurrent.futures.ProcessPoolExecutor(max_workers=processNum)
+            paraDict["blurExecutor"] = processExecutor
+            try:
+                # OCR is waiting network, so in threads, each thread submit blur to process pool after OCR
+                with concurrent.futures.ThreadPoolExecutor(max_workers=max(ocrThreadNum, 1)) as ocrExecutor:
+                    newResList = crifanEvernote.processNoteImage(noteDetail, self.blurImageResource, paraDict,
+                        executor=ocrExecutor, maxInFlightBytes=maxInFlightBytes)
+            finally:
+                if processExecutor:
+                    processExecutor.shutdown()
+        else:
+            newResList = crifanEvernote.processNoteImage(noteDetail, self.blurImageResource, paraDict)
         if newResList:
             noteDetail = crifanEvernote.updateNoteImageResouces(noteDetail, newResList)
         return noteDetail
@@ -845,6 +1088,37 @@ class crifanEvernote(object):
         # <en-media hash="aee147dbcd6816ca2b40494622fffaa3" type="image/png" width="370"></en-media>
         return curResSoup
 
+    @staticmethod
+    def genResourceSoupKey(curResource):
+        """Generate key of Evernote Resource, to find <en-media> node in dict from buildResourceSoupDict
+
+        Args:
+            curResource (Resource): Evernote Resource
+        Returns:
+            (mime, hash str) tuple
+        Raises:
+        Examples:
+            ('image/png', 'aee147dbcd6816ca2b40494622fffaa3')
+        """
+        curHashStr = utils.bytesToStr(curResource.data.bodyHash)
+        return (curResource.mime, curHashStr)
+
+    @staticmethod
+    def buildResourceSoupDict(soup):
+        """Build dict of all <en-media> nodes in single pass, for find many Resource soup without search whole soup each time
+
+        Args:
+            soup (Soup): BeautifulSoup soup of note content
+        Returns:
+            dict: (mime, hash str) -> <en-media> node list, in document order
+        Raises:
+        """
+        resSoupDict = {}
+        for eachEnMediaSoup in soup.find_all("en-media"):
+            curKey = (eachEnMediaSoup.get("type"), eachEnMediaSoup.get("hash"))
+            resSoupDict.setdefault(curKey, []).append(eachEnMediaSoup)
+        return resSoupDict
+
     @staticmethod
     def updateNoteImageResouces(noteDetail, newResList):
         """Update note resources and content, with new resource and updated <en-media> content
@@ -1092,21 +1366,26 @@ class crifanEvernote(object):
         return codeblockNodeList
 
     @staticmethod
-    def getContentForTag(curNote):
+    def getContentForTag(curNote, noteSoup=None):
         """Get note content string for generate tags
 
         Args:
             curNote (Note): evernote Note
+            noteSoup (Soup): soup of note content, if None, parse from curNote. Not changed in this function
         Returns:
             note content (str)
         Raises:
         """
-        noteSoup = crifanEvernote.noteContentToSoup(curNote)
+        if noteSoup is None:
+            noteSoup = crifanEvernote.noteContentToSoup(curNote)
 
         # # for debug
         # utils.dbgSaveSoupToHtml(noteSoup)
 
-        # remove links
+        # Note: not decompose (remove) nodes, only omit their strings, so passed in soup can continue used by others
+        omitSoupList = []
+
+        # omit links
         # <div><a href="https://npm.taobao.org/mirrors/">https://npm.taobao.org/mirrors/</a></div>
         # <div><a href="https://npm.taobao.org/mirrors/python/">https://npm.taobao.org/mirrors/python/</a></div>
         allASoupList = noteSoup.find_all("a")
@@ -1120,29 +1399,34 @@ class crifanEvernote(object):
                 aStr = aStr.strip() # 'https://github.com/pypa/pipenv/issues/3282'
 
             if aHref == aStr:
-                eachASoup.decompose()
+                omitSoupList.append(eachASoup)
 
-        # # for debug
-        # utils.dbgSaveSoupToHtml(noteSoup)
-
-        # remove code block
+        # omit code block
         codeblockSoupList = crifanEvernote.getCodeblockSoupList(noteSoup)
-        for eachCodeblockSoup in codeblockSoupList:
-            eachCodeblockSoup.decompose()
-
-        # # for debug
-        # utils.dbgSaveSoupToHtml(noteSoup)
-
-        noteContentStr = utils.getAllContents(noteSoup, isStripped=True)
+        omitSoupList.extend(codeblockSoupList)
+
+        omitSoupIdSet = set(id(eachSoup) for eachSoup in omitSoupList)
+        stringList = []
+        # same as utils.getAllContents(noteSoup, isStripped=True) after remove omitted nodes
+        for eachStr in noteSoup.strings:
+            strippedStr = eachStr.strip()
+            if not strippedStr:
+                continue
+            isOmitted = any((id(eachParent) in omitSoupIdSet) for eachParent in eachStr.parents)
+            if not isOmitted:
+                stringList.append(strippedStr)
+
+        noteContentStr = "\n".join(stringList)
         return noteContentStr
 
     @staticmethod
-    def generateTags(curNote, maxTagNum=6):
+    def generateTags(curNote, maxTagNum=6, noteSoup=None):
         """Generate tags from note (title and content)
 
         Args:
             curNote (Note): evernote Note
             maxTagNum (int): max number of tags
+            noteSoup (Soup): soup of note content, if None, parse from curNote
         Returns:
             tag list(list)
         Raises:
@@ -1161,7 +1445,7 @@ class crifanEvernote(object):
         titleTagList = utils.extractTags(titleStr)
         logging.info("titleTagList=%s", titleTagList)
 
-        noteContentStr = crifanEvernote.getContentForTag(curNote)
+        noteContentStr = crifanEvernote.getContentForTag(curNote, noteSoup=noteSoup)
         # contentTagList = utils.extractTags(noteContentStr, withWeight=True)
         contentTagList = utils.extractTags(noteContentStr)
         logging.info("contentTagList=%s", contentTagList)
@@ -1241,3 +1525,76 @@ class crifanEvernote(object):
         logging.info("validTagList=%s", validTagList)
 
         return validTagList
+
+
+class NoteDocument(object):
+    """Evernote Note content parsed (into BeautifulSoup soup) only once,
+        then processed by ordered transform stages on same soup, and serialized once at end.
+        Record each stage time, to know where time is spent.
+
+        Example:
+            noteDoc = NoteDocument(curNote)
+            noteDoc.runStage("listIndent", lambda curDoc: someProcessSoup(curDoc.soup))
+            noteDoc.updateNoteContent()
+            logging.info("stage time: %s", noteDoc.getStageTimeStr())
+    """
+
+    def __init__(self, curNote):
+        self.note = curNote
+        # stage name -> cost seconds, in stage order
+        self.stageTimeList = []
+
+        # Note: not keep top html, so can find top level node by find_all(xxx, recursive=False)
+        self.soup = self.runStage("parse", lambda curDoc: crifanEvernote.noteContentToSoup(curDoc.note, isKeepTopHtml=False))
+
+    def runStage(self, stageName, stageFunc, *args, **kwargs):
+        """Run single transform stage, and record its time
+
+        Args:
+            stageName (str): stage name
+            stageFunc (function): stage function, called as stageFunc(noteDoc, *args, **kwargs), process noteDoc.soup/noteDoc.note
+        Returns:
+            return value of stageFunc
+        Raises:
+        """
+        startTime = time.perf_counter()
+        stageResult = stageFunc(self, *args, **kwargs)
+        costSeconds = time.perf_counter() - startTime
+        self.stageTimeList.append((stageName, costSeconds))
+        logging.debug("stage %s cost %.3f seconds", stageName, costSeconds)
+        return stageResult
+
+    def runStages(self, stageList):
+        """Run transform stages in order
+
+        Args:
+            stageList (list): (stageName, stageFunc) list
+        Returns:
+        Raises:
+        """
+        for stageName, stageFunc in stageList:
+            self.runStage(stageName, stageFunc)
+
+    def toNoteContent(self):
+        """Serialize soup to Evernote Note content (ENML)"""
+        return self.runStage("toNoteContent", lambda curDoc: crifanEvernote.soupToNoteContent(curDoc.soup))
+
+    def toHtml(self):
+        """Serialize soup to html, without top <html>"""
+        return self.runStage("toHtml", lambda curDoc: utils.soupToHtml(curDoc.soup, isFormat=False))
+
+    def updateNoteContent(self):
+        """Update note content from soup
+
+        Returns:
+            updated Note
+        """
+        self.note.content = self.toNoteContent()
+        return self.note
+
+    def getStageTimeStr(self):
+        """Get stage time string, eg: 'parse=0.052s, uploadImage=3.120s, listIndent=0.004s, total=3.176s'"""
+        stageTimeStrList = ["%s=%.3fs" % (stageName, costSeconds) for stageName, costSeconds in self.stageTimeList]
+        totalSeconds = sum(costSeconds for _, costSeconds in self.stageTimeList)
+        stageTimeStrList.append("total=%.3fs" % totalSeconds)
+        return ", ".join(stageTimeStrList)
@@ -7,12 +7,13 @@ import sys
 import logging
 import re
 import copy
+import concurrent.futures
 from operator import itemgetter
 from bs4 import Tag, NavigableString
 
 sys.path.append("lib")
 from libs.crifan import utils
-from libs.crifan.crifanEvernote import crifanEvernote
+from libs.crifan.crifanEvernote import crifanEvernote, NoteDocument
 from libs.crifan.crifanWordpress import crifanWordpress
 
 class crifanEvernoteToWordpress(object):
@@ -20,6 +21,9 @@ class crifanEvernoteToWordpress(object):
         Upload Evernote(Yinxiang) note to WordPress and synchronize back to note via python
     """
 
+    # max concurrent image upload number in batchUploadAndSyncImage
+    UploadImageThreadNum = 8
+
     def __init__(self, curEvernote, curWordpress):
         self.evernote = curEvernote
         self.wordpress = curWordpress
@@ -43,13 +47,16 @@ class crifanEvernoteToWordpress(object):
         imgGuid = imgResource.guid
         logging.debug("imgGuid=%s, imgDataSize=%s", imgGuid, imgDataSize)
 
-        curImg = utils.bytesToImage(imgBytes)
-        logging.debug("curImg=%s", curImg)
+        # detect format from magic bytes, avoid Pillow open image
+        imgFormat = utils.detectImageFormat(imgBytes) # 'PNG'
+        if not imgFormat:
+            curImg = utils.bytesToImage(imgBytes)
+            logging.debug("curImg=%s", curImg)
 
-        # # for debug
-        # curImg.show()
+            # # for debug
+            # curImg.show()
 
-        imgFormat = curImg.format # 'PNG'
+            imgFormat = curImg.format # 'PNG'
         imgSuffix = utils.ImageFormatToSuffix[imgFormat] # 'png'
         imgMime = utils.ImageSuffixToMime[imgSuffix] # 'image/png'
         # curDatetimeStr = utils.getCurDatetimeStr() # '20200307_173141'
@@ -57,20 +64,33 @@ class crifanEvernoteToWordpress(object):
         # imgeFilename = "%s.%s" % (curDatetimeStr, imgSuffix) # '20200307_173141.png'
         imgeFilename = "%s.%s" % (processedGuid, imgSuffix) # 'f6956c30ef0b475fa2b99c2f49622e35.png'
 
+        # md5 of image bytes, eg: 'aee147dbcd6816ca2b40494622fffaa3'
+        imgHashStr = utils.bytesToStr(imgData.bodyHash)
+
         isNeedUpload = True
         if isCheckExisted:
-            generatedImgeUrl = self.wordpress.generateUploadedImageUrl(imgeFilename)
-            # https://www.crifan.org/files/pic/uploads/2021/03/f60ea32cf4664b41922431f4ea015621.jpg
-            # 'url':'https://www.crifan.org/files/pic/uploads/2021/03/f60ea32cf4664b41922431f4ea015621-1.jpg'
-            isValid = utils.isValidImageUrl(generatedImgeUrl, proxies=self.wordpress.requestsProxies)
-            if isValid:
-                logging.info("Found existed image %s", generatedImgeUrl)
-                isUploadImgOk = True
-                respInfo["url"] = generatedImgeUrl
-                isNeedUpload = False
+            # find from local media index, no request for each image, and also support renamed file, eg: xxx-1.jpg
+            isIndexOk, foundMedia = self.wordpress.findMedia(name=processedGuid, contentHash=imgHashStr)
+            if isIndexOk:
+                if foundMedia:
+                    logging.info("Found existed image %s", foundMedia["url"])
+                    isUploadImgOk = True
+                    respInfo = foundMedia
+                    isNeedUpload = False
+            else:
+                logging.warning("Fail to get wordpress media index, check existed image by url: %s", foundMedia)
+                generatedImgeUrl = self.wordpress.generateUploadedImageUrl(imgeFilename)
+                # https://www.crifan.org/files/pic/uploads/2021/03/f60ea32cf4664b41922431f4ea015621.jpg
+                # 'url':'https://www.crifan.org/files/pic/uploads/2021/03/f60ea32cf4664b41922431f4ea015621-1.jpg'
+                isValid = utils.isValidImageUrl(generatedImgeUrl, proxies=self.wordpress.requestsProxies)
+                if isValid:
+                    logging.info("Found existed image %s", generatedImgeUrl)
+                    isUploadImgOk = True
+                    respInfo["url"] = generatedImgeUrl
+                    isNeedUpload = False
 
         if isNeedUpload:
-            isUploadImgOk, respInfo = self.wordpress.createMedia(imgMime, imgeFilename, imgBytes)
+            isUploadImgOk, respInfo = self.wordpress.createMedia(imgMime, imgeFilename, imgBytes, contentHash=imgHashStr)
             logging.debug("%s to upload resource %s to wordpress", isUploadImgOk, imgGuid)
 
         return isUploadImgOk, respInfo
@@ -183,61 +203,151 @@ class crifanEvernoteToWordpress(object):
 
         return uploadedImgUrl
 
-    def batchUploadAndSyncImage(self, curNoteDetail, isCheckExisted):
+    def batchUploadAndSyncImage(self, curNoteDetail, isCheckExisted, uploadThreadNum=None):
         """Batch upload image to wordpress and sync to note (replace en-media to img) 
 
         Args:
             curNoteDetail (Note): evernote Note
             isCheckExisted (bool): whether check image is uploaded or not
+            uploadThreadNum (int): max concurrent upload number, default is UploadImageThreadNum
         Returns:
             resp Note
         Raises:
         """
-        originResList = copy.deepcopy(curNoteDetail.resources)
+        soup = crifanEvernote.noteContentToSoup(curNoteDetail)
+        newResList = self.uploadNoteImages(curNoteDetail, soup, isCheckExisted, uploadThreadNum)
+        updatedContent = crifanEvernote.soupToNoteContent(soup)
+
+        syncParamDict = {
+            # mandatory
+            "noteGuid": curNoteDetail.guid,
+            "noteTitle": curNoteDetail.title,
+            # optional
+            "newContent": updatedContent,
+            "newResList": newResList,
+        }
+        respNote = self.evernote.syncNote(**syncParamDict)
+        return respNote
+
+    def uploadNoteImages(self, curNoteDetail, soup, isCheckExisted, uploadThreadNum=None):
+        """Upload note images to wordpress concurrently, then replace uploaded en-media to img in soup
+
+        Args:
+            curNoteDetail (Note): evernote Note
+            soup (Soup): soup of note content, changed in this function
+            isCheckExisted (bool): whether check image is uploaded or not
+            uploadThreadNum (int): max concurrent upload number, default is UploadImageThreadNum
+        Returns:
+            new resource list (list), without uploaded image resources
+        Raises:
+        """
+        if not uploadThreadNum:
+            uploadThreadNum = crifanEvernoteToWordpress.UploadImageThreadNum
+
+        # Note: not deepcopy resources (with image body), only not change curNoteDetail.resources list itself
+        originResList = curNoteDetail.resources or []
         totalResNum = len(originResList)
         logging.info("Total resources: %d", totalResNum)
-        latestResList = copy.deepcopy(curNoteDetail.resources)
 
-        soup = crifanEvernote.noteContentToSoup(curNoteDetail)
+        resSoupDict = crifanEvernote.buildResourceSoupDict(soup)
 
+        # (resource, <en-media> node) list to upload
+        toUploadList = []
         for curResIdx, eachResource in enumerate(originResList):
             curResNum = curResIdx + 1
-            logging.info("%s resource %d/%d %s", "-"*20, curResNum, totalResNum, "-"*20)
             curResInfoStr = crifanEvernote.genResourceInfoStr(eachResource)
             if self.evernote.isValidImageResource(eachResource):
-                curEnMediaSoup = crifanEvernote.findResourceSoup(eachResource, soup=soup)
-                if not curEnMediaSoup:
-                    logging.warning("NOT upload for not found related <en-media> node for %s", curResInfoStr)
+                curResKey = crifanEvernote.genResourceSoupKey(eachResource)
+                curEnMediaSoupList = resSoupDict.get(curResKey)
+                if not curEnMediaSoupList:
+                    logging.warning("[%d/%d] NOT upload for not found related <en-media> node for %s", curResNum, totalResNum, curResInfoStr)
                     continue
 
-                isUploadOk, respInfo = self.uploadImageToWordpress(eachResource, isCheckExisted)
-                if isUploadOk:
-                    uploadedImgUrl = respInfo["url"]
-                    logging.info("Uploaded image url %s", uploadedImgUrl)
-
-                    curImgSoup = curEnMediaSoup
-                    curImgSoup.name = "img"
-                    curImgSoup.attrs = {"src": uploadedImgUrl}
-                    latestResList.remove(eachResource)
-                else:
-                    logging.error("Failed to upload image resource=%s, respInfo=%s", curResInfoStr, respInfo)
+                curEnMediaSoup = curEnMediaSoupList.pop(0)
+                toUploadList.append((eachResource, curEnMediaSoup))
+            else:
+                logging.warning("[%d/%d] NOT upload for non-image resource: %s", curResNum, totalResNum, curResInfoStr)
+
+        toUploadNum = len(toUploadList)
+        logging.info("To upload images: %d, upload thread number: %d", toUploadNum, uploadThreadNum)
+        # all upload use the shared self.wordpress.reqSession, so reuse connection
+        with concurrent.futures.ThreadPoolExecutor(max_workers=uploadThreadNum) as executor:
+            uploadResultList = list(executor.map(
+                lambda eachResource: self.uploadImageToWordpress(eachResource, isCheckExisted),
+                [eachResource for eachResource, _ in toUploadList]
+            ))
+        # uploaded media only added into index in memory, save once for all images
+        self.wordpress.flushMediaIndexFile()
+
+        # replace all uploaded <en-media> to <img> in single pass
+        uploadedResIdSet = set()
+        for (eachResource, curEnMediaSoup), (isUploadOk, respInfo) in zip(toUploadList, uploadResultList):
+            if isUploadOk:
+                uploadedImgUrl = respInfo["url"]
+                logging.info("Uploaded image url %s", uploadedImgUrl)
+
+                curImgSoup = curEnMediaSoup
+                curImgSoup.name = "img"
+                curImgSoup.attrs = {"src": uploadedImgUrl}
+                uploadedResIdSet.add(id(eachResource))
             else:
-                logging.warning("NOT upload for non-image resource: %s", curResInfoStr)
+                curResInfoStr = crifanEvernote.genResourceInfoStr(eachResource)
+                logging.error("Failed to upload image resource=%s, respInfo=%s", curResInfoStr, respInfo)
 
-        updatedContent = crifanEvernote.soupToNoteContent(soup)
+        newResList = [eachResource for eachResource in originResList if id(eachResource) not in uploadedResIdSet]
+        return newResList
 
-        newResList = latestResList
+    def convertAndUploadNote(self, curNote, isCheckExisted=False, uploadThreadNum=None, isGenerateTags=True, **postParaDict):
+        """Convert Evernote note and upload to wordpress post, parse note content only once:
+            uploadImage -> listIndent -> generateTags (if no tags) -> syncNote (serialize to note content once)
+            -> codeblock (only for post) -> toHtml -> uploadPost
 
-        syncParamDict = {
-            # mandatory
-            "noteGuid": curNoteDetail.guid,
-            "noteTitle": curNoteDetail.title,
-            # optional
-            "newContent": updatedContent,
-            "newResList": newResList,
-        }
-        respNote = self.evernote.syncNote(**syncParamDict)
-        return respNote
+        Args:
+            curNote (Note): evernote Note with detail (content and resources)
+            isCheckExisted (bool): whether check image is uploaded or not
+            uploadThreadNum (int): max concurrent upload image number
+            isGenerateTags (bool): whether generate tags from title and content if note has no tags
+            postParaDict (dict): other parameters for uploadNoteToWordpress, eg: dateType, postStatus, postFormat
+        Returns:
+            (bool, dict), and stage time is logged
+        Raises:
+        """
+        noteDoc = NoteDocument(curNote)
+
+        def uploadImageStage(curDoc):
+            curDoc.note.resources = self.uploadNoteImages(curDoc.note, curDoc.soup, isCheckExisted, uploadThreadNum)
+
+        def generateTagsStage(curDoc):
+            tagNameList = crifanEvernote.generateTags(curDoc.note, noteSoup=curDoc.soup)
+            curDoc.note.tagGuids = self.evernote.getTagGuidList(tagNameList)
+
+        def syncNoteStage(curDoc):
+            syncParamDict = {
+                # mandatory
+                "noteGuid": curDoc.note.guid,
+                "noteTitle": curDoc.note.title,
+                # optional
+                "newContent": curDoc.note.content,
+                "newResList": curDoc.note.resources,
+                "newTagGuidList": curDoc.note.tagGuids,
+            }
+            return self.evernote.syncNote(**syncParamDict)
+
+        noteDoc.runStage("uploadImage", uploadImageStage)
+        noteDoc.runStage("listIndent", lambda curDoc: crifanEvernoteToWordpress.processSoupListIndent(curDoc.soup))
+        if isGenerateTags and (not curNote.tagGuids):
+            noteDoc.runStage("generateTags", generateTagsStage)
+        noteDoc.updateNoteContent()
+        noteDoc.runStage("syncNote", syncNoteStage)
+
+        # following only for wordpress post, not sync back to note
+        noteDoc.runStage("codeblock", lambda curDoc: crifanEvernoteToWordpress.processPostCodeblock(curDoc.soup))
+        contentHtml = noteDoc.toHtml()
+        isUploadOk, respInfo = noteDoc.runStage("uploadPost", lambda curDoc: self.uploadNoteToWordpress(
+            curDoc.note, isNeedGetLatestDetail=False, contentHtml=contentHtml, **postParaDict))
+
+        logging.info("Stage time of %s: %s", curNote.title, noteDoc.getStageTimeStr())
+        return isUploadOk, respInfo
 
     def generateCategoryList(self, tagNameList):
         """Generate category list from tag name list
@@ -287,6 +397,7 @@ class crifanEvernoteToWordpress(object):
             postStatus="draft",
             postFormat="standard",
             isNeedGetLatestDetail=True,
+            contentHtml=None,
         ):
         """Upload note content new html to wordpress
 
@@ -296,6 +407,7 @@ class crifanEvernoteToWordpress(object):
             postStatus (str): post status. Default to 'draft'. Options: publish/future/draft/pending/private
             postFormat (str): post format. Default to 'standard'. Options: standard/aside/chat/gallery/link/image/quote/status/video/audio
             isNeedGetLatestDetail (bool): need or not to get latest detailed note content
+            contentHtml (str): post content html, if None, generate from note content
         Returns:
             (bool, dict)
         Raises:
@@ -323,7 +435,8 @@ class crifanEvernoteToWordpress(object):
         # '<!DOCTYPE en-note SYSTEM "http://xml.evernote.com/pub/enml2.dtd">\n<en-note>\n <div>\n  折腾：\n </div>\n <div>\n  【已解决】Mac Pro 2018款发热量大很烫非常烫\n </div>。。。。。。high performance graphic cards\n    </li>\n   </ul>\n  </ul>\n </ul>\n <div>\n  <br/>\n </div>\n</en-note>'
         # contentHtml = crifanEvernote.getNoteContentHtml(curNote)
         # '<html>\n <div>\n  折腾：\n </div>\n <div>\n  【已解决】Mac Pro 2018款发热量大很烫非常烫\n </div>\n <div>\n  期间， ... graphic cards\n    </li>\n   </ul>\n  </ul>\n </ul>\n <div>\n  <br/>\n </div>\n</html>'
-        contentHtml = crifanEvernote.getNoteContentHtml(curNote, isKeepTopHtml=False)
+        if contentHtml is None:
+            contentHtml = crifanEvernote.getNoteContentHtml(curNote, isKeepTopHtml=False)
         logging.debug("contentHtml=%s", contentHtml)
         # '<div>\n  折腾：\n </div>\n <div>\n  【已解决】Mac Pro 2018款发热量大很烫非常烫\n </div>\n <div>\n  期间， ... graphic cards\n    </li>\n   </ul>\n  </ul>\n </ul>\n <div>\n  <br/>\n </div>'
 
@@ -869,6 +982,28 @@ class crifanEvernoteToWordpress(object):
         # Note: makesure removed top html, then following can search out ul and ul list with recursive=False
         soup = crifanEvernote.noteContentToSoup(curNote, isKeepTopHtml=False)
 
+        isChanged = crifanEvernoteToWordpress.processSoupListIndent(soup)
+        if isChanged:
+            # soup changed, write back to note content
+            updatedNoteHtml = crifanEvernote.soupToNoteContent(soup)
+            curNote.content = updatedNoteHtml
+        else:
+            logging.info("No ul/ol list for %s", curNote.title)
+
+        return curNote
+
+    @staticmethod
+    def processSoupListIndent(soup):
+        """process list (ul/ol/...) indent of note content soup
+
+        Args:
+            soup (Soup): soup of note content, without top html
+        Returns:
+            changed or not (bool)
+        Raises:
+        """
+        isChanged = False
+
         # allSubUlSoupList = soup.find_all("ul")
         # allSubUlSoupNum = len(allSubUlSoupList)
         # logging.info("Found %d all sub level ul list", allSubUlSoupNum)
@@ -895,10 +1030,6 @@ class crifanEvernoteToWordpress(object):
                 crifanEvernoteToWordpress.processSpanInUlOl(eachListSoup)
                 logging.debug("after  eachListSoup=%s", eachListSoup)
 
-            # soup changed, write back to note content
-            updatedNoteHtml = crifanEvernote.soupToNoteContent(soup)
-            curNote.content = updatedNoteHtml
-        else:
-            logging.info("No ul/ol list for %s", curNote.title)
+            isChanged = True
 
-        return curNote
+        return isChanged
@@ -10,7 +10,8 @@ Note:
         (1) change change MysqlDb config to your mysql config
         (2) change CurrentTableName to your table name
         (3) change CreateTableSqlTemplate to your sql to create new mysql table fields
-        (4) if your table field contain more type, edit insert to add more type for "TODO: add more type formatting if necessary"
+        (4) if your multiple threads use same MysqlDb, change PoolMaxSize to your max concurrent connection number
+            (field values are passed as sql parameters and escaped by pymysql, no need to add type formatting for your field type)
 """
 
 
@@ -21,6 +22,12 @@ __license__ = "GPL"
 
 import logging
 import re
+import time
+import queue
+import operator
+import itertools
+import threading
+import contextlib
 import pymysql
 import pymysql.cursors
 
@@ -68,6 +75,15 @@ MysqlConfig = {
     'charset': "utf8"
 }
 
+# max number of connections in MysqlDb connection pool
+PoolMaxSize = 5
+# ping (and reconnect if necessary) connection got from pool if it is idle more than this seconds
+PoolPingIdleSeconds = 60
+# number of rows in one executemany (multiple rows INSERT) and commit of bulkInsert
+BulkInsertBatchSize = 1000
+# number of rows fetched from server in one fetchmany of queryIter
+QueryIterChunkSize = 1000
+
 ################################################################################
 # Constant
 ################################################################################
@@ -91,8 +107,120 @@ gConst = {
 # Mysql Function
 ################################################################################
 
+class MysqlConnectionPool:
+    """
+    Thread safe mysql connection pool
+    connections are created on demand (at most maxSize), and reused after released
+
+    Example:
+        curPool = MysqlConnectionPool(lambda: pymysql.connect(**MysqlConfig), maxSize=5)
+        with curPool.connection() as curConnection:
+            ...
+    """
+
+    def __init__(self, connectFunc, maxSize=PoolMaxSize, pingIdleSeconds=PoolPingIdleSeconds):
+        """
+            connectFunc: function without parameter, return new DB-API connection
+        """
+        self.connectFunc = connectFunc
+        self.maxSize = maxSize
+        self.pingIdleSeconds = pingIdleSeconds
+        # item: (connection, releaseTime), last released is reused first
+        self.idleList = []
+        self.createdNum = 0
+        # protect idleList and createdNum, notify waiter when connection released or discarded
+        self.condition = threading.Condition()
+
+    def getConnection(self, timeout=None):
+        """
+            get idle connection, or create new one if not reach maxSize, otherwise wait for released (or discarded) one
+            raise queue.Empty if timeout
+        """
+        endTime = (time.time() + timeout) if (timeout is not None) else None
+        isCreateNew = False
+        with self.condition:
+            while True:
+                if self.idleList:
+                    curConnection, releaseTime = self.idleList.pop()
+                    break
+                if self.createdNum < self.maxSize:
+                    self.createdNum += 1
+                    isCreateNew = True
+                    break
+                if endTime is None:
+                    self.condition.wait()
+                else:
+                    remainSeconds = endTime - time.time()
+                    if remainSeconds <= 0:
+                        raise queue.Empty
+                    self.condition.wait(remainSeconds)
+
+        if isCreateNew:
+            try:
+                return self.connectFunc()
+            except Exception:
+                self.freeSlot()
+                raise
+
+        if self.pingIdleSeconds and ((time.time() - releaseTime) > self.pingIdleSeconds) and hasattr(curConnection, "ping"):
+            try:
+                curConnection.ping(reconnect=True)
+            except Exception:
+                self.discardConnection(curConnection)
+                return self.getConnection(timeout=timeout)
+        return curConnection
+
+    def freeSlot(self):
+        """connection number decreased, so waiter can create new one"""
+        with self.condition:
+            self.createdNum -= 1
+            self.condition.notify()
+
+    def releaseConnection(self, curConnection):
+        """put connection back to pool"""
+        with self.condition:
+            self.idleList.append((curConnection, time.time()))
+            self.condition.notify()
+
+    def discardConnection(self, curConnection):
+        """close broken connection, not put back to pool"""
+        self.freeSlot()
+        try:
+            curConnection.close()
+        except Exception:
+            pass
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """get connection and auto release it back after used"""
+        curConnection = self.getConnection(timeout=timeout)
+        try:
+            yield curConnection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # connection maybe broken
+            self.discardConnection(curConnection)
+            raise
+        except BaseException:
+            self.releaseConnection(curConnection)
+            raise
+        else:
+            self.releaseConnection(curConnection)
+
+    def closeAll(self):
+        """close all idle connections"""
+        with self.condition:
+            idleList = self.idleList
+            self.idleList = []
+        for curConnection, _ in idleList:
+            self.discardConnection(curConnection)
+
 
 class MysqlDb:
+    """
+    Mysql operation on connections from self.pool (MysqlConnectionPool),
+    so executeSql/insert/bulkInsert/queryIter/... can be called from multiple threads on same MysqlDb
+    Note: cursor() use single self.connection, not thread safe, only for compatible
+    """
 
     config = {}
     curTableName = ""
@@ -107,13 +235,18 @@ class MysqlDb:
             config=MysqlConfig,
             needCreateTable=False,
             tableName = CurrentTableName,
-            createTableSqlTemplate=CreateTableSqlTemplate
+            createTableSqlTemplate=CreateTableSqlTemplate,
+            poolSize=PoolMaxSize,
+            connectFunc=pymysql.connect,
         ):
         """
             init mysql
             for tablename:
                 for needCreateTable=True, use db name if db in config
                 otherwise use tableName parameter
+            poolSize: max connection number of self.pool, used by all sql operations (and can be used by multiple threads)
+            connectFunc: function to create connection by config, default is pymysql.connect,
+                can pass other DB-API (with format paramstyle) connect function, eg: for test
         """
         if self.isUseLog:
             logging.info("config=%s, needCreateTable=%s, tableName=%s, createTableSqlTemplate=%s",
@@ -126,9 +259,11 @@ class MysqlDb:
             self.curTableName = tableName
 
         self.createTableSqlTemplate = createTableSqlTemplate
+        self.connectFunc = connectFunc
+        self.pool = MysqlConnectionPool(self.newConnection, maxSize=poolSize)
 
         # 1. connect db first
-        if self.connection is None:
+        if not self.isConnected:
             self.isConnected = self.connect()
             if self.isUseLog:
                 logging.info("Connect mysql return %s", self.isConnected)
@@ -141,18 +276,26 @@ class MysqlDb:
                     logging.info("Create table %s return %s, %s", self.curTableName, createTableOk, resultDict)
 
     def close(self):
-        """close mysql connection"""
+        """close mysql connection and all idle connections in pool"""
         if self.connection:
             self.connection.close()
-            self.isConnected = False
+            self.connection = None
+        self.isConnected = False
+        self.pool.closeAll()
+
+    def newConnection(self):
+        """create new connection by config"""
+        connectConfig = dict(self.config)
+        connectConfig["cursorclass"] = pymysql.cursors.DictCursor
+        return self.connectFunc(**connectConfig)
 
     def connect(self):
+        """check can connect mysql, the created connection is kept in self.pool for later use"""
         try:
             # self.connection = pymysql.connect(**self.config, cursorclass=pymysql.cursors.DictCursor)
-            self.config["cursorclass"] = pymysql.cursors.DictCursor
-            self.connection = pymysql.connect(**self.config)
-            if self.isUseLog:
-                logging.info("Connect mysql ok, self.connection=%s", self.connection)
+            with self.pool.connection() as curConnection:
+                if self.isUseLog:
+                    logging.info("Connect mysql ok, connection=%s", curConnection)
             return True
         except pymysql.Error as err:
             if self.isUseLog:
@@ -187,12 +330,33 @@ class MysqlDb:
 
         return foundErrorCode, errorCode, errorMessage
 
+    def genInsertSql(self, fieldList, tablename, updateFieldList=None):
+        """
+            generate parameterized insert sql, optional with ON DUPLICATE KEY UPDATE for updateFieldList
+            eg:
+                INSERT INTO tbl (`a`, `b`) VALUES (%s, %s) ON DUPLICATE KEY UPDATE `b`=VALUES(`b`)
+        """
+        keyListSql = ", ".join(self.quoteIdentifier(eachKey) for eachKey in fieldList)
+        valuePlaceholderSql = ", ".join(["%s"] * len(fieldList))
+        insertSql = "INSERT INTO %s (%s) VALUES (%s)" % (tablename, keyListSql, valuePlaceholderSql)
+        if updateFieldList:
+            updateSql = ", ".join("%s=VALUES(%s)" % (self.quoteIdentifier(eachKey), self.quoteIdentifier(eachKey)) for eachKey in updateFieldList)
+            insertSql += " ON DUPLICATE KEY UPDATE %s" % updateSql
+        return insertSql
+
     def cursor(self):
+        """cursor of single self.connection, not thread safe, use self.pool.connection() for new code"""
+        if self.connection is None:
+            self.connection = self.newConnection()
         return self.connection.cursor()
 
-    def executeSql(self, sqlStr, actionDescription=""):
+    def executeSql(self, sqlStr, actionDescription="", sqlParams=None):
+        """
+            execute sql, sqlParams (tuple/list for %s, or dict for %(name)s) is escaped by mysql driver
+            use connection from self.pool, so can be called from multiple threads
+        """
         if self.isUseLog:
-            logging.debug("executeSql: sqlStr=%s, actionDescription=%s", sqlStr, actionDescription)
+            logging.debug("executeSql: sqlStr=%s, sqlParams=%s, actionDescription=%s", sqlStr, sqlParams, actionDescription)
 
         executeOk = False
         resultDict = {
@@ -201,7 +365,7 @@ class MysqlDb:
             "data": None
         }
 
-        if self.connection is None:
+        if not self.isConnected:
             if self.isUseLog:
                 logging.error("Please connect mysql first before execute mysql %s for %s", sqlStr, actionDescription)
             executeOk = False
@@ -209,32 +373,35 @@ class MysqlDb:
             resultDict["message"] = "Mysql not connected"
             return executeOk, resultDict
 
-        cursor = self.connection.cursor()
-        if self.isUseLog:
-            logging.debug("cursor=%s", cursor)
-
-        try:
-            executeReturn = cursor.execute(sqlStr)
-            sqlResult = cursor.fetchall()
-            self.connection.commit()
+        with self.pool.connection() as curConnection:
+            cursor = curConnection.cursor()
             if self.isUseLog:
-                logging.debug("+++ Ok to execute sql %s for %s -> return=%s, result=%s", sqlStr, actionDescription, executeReturn, sqlResult)
-            executeOk = True
-            resultDict["code"] = 0
-            resultDict["message"] = "OK"
-            resultDict["data"] = sqlResult
-        except pymysql.Error as err:
-            errStr = str(err)
+                logging.debug("cursor=%s", cursor)
 
-            if self.isUseLog:
-                logging.debug("!!! %s when execute sql: %s for %s", errStr, sqlStr, actionDescription)
-            self.connection.rollback()
+            try:
+                executeReturn = cursor.execute(sqlStr, sqlParams)
+                sqlResult = cursor.fetchall()
+                curConnection.commit()
+                if self.isUseLog:
+                    logging.debug("+++ Ok to execute sql %s for %s -> return=%s, result=%s", sqlStr, actionDescription, executeReturn, sqlResult)
+                executeOk = True
+                resultDict["code"] = 0
+                resultDict["message"] = "OK"
+                resultDict["data"] = sqlResult
+            except pymysql.Error as err:
+                errStr = str(err)
 
-            executeOk = False
-            foundErrorCode, errorCode, errorMessage = self.extractMysqlErrorCodeMessage(errStr)
-            if foundErrorCode:
-                resultDict["code"] = errorCode
-                resultDict["message"] = errorMessage
+                if self.isUseLog:
+                    logging.debug("!!! %s when execute sql: %s for %s", errStr, sqlStr, actionDescription)
+                curConnection.rollback()
+
+                executeOk = False
+                foundErrorCode, errorCode, errorMessage = self.extractMysqlErrorCodeMessage(errStr)
+                if foundErrorCode:
+                    resultDict["code"] = errorCode
+                    resultDict["message"] = errorMessage
+            finally:
+                cursor.close()
 
         return executeOk, resultDict
 
@@ -263,40 +430,149 @@ class MysqlDb:
         """
             inset dict value into mysql table
             makesure the value is dict, and its keys is the key in the table
+            values are passed as sql parameters, so any type supported by mysql driver is ok
         """
         if self.isUseLog:
-            logging.info("insert: valueDict=%s, tablename=%s", valueDict, tablename)
+            logging.debug("insert: valueDict=%s, tablename=%s", valueDict, tablename)
+
+        insertSql = self.genInsertSql(list(valueDict.keys()), tablename)
+        if self.isUseLog:
+            logging.debug("insertSql=%s", insertSql)
+        # INSERT INTO tbl_car_info_test (`url`, `mainBrand`, `subBrand`, `brandSerie`, `brandSerieId`, `model`, `modelId`, `modelStatus`, `cityDealerPrice`, `msrpPrice`) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+
+        return self.executeSql(sqlStr=insertSql, actionDescription=("Insert value to table %s" % tablename), sqlParams=tuple(valueDict.values()))
+
+    def bulkInsert(self, rows, batchSize=BulkInsertBatchSize, tablename=None, fieldList=None, updateFieldList=None):
+        """
+            insert many rows into mysql table in batches: each batch is one executemany and one commit
+            (for pymysql, executemany of INSERT ... VALUES is sent as one multiple rows VALUES statement)
+            use connection from self.pool, so can be called from multiple threads
+
+            rows: iterable (list/generator) of row
+                row is dict (key is field name) or tuple/list (same order with fieldList)
+            fieldList: field name list, if None, use keys of first row (dict)
+            updateFieldList: if not empty, use INSERT ... ON DUPLICATE KEY UPDATE field=VALUES(field) for these fields
+            return (isOk, resultDict)
+                resultDict["data"]: {"rowNum": inserted row number, "affectedRowNum": xxx, "batchNum": xxx}
+                if failed, batches before failed one already committed, failed batch is rolled back
+
+            Example:
+                isOk, resultDict = mysqlObj.bulkInsert(csv.DictReader(csvFp), batchSize=1000, updateFieldList=["value"])
+        """
+        if not tablename:
+            tablename = self.curTableName
+
+        bulkResultDict = {
+            "code": 0,
+            "message": "OK",
+            "data": {
+                "rowNum": 0,
+                "affectedRowNum": 0,
+                "batchNum": 0,
+            },
+        }
+        resultData = bulkResultDict["data"]
 
-        dictKeyList = valueDict.keys()
-        dictValueList = valueDict.values()
+        rowIter = iter(rows)
+        firstBatch = list(itertools.islice(rowIter, batchSize))
+        if not firstBatch:
+            return True, bulkResultDict
+
+        isDictRow = isinstance(firstBatch[0], dict)
+        if not fieldList:
+            fieldList = list(firstBatch[0].keys())
+        insertSql = self.genInsertSql(fieldList, tablename, updateFieldList=updateFieldList)
         if self.isUseLog:
-            logging.debug("dictKeyList=%s, dictValueList=%s", dictKeyList, dictValueList)
+            logging.debug("bulkInsert: insertSql=%s, batchSize=%s", insertSql, batchSize)
+
+        if isDictRow:
+            valueGetter = operator.itemgetter(*fieldList)
+            if len(fieldList) == 1:
+                toParams = lambda eachRow: (valueGetter(eachRow), )
+            else:
+                toParams = valueGetter
+        else:
+            toParams = tuple
+
+        curBatch = firstBatch
+        with self.pool.connection() as curConnection:
+            while curBatch:
+                try:
+                    paramsList = [toParams(eachRow) for eachRow in curBatch]
+                except KeyError as err:
+                    bulkResultDict["code"] = 10001
+                    bulkResultDict["message"] = "Row in batch %d not contain field %s" % (resultData["batchNum"], err)
+                    return False, bulkResultDict
+
+                cursor = curConnection.cursor()
+                try:
+                    affectedRowNum = cursor.executemany(insertSql, paramsList)
+                    curConnection.commit()
+                except pymysql.Error as err:
+                    curConnection.rollback()
+                    errStr = str(err)
+                    if self.isUseLog:
+                        logging.warning("!!! %s when bulk insert batch %d into %s", errStr, resultData["batchNum"], tablename)
+                    foundErrorCode, errorCode, errorMessage = self.extractMysqlErrorCodeMessage(errStr)
+                    bulkResultDict["code"] = errorCode if foundErrorCode else 10000
+                    bulkResultDict["message"] = errorMessage if foundErrorCode else errStr
+                    return False, bulkResultDict
+                finally:
+                    cursor.close()
+
+                resultData["rowNum"] += len(curBatch)
+                resultData["affectedRowNum"] += affectedRowNum or 0
+                resultData["batchNum"] += 1
+                curBatch = list(itertools.islice(rowIter, batchSize))
 
-        keyListSql = ", ".join(self.quoteIdentifier(eachKey) for eachKey in dictKeyList)
         if self.isUseLog:
-            logging.debug("keyListSql=%s", keyListSql)
-        # valueListSql = ", ".join(eachValue for eachValue in dictValueList)
-        valueListSql = ""
-        formattedDictValueList = []
-        for eachValue in dictValueList:
-            eachValueInSql = ""
-            valueType = type(eachValue)
-            if valueType is str:
-                eachValueInSql = '"%s"' % eachValue
-            elif valueType is int:
-                eachValueInSql = '%d' % eachValue
-            # TODO: add more type formatting if necessary
-            # logging.info("eachValueInSql=%s", eachValueInSql)
-            formattedDictValueList.append(eachValueInSql)
-
-        valueListSql = ", ".join(eachValue for eachValue in formattedDictValueList)
-
-        insertSql = """INSERT INTO %s (%s) VALUES (%s)""" % (tablename, keyListSql, valueListSql)
+            logging.info("bulkInsert %d rows into %s in %d batches", resultData["rowNum"], tablename, resultData["batchNum"])
+        return True, bulkResultDict
+
+    def queryIter(self, sqlStr, sqlParams=None, chunkSize=QueryIterChunkSize, isDictRow=True, isYieldChunk=False):
+        """
+            query by server side (unbuffered) cursor, lazily yield row (or chunk=list of row) of result,
+            so memory only hold one chunk, for SELECT of huge table
+            use connection from self.pool: after iterate all rows, connection is released back to pool;
+            if stop iterate early (break/exception/close), connection is discarded (to not read all remaining rows from server)
+
+            isDictRow: True to use SSDictCursor (row is dict), False to use SSCursor (row is tuple, less memory)
+            isYieldChunk: True to yield list of rows (at most chunkSize rows), False to yield each row
+
+            Example:
+                for eachRow in mysqlObj.queryIter("SELECT * FROM tbl WHERE value > %s", (10, )):
+                    ...
+        """
         if self.isUseLog:
-            logging.debug("insertSql=%s", insertSql)
-        # INSERT INTO tbl_car_info_test (`url`, `mainBrand`, `subBrand`, `brandSerie`, `brandSerieId`, `model`, `modelId`, `modelStatus`, `cityDealerPrice`, `msrpPrice`) VALUES ("https://www.autohome.com.cn/spec/5872/#pvareaid=2042128", "宝马", "华晨宝马", "宝马3系", "66", "2010款 320i 豪华型", "5872", "停售", 325000, 375000)
+            logging.debug("queryIter: sqlStr=%s, sqlParams=%s, chunkSize=%s", sqlStr, sqlParams, chunkSize)
 
-        return self.executeSql(sqlStr=insertSql, actionDescription=("Insert value to table %s" % tablename))
+        if isDictRow:
+            cursorClass = pymysql.cursors.SSDictCursor
+        else:
+            cursorClass = pymysql.cursors.SSCursor
+
+        curConnection = self.pool.getConnection()
+        isFinished = False
+        try:
+            cursor = curConnection.cursor(cursorClass)
+            cursor.execute(sqlStr, sqlParams)
+            while True:
+                chunkRowList = cursor.fetchmany(chunkSize)
+                if not chunkRowList:
+                    break
+                if isYieldChunk:
+                    yield chunkRowList
+                else:
+                    yield from chunkRowList
+            cursor.close()
+            # end read transaction, next query on this connection can see new data
+            curConnection.commit()
+            isFinished = True
+        finally:
+            if isFinished:
+                self.pool.releaseConnection(curConnection)
+            else:
+                self.pool.discardConnection(curConnection)
 
     def delete(self, keyName, keyValue, tablename=curTableName):
         """
@@ -17,6 +17,7 @@ import re
 import io
 import os
 import copy
+import concurrent.futures
 
 from PIL import Image
 from PIL import ImageDraw
@@ -63,6 +64,21 @@ ImageSuffixToMime = {
     'tiff': 'image/tiff',
     # 'svg': 'image/svg',
 }
+
+# (magic bytes offset, magic bytes, Pillow image format)
+ImageMagicBytesList = [
+    (0, b"\x89PNG\r\n\x1a\n", "PNG"),
+    (0, b"\xff\xd8\xff", "JPEG"),
+    (0, b"GIF87a", "GIF"),
+    (0, b"GIF89a", "GIF"),
+    (0, b"BM", "BMP"),
+    (0, b"II*\x00", "TIFF"),
+    (0, b"MM\x00*", "TIFF"),
+]
+
+JPEG_QUALITY = 90
+# image mode which can not save as JPEG, need convert to RGB before save
+JpegNotSupportModeList = ["RGBA", "LA", "P", "PA", "I;16"]
 ################################################################################
 # Global Variable
 ################################################################################
@@ -116,30 +132,31 @@ def resizeImage(inputImage,
     if isinstance(inputImage, Image.Image):
         imgObj = inputImage
         shouldClose = False
+        originBytes = imageToBytes(imgObj)
     else:
-        openableImage = inputImage
-        if isinstance(inputImage, str):
-            openableImage = inputImage
+        # use input bytes as origin bytes, not re-encode decoded image
+        if isinstance(inputImage, bytes):
+            originBytes = inputImage
         elif isFileObject(inputImage):
-            openableImage = inputImage
-        elif isinstance(inputImage, bytes):
-            openableImage = io.BytesIO(inputImage)
+            originBytes = inputImage.read()
+        else:
+            with open(inputImage, "rb") as imgFp:
+                originBytes = imgFp.read()
 
-        imgObj = Image.open(openableImage) # <PIL.PngImagePlugin.PngImageFile image mode=RGBA size=3543x3543 at 0x1065F7A20>
+        imgObj = bytesToImage(originBytes) # <PIL.PngImagePlugin.PngImageFile image mode=RGBA size=3543x3543 at 0x1065F7A20>
 
-    originImgObj = copy.deepcopy(imgObj)
-    originBytes = imageToBytes(originImgObj)
     originBytesLen = len(originBytes) # 73348
 
     originFormat = imgObj.format # 'JPEG'
     originSize = imgObj.size # (1080, 2340)
 
     # resize to smaller
+    # Note: for not loaded image, thumbnail use draft (JPEG decode in smaller scale) and reduce, only decode once
     imgObj.thumbnail(newMaxSize, resample)
+    newFormat = originFormat
     # convert to other format
-    if outputFormat and (imgObj.format != outputFormat):
-        imgObj = convertImageFormat(imgObj, outputFormat)
-        # imgObj = convertImageFormat(imgObj, outputFormat, isOptimize=True)
+    if outputFormat and (originFormat != outputFormat):
+        newFormat = outputFormat
 
         if outputImageFilePath:
             # auto change suffix if output format changed
@@ -158,10 +175,10 @@ def resizeImage(inputImage,
             outputImageFilePath = imgRootPart + newPointSuffix
 
     # get binary data
-    newBytes = imageToBytes(imgObj)
+    encodableImg = toEncodableImage(imgObj, newFormat)
+    newBytes = encodeImage(encodableImg, newFormat)
 
     newSize = imgObj.size # (360, 780)
-    newFormat = imgObj.format # 'JPEG'
 
     # save image to file
     if outputImageFilePath:
@@ -169,14 +186,12 @@ def resizeImage(inputImage,
         #     imgObj.save(outputImageFilePath, optimize=True)
         # else:
         #     imgObj.save(outputImageFilePath)
-        saveExtraParaDict = {}
         if isOutputOptimize:
-            saveExtraParaDict["optimize"] = True
-
-        if newFormat == "JPEG":
-            saveExtraParaDict["quality"] = 90
-
-        imgObj.save(outputImageFilePath, **saveExtraParaDict)
+            optimizedBytes = encodeImage(encodableImg, newFormat, isOptimize=True)
+        else:
+            optimizedBytes = newBytes
+        with open(outputImageFilePath, "wb") as outputFp:
+            outputFp.write(optimizedBytes)
 
     # close it
     if shouldClose:
@@ -333,6 +348,25 @@ def bytesToImage(imgBytes):
     curImg = Image.open(imgBytesIO)
     return curImg
 
+def detectImageFormat(imgBytes):
+    """Detect image format from magic bytes (file signature), without Pillow open/decode
+
+    Args:
+        imgBytes (bytes): image binary bytes, only need the first few bytes
+    Returns:
+        Pillow image format(str) or None if unknown
+    Raises:
+    Examples:
+        b'\\x89PNG\\r\\n\\x1a\\n...' -> 'PNG'
+        b'\\xff\\xd8\\xff\\xe0...' -> 'JPEG'
+    """
+    imgFormat = None
+    for magicOffset, magicBytes, curFormat in ImageMagicBytesList:
+        if imgBytes.startswith(magicBytes, magicOffset):
+            imgFormat = curFormat
+            break
+    return imgFormat
+
 def imageToBytes(imgObj, isUseOriginObj=False):
     """Get binary data bytes from Image.Image instance
 
@@ -350,7 +384,6 @@ def imageToBytes(imgObj, isUseOriginObj=False):
     imgBytesIO = io.BytesIO()
     # curImgObj.save(imgBytesIO, curImgObj.format) # 'TiffImageFile' object has no attribute 'use_load_libtiff'
     if curImgObj.format == "JPEG":
-        JPEG_QUALITY = 90
         curImgObj.save(imgBytesIO, curImgObj.format, quality=JPEG_QUALITY)
     else:
         curImgObj.save(imgBytesIO, curImgObj.format)
@@ -374,6 +407,43 @@ def imageToBytes(imgObj, isUseOriginObj=False):
 #     imgBytes = imageIO.getvalue()
 #     return imgBytes
 
+def toEncodableImage(imgObj, imgFormat):
+    """Get Image which can be saved as imgFormat: for JPEG, convert mode (RGBA/P/...) to RGB
+
+    Args:
+        imgObj (Image): the Pillow Image instance
+        imgFormat (str): Image format to save, eg: "JPEG"/"PNG"
+    Returns:
+        Image, converted new Image or imgObj self if not need convert
+    Raises:
+    """
+    if (imgFormat == "JPEG") and (imgObj.mode in JpegNotSupportModeList):
+        imgObj = imgObj.convert("RGB")
+    return imgObj
+
+def encodeImage(imgObj, imgFormat, isOptimize=False):
+    """Encode Image into binary bytes of imgFormat, not modify/copy imgObj
+
+    Args:
+        imgObj (Image): the Pillow Image instance, mode should support imgFormat, see toEncodableImage
+        imgFormat (str): Image format, eg: "JPEG"/"PNG"
+        isOptimize (bool): do optimize when save, slower but smaller
+    Returns:
+        bytes, binary data of Image
+    Raises:
+    """
+    saveParaDict = {}
+    if isOptimize:
+        saveParaDict["optimize"] = True
+    if imgFormat == "JPEG":
+        saveParaDict["quality"] = JPEG_QUALITY
+
+    imgBytesIO = io.BytesIO()
+    imgObj.save(imgBytesIO, imgFormat, **saveParaDict)
+    imgBytes = imgBytesIO.getvalue()
+    imgBytesIO.close()
+    return imgBytes
+
 def convertImageFormat(imgObj, outputFormat=None, isOptimize=False, isKeepPrevValues=True):
     """Convert image format
 
@@ -406,15 +476,22 @@ def convertImageFormat(imgObj, outputFormat=None, isOptimize=False, isKeepPrevVa
 
     return newImgObj
 
-def resizeSingleImage(imgBytes, newSize=None):
-    """Resize a single image
+def resizeSingleImage(imgBytes, newSize=None, defaultMaxSize=None, resample=cfgDefaultImageResample, encodeExecutor=None):
+    """Resize a single image, output the smaller one of current format and another format (PNG<->JPEG)
+        input is decoded only once (JPEG use draft to decode in smaller scale),
+        the same thumbnail is encoded into two candidate formats in parallel
 
     Args:
         imgBytes (bytes): input image binary bytes
         newSize (tuple): resized to max size (width, height)
+        defaultMaxSize (tuple): max size (width, height) if newSize not set and not fixed size, default is 1024x1024
+        resample (int): resample filter for thumbnail
+        encodeExecutor (Executor): executor to encode another format candidate, if None, use temp thread
     Returns:
-        minResizedImgBytes(bytes), resizedImgFormat(str), newSize(tuple)
+        resized image info dict, same with resizeImage, plus "candidateLenDict": {format: encoded bytes len}
     Raises:
+    Examples:
+        {'originFormat': 'PNG', 'originSize': (1080, 2340), 'originLen': 385210, 'newFormat': 'JPEG', 'newSize': (360, 780), 'newLen': 42937, 'resizeRatio': 0.111, 'candidateLenDict': {'PNG': 152406, 'JPEG': 42937}, ...}
     """
     defaulMaxWidth = 1024
     # defaultMaxHeight = 768
@@ -446,6 +523,8 @@ def resizeSingleImage(imgBytes, newSize=None):
     if not newSize:
         if curSize in fixedSizeDict.keys():
             newSize = fixedSizeDict[curSize]
+        elif defaultMaxSize:
+            newSize = defaultMaxSize
         else:
             newSize = defaulMaxWidth, defaultMaxHeight
 
@@ -457,15 +536,49 @@ def resizeSingleImage(imgBytes, newSize=None):
         # anotherImgFormat = "PNG"
         anotherImgFormat = "JPEG"
 
-    curImgInfo = resizeImage(imgBytes, newSize, outputFormat=curImgFormat)
-    anotherImgInfo = resizeImage(imgBytes, newSize, outputFormat=anotherImgFormat)
+    # decode only once: image not loaded yet, so thumbnail can use draft (JPEG) and reduce
+    curImg.thumbnail(newSize, resample)
+    newImgSize = curImg.size
 
-    betterImgInfo = None
-    if curImgInfo["resizeRatio"] < anotherImgInfo["resizeRatio"]:
-        betterImgInfo = curImgInfo
-    else:
-        betterImgInfo = anotherImgInfo
+    curEncodableImg = toEncodableImage(curImg, curImgFormat)
+    anotherEncodableImg = toEncodableImage(curImg, anotherImgFormat)
+    if anotherEncodableImg is curEncodableImg:
+        # Image.save set attributes (encoderinfo) into image, so not save same Image in two threads
+        anotherEncodableImg = curImg.copy()
 
+    if encodeExecutor:
+        anotherFuture = encodeExecutor.submit(encodeImage, anotherEncodableImg, anotherImgFormat)
+        curBytes = encodeImage(curEncodableImg, curImgFormat)
+        anotherBytes = anotherFuture.result()
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as tempExecutor:
+            anotherFuture = tempExecutor.submit(encodeImage, anotherEncodableImg, anotherImgFormat)
+            curBytes = encodeImage(curEncodableImg, curImgFormat)
+            anotherBytes = anotherFuture.result()
+    curImg.close()
+
+    if len(curBytes) < len(anotherBytes):
+        newFormat, newBytes = curImgFormat, curBytes
+    else:
+        newFormat, newBytes = anotherImgFormat, anotherBytes
+
+    originBytesLen = len(imgBytes)
+    newBytesLen = len(newBytes)
+    betterImgInfo = {
+        "originFormat": curImgFormat,
+        "originSize": curSize,
+        "originBytes": imgBytes,
+        "originLen": originBytesLen,
+        "newFormat": newFormat,
+        "newSize": newImgSize,
+        "newBytes": newBytes,
+        "newLen": newBytesLen,
+        "resizeRatio": float(newBytesLen) / float(originBytesLen),
+        "candidateLenDict": {
+            curImgFormat: len(curBytes),
+            anotherImgFormat: len(anotherBytes),
+        },
+    }
     return betterImgInfo
 
 def calcResizeRatio(resizedImgBytes, originImg):
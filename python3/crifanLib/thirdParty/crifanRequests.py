@@ -15,7 +15,14 @@ __license__ = "GPL"
 import os
 import time
 import re
+import json
+import math
 import logging
+import threading
+from enum import Enum
+from collections import OrderedDict, deque, namedtuple
+from urllib.parse import urlparse
+import concurrent.futures
 import requests
 
 try:
@@ -41,14 +48,141 @@ CURRENT_LIB_FILENAME = "crifanRequests"
 
 UserAgent_Mac = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36"
 
+# default connection pool size of shared session
+SESSION_POOL_SIZE = 16
+
+# validateUrlBatch buffer at most threadNum * BATCH_BUFFER_FACTOR read but not started urls
+BATCH_BUFFER_FACTOR = 4
+
+# sidecar manifest file suffix for segmented download, to support resume each segment
+SEGMENT_MANIFEST_SUFFIX = ".segments.json"
+# not split file into too small segments
+SEGMENT_MIN_SIZE = 1024*1024
+
+# response meta (headers) cache seconds of each url
+RESP_META_CACHE_TTL = 300
+# max cached url number, remove oldest if exceed
+RESP_META_CACHE_MAX_NUM = 10000
+
+# default min interval of progress report
+PROGRESS_REPORT_INTERVAL_SECONDS = 0.5
+# smooth factor of EWMA speed, larger means more weight for recent speed
+PROGRESS_EWMA_ALPHA = 0.3
+
+# machine readable download stats, size in bytes, speed in bytes/second, percent is 0~100, None if total size unknown
+DownloadStats = namedtuple("DownloadStats", ["totalSize", "downloadedSize", "elapsedSeconds", "curSpeed", "ewmaSpeed", "avgSpeed", "percent"])
+
+class UrlValidateType(Enum):
+    IMAGE = "image" # isValidImageUrl
+    APK = "apk" # isAndroidApkUrl
+    CONTENT_TYPE = "contentType" # getContentTypeFromUrl
+
 ################################################################################
 # Global Variable
 ################################################################################
 
+gVal = {
+    "session": None,
+    "sessionPoolSize": 0,
+    "sessionLock": threading.Lock(),
+    "writeLock": threading.Lock(),
+    "respMetaCache": OrderedDict(), # (url, proxies) -> (expireTime, respMetaDict)
+    "respMetaCacheLock": threading.Lock(),
+}
+
 ################################################################################
 # Internal Function
 ################################################################################
 
+def _writeAtOffset(fileFd, dataBytes, fileOffset):
+    """Write bytes into file at offset, not change file position, support concurrent write to different parts"""
+    if hasattr(os, "pwrite"):
+        dataView = memoryview(dataBytes)
+        while dataView:
+            writtenSize = os.pwrite(fileFd, dataView, fileOffset)
+            dataView = dataView[writtenSize:]
+            fileOffset += writtenSize
+    else:
+        # Windows not support pwrite
+        with gVal["writeLock"]:
+            os.lseek(fileFd, fileOffset, os.SEEK_SET)
+            os.write(fileFd, dataBytes)
+
+def _splitSegments(totalSize, segmentNum):
+    """Split total size into segments list, each is dict of start, end (inclusive), downloaded size"""
+    maxSegmentNum = int(math.ceil(totalSize / SEGMENT_MIN_SIZE))
+    segmentNum = max(1, min(segmentNum, maxSegmentNum))
+    segmentSize = int(math.ceil(totalSize / segmentNum))
+    segmentList = []
+    for segmentStart in range(0, totalSize, segmentSize):
+        segmentEnd = min(segmentStart + segmentSize, totalSize) - 1
+        segmentList.append({"start": segmentStart, "end": segmentEnd, "downloaded": 0})
+    return segmentList
+
+def _loadSegmentManifest(manifestFile, url, totalSize):
+    """Load segment list from manifest file, return None if not exist or not match current url and size"""
+    segmentList = None
+    if os.path.isfile(manifestFile):
+        try:
+            with open(manifestFile, "r") as manifestFp:
+                manifestDict = json.load(manifestFp)
+            if (manifestDict["url"] == url) and (manifestDict["totalSize"] == totalSize):
+                segmentList = manifestDict["segmentList"]
+        except (ValueError, KeyError, OSError) as loadErr:
+            logging.warning("Ignore invalid segment manifest %s: %s", manifestFile, loadErr)
+    return segmentList
+
+def _saveSegmentManifest(manifestFile, url, totalSize, segmentList):
+    """Save segment list into manifest file, write to temp file then replace, to avoid broken manifest"""
+    manifestDict = {
+        "url": url,
+        "totalSize": totalSize,
+        "segmentList": segmentList,
+    }
+    tmpManifestFile = manifestFile + ".tmp"
+    with open(tmpManifestFile, "w") as manifestFp:
+        json.dump(manifestDict, manifestFp)
+    os.replace(tmpManifestFile, manifestFile)
+
+def _downloadSegment(session, url, fileFd, segmentDict, chunkSize, proxies, timeout, progressCallback):
+    """Download single segment by range request, write into file at its offset
+
+    Returns:
+        (bool, str): download ok or not, error message
+    """
+    curOffset = segmentDict["start"] + segmentDict["downloaded"]
+    segmentEnd = segmentDict["end"]
+    if curOffset > segmentEnd:
+        return True, ""
+
+    headers = {
+        "Range": "bytes=%d-%d" % (curOffset, segmentEnd),
+    }
+    try:
+        with session.get(url, proxies=proxies, headers=headers, stream=True, timeout=timeout) as resp:
+            contentRange = resp.headers.get("Content-Range", "")
+            if (resp.status_code != 206) or (not contentRange.startswith("bytes %d-" % curOffset)):
+                return False, "Not support range request, status_code=%s, Content-Range=%s" % (resp.status_code, contentRange)
+
+            for curChunkBytes in resp.iter_content(chunk_size=chunkSize):
+                if not curChunkBytes:
+                    continue
+                remainSize = segmentEnd - curOffset + 1
+                if len(curChunkBytes) > remainSize:
+                    curChunkBytes = curChunkBytes[:remainSize]
+                _writeAtOffset(fileFd, curChunkBytes, curOffset)
+                curOffset += len(curChunkBytes)
+                progressCallback(segmentDict, len(curChunkBytes))
+                if curOffset > segmentEnd:
+                    break
+    except Exception as downloadErr:
+        return False, "Exception %s for range %s" % (downloadErr, headers["Range"])
+
+    if curOffset <= segmentEnd:
+        return False, "Incomplete segment, %d bytes remain for range %s" % (segmentEnd - curOffset + 1, headers["Range"])
+
+    return True, ""
+
 def get302RealUrl(originUrl):
     """get real url address after 302 move
 
@@ -65,13 +199,106 @@ def get302RealUrl(originUrl):
         output: 'https://appdl-1-drcn.dbankcdn.com/dl/appdl/application/apk/db/dbd3fbf4bb7c4e199e27169b83054afd/com.zsbf.rxsc.2010151906.rpk?sign=f9001091ej1001042000000000000100000000000500100101010@21BD93C47A224B178DE4FCDEAC296E3F&extendStr=detail%3A1%3B&tabStatKey=A09000&relatedAppId=C100450321&hcrId=21BD93C47A224B178DE4FCDEAC296E3F&maple=0&distOpEntity=HWSW'
     """
     realUrl = ""
-    resp = requests.get(originUrl, allow_redirects=False)
+    resp = getRequestsSession().get(originUrl, allow_redirects=False)
 
     if resp.status_code == 302:
         realUrl = resp.headers['Location']
 
     return realUrl
 
+def _genRespMetaCacheKey(curUrl, proxies):
+    """Generate cache key of response meta from url and proxies"""
+    proxiesKey = tuple(sorted(proxies.items())) if proxies else None
+    return (curUrl, proxiesKey)
+
+def getRespMeta(curUrl, proxies=None, isUseCache=True, cacheTtl=RESP_META_CACHE_TTL, isKeepResp=False, session=None):
+    """Get response meta (headers etc.) from url, use HEAD, fallback to stream GET if HEAD failed
+        cached for each url, so multiple check (size, content type, etc.) of same url only need one request
+        only success (2xx/3xx) response is cached, error (4xx/5xx, such as 429/503) is requested again next time
+
+    Args:
+        curUrl (str): current url
+        proxies (dict): requests proxies
+        isUseCache (bool): use cached response meta or not
+        cacheTtl (int/float): cache seconds
+        isKeepResp (bool): if fallback to stream GET, keep the opened response (not read body) in result "resp",
+            so caller can reuse it to download body, caller should close it
+        session (requests.Session): session to use, default to shared session of getRequestsSession
+    Returns:
+        response meta(dict) or None
+            "url": final url after redirect
+            "statusCode": status code
+            "headers": response headers
+            "method": "HEAD" or "GET"
+            "resp": opened stream GET response if isKeepResp and fallback to GET, otherwise None
+    Raises:
+    Examples:
+        input: https://gameapktxdl.vivo.com.cn/appstore/developer/soft/20201020/202010201805243ed5v.apk
+        output: {'url': 'https://gameapktxdl.vivo.com.cn/appstore/developer/soft/20201020/202010201805243ed5v.apk', 'statusCode': 200, 'headers': {'Content-Type': 'application/vnd.android.package-archive', 'Content-Length': '154551625', ...}, 'method': 'HEAD', 'resp': None}
+    """
+    cacheKey = _genRespMetaCacheKey(curUrl, proxies)
+    if isUseCache:
+        with gVal["respMetaCacheLock"]:
+            cachedValue = gVal["respMetaCache"].get(cacheKey)
+        if cachedValue:
+            expireTime, cachedMetaDict = cachedValue
+            if time.time() < expireTime:
+                return dict(cachedMetaDict)
+
+    if session is None:
+        session = getRequestsSession()
+
+    respMetaDict = None
+    keptResp = None
+    try:
+        resp = session.head(curUrl, proxies=proxies, allow_redirects=True)
+        respMethod = "HEAD"
+        resp.close()
+        if resp.status_code >= 400:
+            # some server not support HEAD: 403/405/501
+            resp = session.get(curUrl, proxies=proxies, stream=True)
+            respMethod = "GET"
+            if isKeepResp:
+                keptResp = resp
+            else:
+                # only need headers, not read body
+                resp.close()
+
+        respMetaDict = {
+            "url": resp.url,
+            "statusCode": resp.status_code,
+            "headers": resp.headers,
+            "method": respMethod,
+            "resp": None,
+        }
+    except Exception as respErr:
+        logging.debug("Failed to get response meta for %s: %s", curUrl, respErr)
+        respMetaDict = None
+
+    if respMetaDict:
+        if respMetaDict["statusCode"] < 400:
+            with gVal["respMetaCacheLock"]:
+                respMetaCache = gVal["respMetaCache"]
+                respMetaCache.pop(cacheKey, None)
+                respMetaCache[cacheKey] = (time.time() + cacheTtl, respMetaDict)
+                while len(respMetaCache) > RESP_META_CACHE_MAX_NUM:
+                    respMetaCache.popitem(last=False)
+
+        respMetaDict = dict(respMetaDict)
+        respMetaDict["resp"] = keptResp
+
+    return respMetaDict
+
+def clearRespMetaCache(curUrl=None):
+    """Clear response meta cache of url, or clear all if url is None"""
+    with gVal["respMetaCacheLock"]:
+        if curUrl is None:
+            gVal["respMetaCache"].clear()
+        else:
+            for eachKey in list(gVal["respMetaCache"].keys()):
+                if eachKey[0] == curUrl:
+                    del gVal["respMetaCache"][eachKey]
+
 def getRespHeadersFromUrl(curUrl, proxies=None):
     """Get response headers from url
 
@@ -95,8 +322,8 @@ def getRespHeadersFromUrl(curUrl, proxies=None):
     respHeaderDict = None
 
     try:
-        resp = requests.get(curUrl, stream=True, proxies=proxies)
-        respHeaderDict = resp.headers
+        respMetaDict = getRespMeta(curUrl, proxies=proxies)
+        respHeaderDict = respMetaDict["headers"]
         # {'Date': 'Thu, 10 Dec 2020 05:27:10 GMT', 'Content-Type': 'application/vnd.android.package-archive', 'Content-Length': '154551625', 'Connection': 'keep-alive', 'Server': 'NWS_TCloud_static_msoc1_xz', 'Cache-Control': 'max-age=600', 'Expires': 'Thu, 10 Dec 2020 05:37:09 GMT', 'Last-Modified': 'Thu, 09 Jan 2020 11:21:35 GMT', 'X-NWS-UUID-VERIFY': '94db2d14f135898d924fb249b13a0964', 'X-Verify-Code': '2871bd7acf67c7e298e9c8d8c865e27d', 'X-NWS-LOG-UUID': 'a83536f2-ab83-465d-ba09-0e19a15cc706', 'X-Cache-Lookup': 'Hit From Disktank3, Hit From Inner Cluster', 'Accept-Ranges': 'bytes', 'ETag': '"46C50A5CADB6BEE339236477BB6DDC14"', 'X-Daa-Tunnel': 'hop_count=2'}
         # {'Server': 'Tengine', 'Date': 'Fri, 11 Dec 2020 14:11:00 GMT', 'Content-Type': 'application/pdf', 'Content-Length': '24422168', 'Last-Modified': 'Fri, 18 Sep 2020 09:56:15 GMT', 'Connection': 'keep-alive', 'ETag': '"5f64843f-174a718"', 'Strict-Transport-Security': 'max-age=15768000', 'Accept-Ranges': 'bytes'}
         # {'Date': 'Thu, 24 Dec 2020 09:19:58 GMT', 'Content-Type': 'application/vnd.android.package-archive', 'Content-Length': '190814345', 'Connection': 'keep-alive', 'Server': 'openresty', 'Age': '859494', 'Cache-Control': 'max-age=7200', 'Content-Disposition': 'attachment; filename="com.tanwan.yscqlyzf.huawei.2012141704.apk"', 'Expires': 'Mon, 14 Dec 2020 12:32:50 GMT', 'Last-Modified': 'Mon, 14 Dec 2020 12:32:50 GMT', 'Lct-Hot-Series': '12582912', 'Lct-Pos-Percent': '0.25', 'Nginx-Hit': '1', 'Via': 'CHN-JSwuxi-AREACT1-CACHE33[4],CHN-JSwuxi-AREACT1-CACHE43[0,TCP_HIT,2],CHN-JSwuxi-GLOBAL2-CACHE110[2],CHN-JSwuxi-GLOBAL2-CACHE74[0,TCP_HIT,0],CHN-SH-GLOBAL1-CACHE92[589],CHN-SH-GLOBAL1-CACHE152[555,TCP_MISS,588],CHN-HElangfang-GLOBAL2-CACHE41[493],CHN-HElangfang-GLOBAL2-CACHE24[487,TCP_MISS,491]', 'X-Ccdn-Cachettl': '31536000', 'X-Ccdn-Expires': '30676539', 'X-Hcs-Proxy-Type': '1', 'Accept-Ranges': 'bytes', 'dl-from': 'hwcdn'}
@@ -370,6 +597,122 @@ def isAndroidApkUrl(curApkUrl, proxies=None):
     else:
         return isAllValid, errMsg
 
+class ProgressReporter(object):
+    """Thread safe download progress reporter, rate limited, can shared by concurrent downloads to aggregate speed
+
+    report(stats) is called at most every intervalSeconds or every intervalBytes (if > 0),
+    sub class override report, or pass callback(stats)
+
+    Examples:
+        progressReporter = ProgressReporter(callback=lambda stats: scheduler.rebalance(stats.ewmaSpeed))
+        downloadFile(url1, progressReporter=progressReporter)
+    """
+
+    def __init__(self, intervalSeconds=PROGRESS_REPORT_INTERVAL_SECONDS, intervalBytes=0, ewmaAlpha=PROGRESS_EWMA_ALPHA, callback=None):
+        self.intervalSeconds = intervalSeconds
+        self.intervalBytes = intervalBytes
+        self.ewmaAlpha = ewmaAlpha
+        self.callback = callback
+
+        self.lock = threading.Lock()
+        self.totalSize = 0
+        self.downloadedSize = 0
+        # already downloaded size before start, not count into speed
+        self.resumedSize = 0
+        self.startTime = time.time()
+        self.prevReportTime = self.startTime
+        self.prevReportSize = 0
+        self.curSpeed = 0.0
+        self.ewmaSpeed = None
+
+    def addTotal(self, totalSize, resumedSize=0):
+        """Add total size and already downloaded size of a (new) download"""
+        with self.lock:
+            self.totalSize += totalSize
+            self.resumedSize += resumedSize
+            self.downloadedSize += resumedSize
+            self.prevReportSize += resumedSize
+
+    def update(self, chunkSize):
+        """Add downloaded chunk size, report if reach interval"""
+        with self.lock:
+            self.downloadedSize += chunkSize
+            curTime = time.time()
+            isReachInterval = (curTime - self.prevReportTime) >= self.intervalSeconds
+            if (not isReachInterval) and (self.intervalBytes > 0):
+                isReachInterval = (self.downloadedSize - self.prevReportSize) >= self.intervalBytes
+            if not isReachInterval:
+                return
+            curStats = self._updateStats(curTime)
+
+        self.report(curStats)
+
+    def finish(self):
+        """Report final stats"""
+        with self.lock:
+            curStats = self._updateStats(time.time())
+        self.report(curStats)
+
+    def getStats(self):
+        """Get current stats (DownloadStats), not report"""
+        with self.lock:
+            return self._genStats(time.time())
+
+    def report(self, stats):
+        if self.callback:
+            self.callback(stats)
+
+    def _updateStats(self, curTime):
+        """Update speed since previous report, return current stats, must called within lock"""
+        curDuration = curTime - self.prevReportTime
+        if curDuration > 0:
+            self.curSpeed = (self.downloadedSize - self.prevReportSize) / curDuration
+            if self.ewmaSpeed is None:
+                self.ewmaSpeed = self.curSpeed
+            else:
+                # weight by duration, ewmaAlpha is the weight of one full interval, so very short interval (eg: finish) not cause spike
+                intervalSeconds = self.intervalSeconds if (self.intervalSeconds > 0) else 1.0
+                curWeight = 1 - ((1 - self.ewmaAlpha) ** (curDuration / intervalSeconds))
+                self.ewmaSpeed = (curWeight * self.curSpeed) + ((1 - curWeight) * self.ewmaSpeed)
+        self.prevReportTime = curTime
+        self.prevReportSize = self.downloadedSize
+        return self._genStats(curTime)
+
+    def _genStats(self, curTime):
+        elapsedSeconds = curTime - self.startTime
+        avgSpeed = ((self.downloadedSize - self.resumedSize) / elapsedSeconds) if elapsedSeconds > 0 else 0.0
+        percent = round(100 * self.downloadedSize / self.totalSize, 2) if self.totalSize > 0 else None
+        ewmaSpeed = self.ewmaSpeed if (self.ewmaSpeed is not None) else 0.0
+        return DownloadStats(self.totalSize, self.downloadedSize, elapsedSeconds, self.curSpeed, ewmaSpeed, avgSpeed, percent)
+
+class PrintProgressReporter(ProgressReporter):
+    """Progress reporter which print speed, time, size, percent"""
+
+    def report(self, stats):
+        totalDownloadTimeDict = floatSecondsToDatetimeDict(stats.elapsedSeconds)
+        totalDownloadTimeStr = datetimeDictToStr(totalDownloadTimeDict, isShowMilliSecPart=False)
+        showStr = "downloading speed: cur=%s/s, avg=%s/s, time: total=%s, size: %s" % (formatSize(stats.curSpeed), formatSize(stats.avgSpeed), totalDownloadTimeStr, formatSize(stats.downloadedSize))
+        if stats.percent is not None:
+            showStr += ", percent: %s%%" % stats.percent
+        # 'downloading speed: cur=231.3KB/s, avg=231.3KB/s, time: total=00:00:02, size: 11.5MB, percent: 49.38%'
+        print(showStr)
+        super(PrintProgressReporter, self).report(stats)
+
+class NullProgressReporter(object):
+    """Progress reporter which do nothing, for not show progress"""
+
+    def addTotal(self, totalSize, resumedSize=0):
+        pass
+
+    def update(self, chunkSize):
+        pass
+
+    def finish(self):
+        pass
+
+    def getStats(self):
+        return None
+
 def streamingDownloadFile(
         url,
         fileToSave=None,
@@ -378,6 +721,8 @@ def streamingDownloadFile(
         chunkSize=1024*512,
         resumeSize=0,
         totalSize=0,
+        resp=None,
+        progressReporter=None,
     ):
     """Download file using stream mode, support showing process with current speed, percent, size
 
@@ -388,9 +733,14 @@ def streamingDownloadFile(
         isShowSpeed (bool): show downloading speed or not
         chunkSize (int): when showing download speed, need use stream downloading, need set chunck size
         resumeSize (bool): the size to start download, normally is the local already downloaded size
-        totalSize (int): total file size, only used for calculate downloaded percent
+        totalSize (int): total file size, for calculate downloaded percent, and check downloaded file size
+        resp (requests.Response): already opened stream GET response (from getRespMeta), reuse it if resumeSize is 0
+        progressReporter (ProgressReporter): report progress, can shared by concurrent downloads.
+            default to PrintProgressReporter if isShowSpeed, otherwise NullProgressReporter
     Returns:
         download ok or not (bool)
+            False if status code is not 206 (for resumeSize > 0) or 200,
+            or file size not equal totalSize (if totalSize is known)
     Raises:
     Examples:
     """
@@ -402,52 +752,281 @@ def streamingDownloadFile(
             if gotTotalSize:
                 totalSize = gotTotalSize
 
-    headers = {
-        'Range': 'bytes=%d-' % resumeSize,
-        # "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.81 Safari/537.36",
-    }
-    resp = requests.get(url, proxies=proxies, headers=headers, stream=True)
-    curDownloadedSize = 0
-    with open(fileToSave, "ab") as f:
-        startTime = time.time()
-        prevTime = startTime
+    if (resp is None) or (resumeSize != 0):
+        headers = {
+            # "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.81 Safari/537.36",
+        }
+        if resumeSize > 0:
+            headers["Range"] = "bytes=%d-" % resumeSize
+        resp = getRequestsSession().get(url, proxies=proxies, headers=headers, stream=True)
+
+    # server not support Range return 200 with whole file, if append it to downloaded part, file is broken
+    expectedStatusCode = 206 if resumeSize > 0 else 200
+    if resp.status_code != expectedStatusCode:
+        print("Failed to download %s: status code %s, expected %s" % (url, resp.status_code, expectedStatusCode))
+        resp.close()
+        return isDownloadOk
+
+    isOwnReporter = progressReporter is None
+    if isOwnReporter:
+        if isShowSpeed:
+            progressReporter = PrintProgressReporter()
+        else:
+            progressReporter = NullProgressReporter()
+    progressReporter.addTotal(totalSize, resumeSize)
+
+    # not resume: overwrite existed file, not append to it
+    openMode = "ab" if resumeSize > 0 else "wb"
+    with open(fileToSave, openMode) as f:
         for curChunkBytes in resp.iter_content(chunk_size=chunkSize):
             if curChunkBytes:
-                curTime = time.time() # 1606456020.0718982
                 f.write(curChunkBytes)
-                f.flush()
+                progressReporter.update(len(curChunkBytes))
 
-                curChunkSize = len(curChunkBytes) # 524288
-                curDownloadedSize += curChunkSize # 524288
-                totalDownloadedSize = curDownloadedSize + resumeSize # 12058624
-                totalDownloadedSizeStr = formatSize(totalDownloadedSize) # '11.5MB'
+    if isOwnReporter:
+        progressReporter.finish()
 
-                curDownloadTime = curTime - prevTime # 15.63818907737732
-                curSpeed = curChunkSize / curDownloadTime # 670522.651191692
-                curSpeedStr = formatSize(curSpeed) # '231.3KB'
+    if totalSize:
+        downloadedSize = os.path.getsize(fileToSave)
+        isDownloadOk = downloadedSize == totalSize
+        if not isDownloadOk:
+            print("Failed to download %s: file size %s not equal total size %s" % (url, downloadedSize, totalSize))
+    else:
+        # unknown total size, can not check
+        isDownloadOk = True
+    return isDownloadOk
 
-                totalDownloadTime = curTime - startTime # 15.63818907737732
-                averageSpeed = curDownloadedSize / totalDownloadTime # 670522.651191692
-                averageSpeedStr = formatSize(averageSpeed) # '231.3KB'
+def getRequestsSession(poolSize=SESSION_POOL_SIZE):
+    """Get shared requests session, with connection pool, for reuse connection in (concurrent) requests
 
-                totalDownloadTimeDict = floatSecondsToDatetimeDict(totalDownloadTime)
-                totalDownloadTimeStr = datetimeDictToStr(totalDownloadTimeDict, isShowMilliSecPart=False)
+    Args:
+        poolSize (int): max connection number of pool for each host
+    Returns:
+        requests.Session
+    Raises:
+    Examples:
+    """
+    with gVal["sessionLock"]:
+        if gVal["session"] is None:
+            gVal["session"] = requests.Session()
 
-                if isShowSpeed:
-                    showStr = "downloading speed: cur=%s/s, avg=%s/s, time: total=%s, size: %s" % (curSpeedStr, averageSpeedStr, totalDownloadTimeStr, totalDownloadedSizeStr)
+        if poolSize > gVal["sessionPoolSize"]:
+            poolAdapter = requests.adapters.HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+            gVal["session"].mount("http://", poolAdapter)
+            gVal["session"].mount("https://", poolAdapter)
+            gVal["sessionPoolSize"] = poolSize
 
-                    if totalSize > 0:
-                        downloadedPercent100 = round(100 * totalDownloadedSize / totalSize, 2) # 47.23
-                        downloadedPercent100Str = str(downloadedPercent100) # '47.23'
-                        percentStr = ", percent: %s%%" % downloadedPercent100Str # ', percent: 47.23%'
-                    else:
-                        percentStr = ""
+    return gVal["session"]
 
-                    showStr += percentStr
-                    # 'downloading speed: cur=231.3KB/s, avg=231.3KB/s, time: total=00:00:02, size: 11.5MB, percent: 49.38%'
-                    print(showStr)
+def validateUrlBatch(urlIter, validateType=UrlValidateType.IMAGE, proxies=None, threadNum=32, perHostNum=4):
+    """Validate many urls concurrently, yield each result as soon as it finish (not in input order)
+        use bounded thread pool over shared pooled session, and limit concurrent request number of each host
 
-                prevTime = curTime
+    Args:
+        urlIter (iterable): url list or iterator, consumed lazily: only read more url when free thread can not be used
+            by already read urls (of host not reach perHostNum), so url of other hosts is not blocked by many urls of same host
+            and at most threadNum * BATCH_BUFFER_FACTOR urls are buffered, if reached, wait running requests finish before read more
+        validateType (UrlValidateType): validate type, which single url function to use
+            UrlValidateType.IMAGE: isValidImageUrl
+            UrlValidateType.APK: isAndroidApkUrl
+            UrlValidateType.CONTENT_TYPE: getContentTypeFromUrl
+        proxies (dict): requests proxies
+        threadNum (int): max concurrent request number
+        perHostNum (int): max concurrent request number of each host
+    Returns:
+        generator of (url, result, errMsg)
+            result is same as single url function, or None if exception, then errMsg is exception message
+    Raises:
+    Examples:
+        for eachUrl, isValid, errMsg in validateUrlBatch(imageUrlList):
+            ...
+        -> 'https://www.crifan.com/files/pic/uploads/2021/03/f60ea32cf4664b41922431f4ea015621.jpg', True, ''
+    """
+    validateFuncDict = {
+        UrlValidateType.IMAGE: isValidImageUrl,
+        UrlValidateType.APK: isAndroidApkUrl,
+        UrlValidateType.CONTENT_TYPE: getContentTypeFromUrl,
+    }
+    validateFunc = validateFuncDict[validateType]
+
+    # make sure pool is large enough, not discard connection for concurrent requests
+    getRequestsSession(max(SESSION_POOL_SIZE, threadNum))
+
+    hostToWaitingDict = OrderedDict() # host -> deque of waiting url
+    hostToRunningNumDict = {}
+    futureToUrlHostDict = {}
+    waitingNum = 0 # total url number in all waiting deques
+    maxWaitingNum = threadNum * BATCH_BUFFER_FACTOR
+    isIterEnd = False
+    urlIter = iter(urlIter)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threadNum) as executor:
+        while True:
+            # read urls until free threads can be filled by waiting urls of hosts not reach perHostNum
+            # Note: waiting urls of busy host are buffered, so they not block other hosts,
+            # but max buffered url number is limited, eg: all urls of same host, not read whole urlIter into memory
+            freeThreadNum = threadNum - len(futureToUrlHostDict)
+            runnableNum = sum(min(len(waitingUrlDeque), perHostNum - hostToRunningNumDict.get(eachHost, 0))
+                for eachHost, waitingUrlDeque in hostToWaitingDict.items())
+            while (not isIterEnd) and (runnableNum < freeThreadNum) and (waitingNum < maxWaitingNum):
+                try:
+                    curUrl = next(urlIter)
+                except StopIteration:
+                    isIterEnd = True
+                    break
+                curHost = urlparse(curUrl).netloc.lower()
+                if curHost not in hostToWaitingDict:
+                    hostToWaitingDict[curHost] = deque()
+                waitingUrlDeque = hostToWaitingDict[curHost]
+                waitingUrlDeque.append(curUrl)
+                waitingNum += 1
+                if len(waitingUrlDeque) <= (perHostNum - hostToRunningNumDict.get(curHost, 0)):
+                    runnableNum += 1
+
+            # submit waiting url of host which not reach its limit
+            for curHost in list(hostToWaitingDict.keys()):
+                if len(futureToUrlHostDict) >= threadNum:
+                    break
+                waitingUrlDeque = hostToWaitingDict[curHost]
+                while waitingUrlDeque and (hostToRunningNumDict.get(curHost, 0) < perHostNum) and (len(futureToUrlHostDict) < threadNum):
+                    curUrl = waitingUrlDeque.popleft()
+                    waitingNum -= 1
+                    curFuture = executor.submit(validateFunc, curUrl, proxies=proxies)
+                    futureToUrlHostDict[curFuture] = (curUrl, curHost)
+                    hostToRunningNumDict[curHost] = hostToRunningNumDict.get(curHost, 0) + 1
+                if not waitingUrlDeque:
+                    del hostToWaitingDict[curHost]
+
+            if not futureToUrlHostDict:
+                # no running and no waiting
+                break
+
+            doneFutureSet, _ = concurrent.futures.wait(list(futureToUrlHostDict.keys()), return_when=concurrent.futures.FIRST_COMPLETED)
+            for eachFuture in doneFutureSet:
+                curUrl, curHost = futureToUrlHostDict.pop(eachFuture)
+                hostToRunningNumDict[curHost] -= 1
+                if hostToRunningNumDict[curHost] == 0:
+                    del hostToRunningNumDict[curHost]
+
+                validateResult = None
+                errMsg = ""
+                try:
+                    validateResult = eachFuture.result()
+                except Exception as validateErr:
+                    errMsg = str(validateErr)
+                yield curUrl, validateResult, errMsg
+
+def segmentedDownloadFile(
+        url,
+        fileToSave,
+        totalSize=0,
+        segmentNum=8,
+        proxies=None,
+        isShowSpeed=True,
+        chunkSize=1024*256,
+        timeout=30,
+        session=None,
+        saveManifestInterval=1.0,
+        progressReporter=None,
+    ):
+    """Download file by split into multiple byte range segments, download them concurrently
+        write each segment into its place of preallocated file,
+        save a sidecar manifest (fileToSave + SEGMENT_MANIFEST_SUFFIX), so interrupted segments can resume individually
+        server must support range request
+
+    Args:
+        url (str): file online url
+        fileToSave (str): filename or full file path
+        totalSize (int): total file size, if 0, will get from url
+        segmentNum (int): max segment number, also is concurrent connection number
+        proxies (dict): requests proxies
+        isShowSpeed (bool): show downloading speed or not
+        chunkSize (int): chunk size for each segment stream
+        timeout (int/float): requests timeout seconds
+        session (requests.Session): session to use, default to shared session of getRequestsSession
+        saveManifestInterval (float): interval seconds to save manifest
+        progressReporter (ProgressReporter): report progress, can shared by concurrent downloads.
+            default to PrintProgressReporter if isShowSpeed, otherwise NullProgressReporter
+    Returns:
+        download ok or not (bool)
+    Raises:
+    Examples:
+        input:
+            'https://gameapktxdl.vivo.com.cn/appstore/developer/soft/20201020/202010201805243ed5v.apk'
+            'downloaded/apk/202010201805243ed5v.apk'
+        output:
+            True
+    """
+    isDownloadOk = False
+
+    if not totalSize:
+        totalSize = getFileSizeFromUrl(url, proxies)
+        if not totalSize:
+            logging.error("Failed to get total file size from %s", url)
+            return isDownloadOk
+
+    if session is None:
+        session = getRequestsSession(max(SESSION_POOL_SIZE, segmentNum))
+
+    manifestFile = fileToSave + SEGMENT_MANIFEST_SUFFIX
+    segmentList = _loadSegmentManifest(manifestFile, url, totalSize)
+    isResume = (segmentList is not None) and os.path.isfile(fileToSave)
+    if not isResume:
+        segmentList = _splitSegments(totalSize, segmentNum)
+
+    isOwnReporter = progressReporter is None
+    if isOwnReporter:
+        if isShowSpeed:
+            progressReporter = PrintProgressReporter()
+        else:
+            progressReporter = NullProgressReporter()
+    progressReporter.addTotal(totalSize, sum(eachSegment["downloaded"] for eachSegment in segmentList))
+
+    manifestLock = threading.Lock()
+    manifestSaveTimeList = [time.time()]
+
+    def updateProgress(segmentDict, curChunkSize):
+        progressReporter.update(curChunkSize)
+        with manifestLock:
+            segmentDict["downloaded"] += curChunkSize
+            curTime = time.time()
+            if (curTime - manifestSaveTimeList[0]) >= saveManifestInterval:
+                _saveSegmentManifest(manifestFile, url, totalSize, segmentList)
+                manifestSaveTimeList[0] = curTime
+
+    todoSegmentList = [eachSegment for eachSegment in segmentList if eachSegment["downloaded"] <= (eachSegment["end"] - eachSegment["start"])]
+    logging.debug("%s %d/%d segments for %s", "Resume" if isResume else "Download", len(todoSegmentList), len(segmentList), url)
+
+    errMsgList = []
+    fileFd = os.open(fileToSave, os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0))
+    try:
+        if not isResume:
+            # preallocate, then each segment write into its own place
+            os.ftruncate(fileFd, totalSize)
+            _saveSegmentManifest(manifestFile, url, totalSize, segmentList)
+
+        if todoSegmentList:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(todoSegmentList)) as executor:
+                futureList = [
+                    executor.submit(_downloadSegment, session, url, fileFd, eachSegment, chunkSize, proxies, timeout, updateProgress)
+                    for eachSegment in todoSegmentList
+                ]
+                for eachFuture in concurrent.futures.as_completed(futureList):
+                    isSegmentOk, errMsg = eachFuture.result()
+                    if not isSegmentOk:
+                        errMsgList.append(errMsg)
+    finally:
+        os.close(fileFd)
+
+    if isOwnReporter:
+        progressReporter.finish()
+
+    if errMsgList:
+        _saveSegmentManifest(manifestFile, url, totalSize, segmentList)
+        logging.error("Failed to download %d segments of %s: %s", len(errMsgList), url, errMsgList)
+    else:
+        os.remove(manifestFile)
+        isDownloadOk = True
 
     return isDownloadOk
 
@@ -456,6 +1035,8 @@ def downloadFile(url,
         proxies=None,
         isStreamMode=True,
         isResume=True,
+        segmentNum=1,
+        progressReporter=None,
     ):
     """Download file from url then save to file
 
@@ -464,6 +1045,9 @@ def downloadFile(url,
         fileToSave (str): filename or full file path
         proxies (dict): requests proxies
         isStreamMode (bool): use stream mode or not
+        isResume (bool): resume from already downloaded part or not
+        segmentNum (int): if > 1 and server support range, use segmentedDownloadFile to download multiple segments concurrently
+        progressReporter (ProgressReporter): report progress, default to PrintProgressReporter
     Returns:
         download ok or not (bool)
     Raises:
@@ -480,9 +1064,17 @@ def downloadFile(url,
         urlPartList = url.split("/")
         fileToSave = urlPartList[-1] # 5g_message_rcs_tech_summary.pdf
 
+    respMetaDict = None
     try:
         if isStreamMode:
-            totalFileSize = getFileSizeFromUrl(url, proxies) # 154551625
+            # if fallback to GET, reuse the response to download body
+            respMetaDict = getRespMeta(url, proxies=proxies, isKeepResp=True)
+            if respMetaDict and (respMetaDict["statusCode"] >= 400):
+                # not save error page as file
+                print("Failed to download %s: status code %s" % (url, respMetaDict["statusCode"]))
+                return isDownloadOk
+            respHeaderDict = respMetaDict["headers"] if respMetaDict else None
+            totalFileSize = getFileSizeFromHeaders(respHeaderDict) # 154551625
             if not totalFileSize:
                 print("Failed to get total file size from %s" % url)
                 return isDownloadOk
@@ -490,12 +1082,31 @@ def downloadFile(url,
             totalSizeStr = formatSize(totalFileSize)
             print("Get total file size %s from %s" % (totalSizeStr, url))
 
-            isDownloadedAndValid = isFileExistAndValid(fileToSave, fullFileSize=totalFileSize)
+            manifestFile = fileToSave + SEGMENT_MANIFEST_SUFFIX
+            isExistManifest = os.path.isfile(manifestFile)
+            if isExistManifest and (not isResume):
+                os.remove(manifestFile)
+                isExistManifest = False
+
+            # segmented download preallocate full size file, so not downloaded if manifest exist
+            isDownloadedAndValid = (not isExistManifest) and isFileExistAndValid(fileToSave, fullFileSize=totalFileSize)
             if isDownloadedAndValid:
                 print("%s is already download" % fileToSave)
                 isDownloadOk = True
                 return isDownloadOk
 
+            isSupportRange = respHeaderDict.get("Accept-Ranges", "").lower() == "bytes"
+            if (segmentNum > 1) and isSupportRange and (isExistManifest or (not os.path.isfile(fileToSave)) or (not isResume)):
+                isDownloadOk = segmentedDownloadFile(
+                    url,
+                    fileToSave=fileToSave,
+                    totalSize=totalFileSize,
+                    segmentNum=segmentNum,
+                    proxies=proxies,
+                    progressReporter=progressReporter,
+                )
+                return isDownloadOk
+
             curDownloadedSize = 0
             isExistFile = os.path.isfile(fileToSave)
             if isExistFile:
@@ -519,14 +1130,22 @@ def downloadFile(url,
                 isShowSpeed=True,
                 resumeSize=curDownloadedSize,
                 totalSize=totalFileSize,
+                resp=respMetaDict["resp"],
+                progressReporter=progressReporter,
             )
         else:
             resp = requests.get(url, proxies=proxies)
+            if not resp.ok:
+                print("Failed to download %s: status code %s" % (url, resp.status_code))
+                return isDownloadOk
             with open(fileToSave, 'wb') as saveFp:
                 saveFp.write(resp.content)
                 isDownloadOk = True
     except BaseException as curException:
         print("Exception %s when download %s to %s" % (curException, url, fileToSave))
+    finally:
+        if respMetaDict and respMetaDict["resp"]:
+            respMetaDict["resp"].close()
 
     return isDownloadOk
 
@@ -6,6 +6,11 @@
 from datetime import datetime
 import logging
 import re
+import os
+import json
+import time
+import threading
+import concurrent.futures
 import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
@@ -34,11 +39,27 @@ class crifanWordpress(object):
 
     MaxRetryNum = 10
 
+    # taxonomy index expire seconds, after expired, refresh (use ETag if server support) when next use
+    TaxonomyIndexTtl = 60 * 60 * 24
+    # max thread number to fetch rest pages of taxonomy in parallel
+    FetchPageThreadNum = 8
+    # only get these fields for taxonomy index, to reduce response size
+    TaxonomyIndexFieldList = ["id", "name", "slug", "link", "description", "parent", "taxonomy"]
+    # media index expire seconds, new created media is added into index, so only need refresh for media uploaded by others
+    MediaIndexTtl = 60 * 60 * 24
+    # only get these fields for media index
+    MediaIndexFieldList = ["id", "slug", "link", "title", "source_url"]
+
     ################################################################################
     # Class Method
     ################################################################################
 
-    def __init__(self, host, jwtToken, requestsProxies=None):
+    def __init__(self, host, jwtToken, requestsProxies=None, taxonomyIndexFile=None, mediaIndexFile=None):
+        """
+        Args:
+            taxonomyIndexFile (str): optional json file to persist taxonomy(category/post_tag) index, to reuse between process
+            mediaIndexFile (str): optional json file to persist media index, to reuse between process
+        """
         self.host = host # 'https://www.crifan.org'
         self.authorization = "Bearer %s" % jwtToken # 'Bearer xxx'
         self.requestsProxies = requestsProxies # {'http': 'http://127.0.0.1:58591', 'https': 'http://127.0.0.1:58591'}
@@ -62,6 +83,20 @@ class crifanWordpress(object):
         self.reqSession.mount('http://', self.reqAdapter)
         self.reqSession.mount('https://', self.reqAdapter)
 
+        # taxonomy -> index dict: taxonomyList, updateTime, etag, total, nameDict, lowerNameDict
+        self.taxonomyIndexFile = taxonomyIndexFile
+        self.taxonomyIndexDict = {}
+        self.taxonomyIndexLock = threading.RLock()
+        # new added into index but not saved into file, save by flushTaxonomyIndexFile
+        self.isTaxonomyIndexDirty = False
+
+        # media index dict: mediaList, updateTime, etag, total, nameDict, hashDict
+        self.mediaIndexFile = mediaIndexFile
+        self.mediaIndex = None
+        self.mediaIndexLock = threading.RLock()
+        # new added into index but not saved into file, save by flushMediaIndexFile
+        self.isMediaIndexDirty = False
+
     def validateToken(self):
         """Validate wordpress REST api jwt token is valid or not
         Args:
@@ -105,14 +140,16 @@ class crifanWordpress(object):
         # 'https://www.crifan.org/files/pic/uploads/2021/03/f60ea32cf4664b41922431f4ea015621.jpg'
         return uploadedImageUrl
 
-    def createMedia(self, contentType, filename, mediaBytes):
+    def createMedia(self, contentType, filename, mediaBytes, contentHash=None):
         """Create wordpress media (image)
             by call REST api: POST /wp-json/wp/v2/media
+            if created, add into media index (if loaded), call flushMediaIndexFile to save it into file
 
         Args:
             contentType (str): content type
             filename (str): attachment file name
             mediaBytes (bytes): media binary bytes
+            contentHash (str): optional content hash (eg: md5) of media bytes, to record in media index
         Returns:
             (bool, dict)
                 True, uploaded media info
@@ -139,6 +176,8 @@ class crifanWordpress(object):
         logging.debug("resp=%s", resp)
 
         isUploadOk, respInfo = crifanWordpress.processCommonResponse(resp)
+        if isUploadOk:
+            self.addToMediaIndex(respInfo, contentHash=contentHash)
         return isUploadOk, respInfo
 
     def createPost(self,
@@ -279,6 +318,11 @@ class crifanWordpress(object):
         logging.debug("isCreateOk=%s, respInfo=%s", isCreateOk, respInfo)
         # isCreateOk=True, respInfo={'id': 13224, 'slug': 'gpu', 'link': 'https://www.crifan.org/tag/gpu/', 'name': 'GPU', 'description': ''}
 
+        if isCreateOk and respInfo:
+            newTaxonomy = dict(respInfo)
+            newTaxonomy["taxonomy"] = taxonomy
+            self.addToTaxonomyIndex(newTaxonomy, taxonomy)
+
         return isCreateOk, respInfo
 
     def getTaxonomySinglePage(self, name, taxonomy, curPage, perPage=None):
@@ -386,13 +430,385 @@ class crifanWordpress(object):
 
         return isGetAllOk, respInfo
 
-    def searchTaxonomy(self, name, taxonomy):
+    def getTaxonomyApiUrl(self, taxonomy):
+        """Get REST api url of taxonomy: category -> /wp-json/wp/v2/categories, post_tag -> /wp-json/wp/v2/tags"""
+        taxonomyApiUrl = ""
+        if taxonomy == "category":
+            taxonomyApiUrl = self.apiCategories
+        elif taxonomy == "post_tag":
+            taxonomyApiUrl = self.apiTags
+        return taxonomyApiUrl
+
+    def fetchAllPages(self, apiUrl, fieldList=None, etag=None, total=None):
+        """Fetch all items of wordpress list REST api, eg: categories/tags/media
+            get first page, then get rest pages in parallel according to X-WP-TotalPages
+
+        Args:
+            apiUrl (str): list REST api url, eg: https://www.crifan.org/wp-json/wp/v2/tags
+            fieldList (list): only get these fields (_fields), to reduce response size
+            etag (str): ETag of previous first page
+            total (int): previous total item number (X-WP-Total)
+                first page not changed (304) and total not changed -> return None item list
+                ETag only cover first page, item add/delete in later pages not change it, so also need check total
+        Returns:
+            (bool, list/None/dict, str, int)
+                True, all item list (or None if not modified), ETag of first page, total item number
+                False, error detail, None, None
+        Raises:
+        """
+        curHeaders = {
+            "Authorization": self.authorization,
+            "Accept": "application/json",
+        }
+
+        def getSinglePage(curPage, pageHeaders, perPage=crifanWordpress.SearchTagPerPage, pageFieldList=fieldList):
+            queryParamDict = {
+                "page": curPage,
+                "per_page": perPage,
+            }
+            if pageFieldList:
+                queryParamDict["_fields"] = ",".join(pageFieldList)
+            resp = self.reqSession.get(
+                apiUrl,
+                proxies=self.requestsProxies,
+                headers=pageHeaders,
+                params=queryParamDict,
+            )
+            logging.debug("resp=%s for GET %s with para=%s", resp, apiUrl, queryParamDict)
+            return resp
+
+        firstPageHeaders = dict(curHeaders)
+        if etag and (total is not None):
+            firstPageHeaders["If-None-Match"] = etag
+        firstPageResp = getSinglePage(1, firstPageHeaders)
+        if firstPageResp.status_code == 304:
+            curTotal = firstPageResp.headers.get("X-WP-Total")
+            if curTotal is None:
+                # 304 (from cache/proxy) maybe without X-WP-Total, get it by smallest page
+                totalResp = getSinglePage(1, curHeaders, perPage=1, pageFieldList=["id"])
+                curTotal = totalResp.headers.get("X-WP-Total") if totalResp.ok else None
+            if (curTotal is not None) and (int(curTotal) == total):
+                return True, None, etag, total
+
+            logging.debug("%s first page not modified for ETag %s, but total changed %s -> %s", apiUrl, etag, total, curTotal)
+            firstPageResp = getSinglePage(1, curHeaders)
+
+        isFirstPageOk, firstPageRespInfo = crifanWordpress.processCommonResponse(firstPageResp)
+        if not isFirstPageOk:
+            return False, firstPageRespInfo, None, None
+
+        allItemList = list(firstPageRespInfo)
+        firstPageEtag = firstPageResp.headers.get("ETag")
+        curTotal = firstPageResp.headers.get("X-WP-Total")
+        curTotal = int(curTotal) if (curTotal is not None) else None
+        totalPageNum = int(firstPageResp.headers.get("X-WP-TotalPages", 1))
+        logging.debug("%s totalPageNum=%s", apiUrl, totalPageNum)
+        if totalPageNum > 1:
+            restPageNumList = list(range(2, totalPageNum + 1))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=crifanWordpress.FetchPageThreadNum) as executor:
+                # map keep page order
+                for eachResp in executor.map(lambda curPage: getSinglePage(curPage, curHeaders), restPageNumList):
+                    isPageOk, pageRespInfo = crifanWordpress.processCommonResponse(eachResp)
+                    if not isPageOk:
+                        return False, pageRespInfo, None, None
+                    allItemList.extend(pageRespInfo)
+
+        return True, allItemList, firstPageEtag, curTotal
+
+    def fetchAllTaxonomyPages(self, taxonomy, etag=None, total=None):
+        """Fetch all items of wordpress category/post_tag, for build taxonomy index
+
+        Args:
+            taxonomy (str): taxonomy type: category/post_tag
+            etag (str): ETag of previous first page
+            total (int): previous total item number, if both not changed, return None item list
+        Returns:
+            same as fetchAllPages
+        Raises:
+        """
+        taxonomyApiUrl = self.getTaxonomyApiUrl(taxonomy)
+        return self.fetchAllPages(taxonomyApiUrl, fieldList=crifanWordpress.TaxonomyIndexFieldList, etag=etag, total=total)
+
+    def getTaxonomyIndex(self, taxonomy, isForceRefresh=False):
+        """Get local index of all wordpress category/post_tag, load from file or server once, refresh when expired
+
+        Args:
+            taxonomy (str): taxonomy type: category/post_tag
+            isForceRefresh (bool): force refresh from server or not
+        Returns:
+            (bool, dict)
+                True, index dict: taxonomyList, updateTime, etag, total, nameDict, lowerNameDict
+                False, error detail
+        Raises:
+        """
+        with self.taxonomyIndexLock:
+            if (not self.taxonomyIndexDict) and self.taxonomyIndexFile:
+                self.loadTaxonomyIndexFile()
+
+            curIndex = self.taxonomyIndexDict.get(taxonomy)
+            isExpired = (curIndex is None) or ((time.time() - curIndex["updateTime"]) > crifanWordpress.TaxonomyIndexTtl)
+            if curIndex and (not isForceRefresh) and (not isExpired):
+                return True, curIndex
+
+            prevEtag, prevTotal = None, None
+            if curIndex and (not isForceRefresh):
+                prevEtag, prevTotal = curIndex["etag"], curIndex.get("total")
+            isFetchOk, taxonomyList, curEtag, curTotal = self.fetchAllTaxonomyPages(taxonomy, etag=prevEtag, total=prevTotal)
+            if not isFetchOk:
+                logging.error("Fail to fetch all %s: %s", taxonomy, taxonomyList)
+                errorDetail = taxonomyList
+                return False, errorDetail
+
+            if taxonomyList is None:
+                logging.debug("%s not modified for ETag %s", taxonomy, curEtag)
+                curIndex["updateTime"] = time.time()
+            else:
+                curIndex = {
+                    "taxonomyList": taxonomyList,
+                    "updateTime": time.time(),
+                    "etag": curEtag,
+                    "total": curTotal,
+                }
+                crifanWordpress.buildTaxonomyNameDict(curIndex)
+                self.taxonomyIndexDict[taxonomy] = curIndex
+                logging.info("Loaded %d %s into index", len(taxonomyList), taxonomy)
+
+            self.saveTaxonomyIndexFile()
+            return True, curIndex
+
+    def addToTaxonomyIndex(self, newTaxonomy, taxonomy):
+        """Add new created category/post_tag into local index, if index is loaded
+            only in memory, call flushTaxonomyIndexFile to save into file
+        """
+        with self.taxonomyIndexLock:
+            curIndex = self.taxonomyIndexDict.get(taxonomy)
+            if curIndex is None:
+                return
+
+            curIndex["taxonomyList"].append(newTaxonomy)
+            if curIndex.get("total") is not None:
+                curIndex["total"] += 1
+            curName = newTaxonomy["name"]
+            if curName not in curIndex["nameDict"]:
+                curIndex["nameDict"][curName] = newTaxonomy
+            curIndex["lowerNameDict"][curName.lower()] = newTaxonomy
+            self.isTaxonomyIndexDirty = True
+
+    def flushTaxonomyIndexFile(self):
+        """Save taxonomy index into taxonomyIndexFile, only if new added after last save"""
+        with self.taxonomyIndexLock:
+            if self.isTaxonomyIndexDirty:
+                self.saveTaxonomyIndexFile()
+
+    def loadTaxonomyIndexFile(self):
+        """Load taxonomy index from taxonomyIndexFile, ignore if not exist, or host not match"""
+        if not os.path.isfile(self.taxonomyIndexFile):
+            return
+
+        try:
+            with open(self.taxonomyIndexFile, "r", encoding="utf-8") as indexFp:
+                savedDict = json.load(indexFp)
+        except ValueError as loadErr:
+            logging.warning("Ignore invalid taxonomy index file %s: %s", self.taxonomyIndexFile, loadErr)
+            return
+
+        if savedDict.get("host") != self.host:
+            return
+
+        for eachTaxonomy, eachIndex in savedDict["taxonomyIndexDict"].items():
+            crifanWordpress.buildTaxonomyNameDict(eachIndex)
+            self.taxonomyIndexDict[eachTaxonomy] = eachIndex
+
+    def saveTaxonomyIndexFile(self):
+        """Save taxonomy index into taxonomyIndexFile, if set"""
+        self.isTaxonomyIndexDirty = False
+        if not self.taxonomyIndexFile:
+            return
+
+        savedDict = {
+            "host": self.host,
+            "taxonomyIndexDict": {},
+        }
+        for eachTaxonomy, eachIndex in self.taxonomyIndexDict.items():
+            savedDict["taxonomyIndexDict"][eachTaxonomy] = {
+                "taxonomyList": eachIndex["taxonomyList"],
+                "updateTime": eachIndex["updateTime"],
+                "etag": eachIndex["etag"],
+                "total": eachIndex.get("total"),
+            }
+
+        tmpIndexFile = self.taxonomyIndexFile + ".tmp"
+        with open(tmpIndexFile, "w", encoding="utf-8") as indexFp:
+            json.dump(savedDict, indexFp, ensure_ascii=False)
+        os.replace(tmpIndexFile, self.taxonomyIndexFile)
+
+    def getMediaIndex(self, isForceRefresh=False):
+        """Get local index of all wordpress media, load from file or server once, refresh when expired
+
+        Args:
+            isForceRefresh (bool): force refresh from server or not
+        Returns:
+            (bool, dict)
+                True, index dict: mediaList, updateTime, etag, total, nameDict, hashDict
+                False, error detail
+        Raises:
+        """
+        with self.mediaIndexLock:
+            if (self.mediaIndex is None) and self.mediaIndexFile:
+                self.loadMediaIndexFile()
+
+            curIndex = self.mediaIndex
+            isExpired = (curIndex is None) or ((time.time() - curIndex["updateTime"]) > crifanWordpress.MediaIndexTtl)
+            if curIndex and (not isForceRefresh) and (not isExpired):
+                return True, curIndex
+
+            prevEtag, prevTotal = None, None
+            if curIndex and (not isForceRefresh):
+                prevEtag, prevTotal = curIndex["etag"], curIndex.get("total")
+            isFetchOk, mediaRespList, curEtag, curTotal = self.fetchAllPages(self.apiMedia, fieldList=crifanWordpress.MediaIndexFieldList, etag=prevEtag, total=prevTotal)
+            if not isFetchOk:
+                logging.error("Fail to fetch all media: %s", mediaRespList)
+                errorDetail = mediaRespList
+                return False, errorDetail
+
+            if mediaRespList is None:
+                logging.debug("media not modified for ETag %s", curEtag)
+                curIndex["updateTime"] = time.time()
+            else:
+                # content hash only known locally (from createMedia), so keep it after refresh
+                prevIdToHashDict = {}
+                if curIndex:
+                    prevIdToHashDict = {eachMedia["id"]: eachMedia["hash"] for eachMedia in curIndex["mediaList"] if eachMedia.get("hash")}
+
+                mediaList = []
+                for eachMediaResp in mediaRespList:
+                    curMedia = crifanWordpress.mediaRespToIndexMedia(eachMediaResp)
+                    curHash = prevIdToHashDict.get(curMedia["id"])
+                    if curHash:
+                        curMedia["hash"] = curHash
+                    mediaList.append(curMedia)
+
+                curIndex = {
+                    "mediaList": mediaList,
+                    "updateTime": time.time(),
+                    "etag": curEtag,
+                    "total": curTotal,
+                }
+                crifanWordpress.buildMediaLookupDict(curIndex)
+                self.mediaIndex = curIndex
+                logging.info("Loaded %d media into index", len(mediaList))
+
+            self.saveMediaIndexFile()
+            return True, curIndex
+
+    def addToMediaIndex(self, newMedia, contentHash=None):
+        """Add new created media (createMedia respInfo: id/slug/link/url/title) into local index, if index is loaded
+            only in memory, not save file for each media, which serialize concurrent upload, call flushMediaIndexFile to save into file
+        """
+        with self.mediaIndexLock:
+            curIndex = self.mediaIndex
+            if curIndex is None:
+                return
+
+            curMedia = {
+                "id": newMedia["id"],
+                "slug": newMedia["slug"],
+                "link": newMedia["link"],
+                "url": newMedia.get("url", ""),
+                "title": newMedia.get("title", ""),
+            }
+            if contentHash:
+                curMedia["hash"] = contentHash
+            curIndex["mediaList"].append(curMedia)
+            if curIndex.get("total") is not None:
+                curIndex["total"] += 1
+            crifanWordpress.addToMediaLookupDict(curIndex, curMedia)
+            self.isMediaIndexDirty = True
+
+    def flushMediaIndexFile(self):
+        """Save media index into mediaIndexFile, only if new added after last save"""
+        with self.mediaIndexLock:
+            if self.isMediaIndexDirty:
+                self.saveMediaIndexFile()
+
+    def flushIndexFile(self):
+        """Save taxonomy and media index into file, only if new added after last save"""
+        self.flushTaxonomyIndexFile()
+        self.flushMediaIndexFile()
+
+    def findMedia(self, name=None, contentHash=None):
+        """Find already uploaded media from local media index, by content hash first, then by name
+
+        Args:
+            name (str): media file name without suffix, or title. eg: 'f6956c30ef0b475fa2b99c2f49622e35'
+            contentHash (str): content hash of media bytes, same as contentHash passed to createMedia
+        Returns:
+            (bool, dict/None)
+                True, found media info (id/slug/link/url/title) or None if not found
+                False, error detail of get media index
+        Raises:
+        """
+        isIndexOk, mediaIndex = self.getMediaIndex()
+        if not isIndexOk:
+            return isIndexOk, mediaIndex
+
+        foundMedia = None
+        if contentHash:
+            foundMedia = mediaIndex["hashDict"].get(contentHash)
+        if (not foundMedia) and name:
+            foundMedia = mediaIndex["nameDict"].get(name)
+        return True, foundMedia
+
+    def loadMediaIndexFile(self):
+        """Load media index from mediaIndexFile, ignore if not exist, or host not match"""
+        if not os.path.isfile(self.mediaIndexFile):
+            return
+
+        try:
+            with open(self.mediaIndexFile, "r", encoding="utf-8") as indexFp:
+                savedDict = json.load(indexFp)
+        except ValueError as loadErr:
+            logging.warning("Ignore invalid media index file %s: %s", self.mediaIndexFile, loadErr)
+            return
+
+        if savedDict.get("host") != self.host:
+            return
+
+        curIndex = savedDict["mediaIndex"]
+        crifanWordpress.buildMediaLookupDict(curIndex)
+        self.mediaIndex = curIndex
+
+    def saveMediaIndexFile(self):
+        """Save media index into mediaIndexFile, if set"""
+        self.isMediaIndexDirty = False
+        if (not self.mediaIndexFile) or (self.mediaIndex is None):
+            return
+
+        savedDict = {
+            "host": self.host,
+            "mediaIndex": {
+                "mediaList": self.mediaIndex["mediaList"],
+                "updateTime": self.mediaIndex["updateTime"],
+                "etag": self.mediaIndex["etag"],
+                "total": self.mediaIndex.get("total"),
+            },
+        }
+
+        tmpIndexFile = self.mediaIndexFile + ".tmp"
+        with open(tmpIndexFile, "w", encoding="utf-8") as indexFp:
+            json.dump(savedDict, indexFp, ensure_ascii=False)
+        os.replace(tmpIndexFile, self.mediaIndexFile)
+
+    def searchTaxonomy(self, name, taxonomy, isUseIndex=True):
         """Search wordpress category/post_tag
             return the exactly matched one, name is same, or name lowercase is same
 
         Args:
             name (str): category name to search
             taxonomy (str): taxonomy type: category/post_tag
+            isUseIndex (bool): search from local index of all category/post_tag or not.
+                If False, or fail to get index, or not found in index, search via REST api
+                not found in index not means not exist: maybe created by others after index loaded
         Returns:
             (bool, dict)
                 True, found taxonomy info
@@ -402,17 +818,30 @@ class crifanWordpress(object):
         isSearchOk = False
         finalRespTaxonomy = None
 
+        isIndexOk = False
+        if isUseIndex:
+            isIndexOk, curIndex = self.getTaxonomyIndex(taxonomy)
+            if isIndexOk:
+                finalRespTaxonomy = crifanWordpress.findTaxonomyFromIndex(name, curIndex)
+                logging.debug("finalRespTaxonomy=%s", finalRespTaxonomy)
+                if finalRespTaxonomy:
+                    isSearchOk = True
+                    return isSearchOk, finalRespTaxonomy
+
         isGetAllOk, respInfo = self.getAllTaxonomy(name, taxonomy)
         if isGetAllOk:
             isSearchOk = True
             respAllTaxonomyLit = respInfo
             finalRespTaxonomy = crifanWordpress.findSameNameTaxonomy(name, respAllTaxonomyLit)
             logging.debug("finalRespTaxonomy=%s", finalRespTaxonomy)
+            if finalRespTaxonomy and isIndexOk:
+                self.addToTaxonomyIndex(finalRespTaxonomy, taxonomy)
 
         return isSearchOk, finalRespTaxonomy
 
     def getTaxonomyIdList(self, nameList, taxonomy):
         """convert taxonomy(category/post_tag) name list to wordpress category/post_tag id list
+            new created/found ones are added into taxonomy index, and saved into file once at end
 
         Args:
             nameList (list): category/post_tag name list
@@ -442,7 +871,24 @@ class crifanWordpress(object):
                     curTaxonomy = createdTaxonomy
                     logging.info("New created %s: name=%s,id=%s,slug=%s", taxonomy, curTaxonomy["name"], curTaxonomy["id"], curTaxonomy["slug"])
                 else:
-                    logging.error("Fail to create %s %s", taxonomy, eachTaxonomyName)
+                    logging.warning("Fail to create %s %s: %s", taxonomy, eachTaxonomyName, createdTaxonomy)
+                    # possible created by others just now, so search online again
+                    isSearhOk, existedTaxonomy = self.searchTaxonomy(eachTaxonomyName, taxonomy, isUseIndex=False)
+                    existedTermId = crifanWordpress.getExistedTermId(createdTaxonomy)
+                    if isSearhOk and existedTaxonomy:
+                        curTaxonomy = existedTaxonomy
+                        logging.info("Found existed %s online: name=%s,id=%s,slug=%s", taxonomy, curTaxonomy["name"], curTaxonomy["id"], curTaxonomy["slug"])
+                        self.addToTaxonomyIndex(curTaxonomy, taxonomy)
+                    elif existedTermId:
+                        # same slug but different name, so search by name not found
+                        curTaxonomy = {
+                            "id": existedTermId,
+                            "name": eachTaxonomyName,
+                            "slug": "",
+                            "taxonomy": taxonomy,
+                        }
+                        logging.info("Found existed %s from term_exists: name=%s,id=%s", taxonomy, curTaxonomy["name"], curTaxonomy["id"])
+                        self.addToTaxonomyIndex(curTaxonomy, taxonomy)
 
             if curTaxonomy:
                 curTaxonomyId = curTaxonomy["id"]
@@ -451,6 +897,7 @@ class crifanWordpress(object):
             else:
                 logging.error("Fail search or create for %s: %s", taxonomy, eachTaxonomyName)
 
+        self.flushTaxonomyIndexFile()
         logging.info("%s nameList=%s -> taxonomyIdList=%s", taxonomy, nameList, taxonomyIdList)
         return taxonomyIdList
 
@@ -789,6 +1236,118 @@ class crifanWordpress(object):
         # isOk=True, respInfo={'code': 'jwt_auth_valid_token', 'data': {'status': 200}}
         return isOk, respInfo
 
+    @staticmethod
+    def getExistedTermId(errorDetail):
+        """Get existed term id from error detail of create category/tag
+
+        Args:
+            errorDetail (dict): error detail from processCommonResponse
+                eg: {'errCode': 400, 'errMsg': '{"code":"term_exists","message":"A term with the name provided already exists with this parent.","data":{"status":400,"term_id":1374}}'}
+        Returns:
+            int/None: existed term id, None if not term_exists error
+        Raises:
+        """
+        if not isinstance(errorDetail, dict):
+            return None
+
+        try:
+            errJson = json.loads(errorDetail.get("errMsg", ""))
+        except ValueError:
+            return None
+
+        if (not isinstance(errJson, dict)) or (errJson.get("code") != "term_exists"):
+            return None
+
+        errData = errJson.get("data")
+        if isinstance(errData, dict):
+            return errData.get("term_id")
+        return None
+
+    @staticmethod
+    def buildTaxonomyNameDict(taxonomyIndex):
+        """Build name dicts of taxonomy index for find by name, same match rule as findSameNameTaxonomy
+            nameDict: name -> first taxonomy
+            lowerNameDict: lowercase name -> last taxonomy
+        """
+        nameDict = {}
+        lowerNameDict = {}
+        for eachTaxonomy in taxonomyIndex["taxonomyList"]:
+            curTaxonomyName = eachTaxonomy["name"]
+            if curTaxonomyName not in nameDict:
+                nameDict[curTaxonomyName] = eachTaxonomy
+            lowerNameDict[curTaxonomyName.lower()] = eachTaxonomy
+        taxonomyIndex["nameDict"] = nameDict
+        taxonomyIndex["lowerNameDict"] = lowerNameDict
+
+    @staticmethod
+    def findTaxonomyFromIndex(name, taxonomyIndex):
+        """Find same name taxonomy (category/tag) from taxonomy index, name is same, or name lowercase is same
+
+        Args:
+            name (str): category/tag name to find
+            taxonomyIndex (dict): taxonomy index
+        Returns:
+            found taxonomy info (dict)
+        Raises:
+        """
+        foundTaxonomy = taxonomyIndex["nameDict"].get(name)
+        if not foundTaxonomy:
+            foundTaxonomy = taxonomyIndex["lowerNameDict"].get(name.lower())
+        return foundTaxonomy
+
+    @staticmethod
+    def mediaRespToIndexMedia(mediaResp):
+        """Convert media item of GET /wp-json/wp/v2/media to media index item, same keys as createMedia respInfo
+
+        Args:
+            mediaResp (dict): media item, with fields of MediaIndexFieldList
+        Returns:
+            dict: id/slug/link/url/title
+        Raises:
+        """
+        curTitle = mediaResp.get("title", "")
+        if isinstance(curTitle, dict):
+            curTitle = curTitle.get("rendered", "")
+        indexMedia = {
+            "id": mediaResp["id"],
+            "slug": mediaResp.get("slug", ""),
+            "link": mediaResp.get("link", ""),
+            # https://www.crifan.org/files/pic/uploads/2021/03/f60ea32cf4664b41922431f4ea015621-1.jpg
+            "url": mediaResp.get("source_url", ""),
+            # f60ea32cf4664b41922431f4ea015621
+            "title": curTitle,
+        }
+        return indexMedia
+
+    @staticmethod
+    def addToMediaLookupDict(mediaIndex, curMedia):
+        """Add single media into nameDict and hashDict of media index, first added one is kept
+            name is: title (upload file name without suffix), and file name without suffix of url
+            so find by upload file name also works for file renamed by wordpress, eg: xxx.jpg -> xxx-1.jpg
+        """
+        nameDict = mediaIndex["nameDict"]
+        curNameList = []
+        if curMedia.get("title"):
+            curNameList.append(curMedia["title"])
+        if curMedia.get("url"):
+            curFilename = curMedia["url"].split("/")[-1] # 'f60ea32cf4664b41922431f4ea015621-1.jpg'
+            curNameList.append(os.path.splitext(curFilename)[0]) # 'f60ea32cf4664b41922431f4ea015621-1'
+        for eachName in curNameList:
+            if eachName not in nameDict:
+                nameDict[eachName] = curMedia
+
+        curHash = curMedia.get("hash")
+        if curHash and (curHash not in mediaIndex["hashDict"]):
+            mediaIndex["hashDict"][curHash] = curMedia
+
+    @staticmethod
+    def buildMediaLookupDict(mediaIndex):
+        """Build nameDict/hashDict of media index for find media: name -> first media, content hash -> first media"""
+        mediaIndex["nameDict"] = {}
+        mediaIndex["hashDict"] = {}
+        for eachMedia in mediaIndex["mediaList"]:
+            crifanWordpress.addToMediaLookupDict(mediaIndex, eachMedia)
+
     @staticmethod
     def findSameNameTaxonomy(name, taxonomyLit):
         """Search same taxonomy (category/tag) name from taxonomy (category/tag) list